@@ -1,29 +1,84 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+import threading
 
-# Use PostgreSQL in production (Railway), SQLite in development
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-if DATABASE_URL:
-    # PostgreSQL (production)
+def _normalize_url(url):
     # Railway provides DATABASE_URL in the format postgresql://...
     # Some providers use postgres:// which SQLAlchemy doesn't support
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+# Use PostgreSQL in production (Railway), SQLite in development
+DATABASE_URL = _normalize_url(os.getenv("DATABASE_URL"))
 
-    engine = create_engine(DATABASE_URL)
-else:
+if not DATABASE_URL:
     # SQLite (development)
     DATABASE_URL = "sqlite:///./l2pcontrol.db"
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
-    )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Optional read replica for reporting endpoints. Without it reads use the
+# writer database, but still through their own pool so heavy reports can't
+# take the connections that event ingestion needs.
+DATABASE_REPLICA_URL = _normalize_url(os.getenv("DATABASE_REPLICA_URL")) or DATABASE_URL
+
+WRITE_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "5"))
 
 Base = declarative_base()
 
+# Engines are built on first use, so importing the app (worker spawn,
+# reload, tests) loads no DB driver and opens no connection.
+_engine = None
+_read_engine = None
+_session_factory = None
+_read_session_factory = None
+_lock = threading.Lock()
+
+
+def _create_engine(url, pool_size):
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_engine(url, pool_size=pool_size)
+
+
+def get_engine():
+    """Writer engine"""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = _create_engine(DATABASE_URL, WRITE_POOL_SIZE)
+    return _engine
+
+
+def get_read_engine():
+    """Reader engine: the replica if configured, else the writer database with its own pool"""
+    global _read_engine
+    if _read_engine is None:
+        with _lock:
+            if _read_engine is None:
+                _read_engine = _create_engine(DATABASE_REPLICA_URL, READ_POOL_SIZE)
+    return _read_engine
+
+
+def SessionLocal():
+    """Create a new DB session"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory()
+
+
+def ReadSessionLocal():
+    """Create a new read-only DB session for reporting queries"""
+    global _read_session_factory
+    if _read_session_factory is None:
+        _read_session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_read_engine())
+    return _read_session_factory()
+
 
 def get_db():
     db = SessionLocal()
@@ -31,3 +86,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Like get_db, but for read-only endpoints that can tolerate replica lag"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,25 +1,84 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 import logging
+import time
 
-from .database import engine, Base
-from .routers import events, pcs, sessions, websocket, admin, beverages
+from .database import get_engine, get_read_engine, SessionLocal, DATABASE_URL, DATABASE_REPLICA_URL
+from .schema import ensure_schema
+from .models import PC
+from .venues import DEFAULT_VENUE
+from .routers import events, pcs, sessions, websocket, admin, beverages, stats, telemetry as telemetry_router
+from .services.websocket_manager import manager
+from .services.event_journal import journal
+from .services.beverage_catalog import catalog
+from .services.snapshot import snapshot
+from .services.occupancy import occupancy
+from .services.open_sessions import open_sessions
+from .services.dedup import dedup
+from .services.udp_heartbeat import udp_heartbeats
+from .services.telemetry import telemetry
+from .services.profiling import TracingMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create tables
-logger.info("Initializing database tables...")
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Failed to create database tables: {e}")
-    raise
 
-app = FastAPI(title="L2pControl API", version="1.0.0")
+def warm_up():
+    """Open a pooled connection, compile the hot queries and prefill the caches"""
+    db = SessionLocal()
+    try:
+        open_sessions.load(db)
+        venues = {venue for (venue,) in db.query(PC.venueId).distinct()} | {DEFAULT_VENUE}
+        for venue in sorted(venues):
+            snapshot.refresh(db, venue)
+            catalog.get(db, venue)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+
+    logger.info("Checking database schema...")
+    try:
+        await asyncio.to_thread(ensure_schema, get_engine())
+        # A local SQLite stand-in for the replica needs the tables too
+        if DATABASE_REPLICA_URL != DATABASE_URL and DATABASE_REPLICA_URL.startswith("sqlite"):
+            await asyncio.to_thread(ensure_schema, get_read_engine())
+    except Exception as e:
+        logger.error(f"Failed to prepare database schema: {e}")
+        raise
+
+    manager.add_listener(catalog.on_broadcast)
+    manager.add_listener(snapshot.on_broadcast)
+    manager.add_listener(occupancy.on_broadcast)
+    manager.add_listener(open_sessions.on_broadcast)
+    manager.add_listener(dedup.on_broadcast)
+    await manager.start()
+    await journal.start()
+    await telemetry.start()
+    await udp_heartbeats.start()
+
+    try:
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        logger.warning(f"Warm-up failed, caches will fill on first request: {e}")
+
+    logger.info(f"Startup complete in {(time.perf_counter() - started) * 1000:.0f} ms")
+    yield
+
+    await udp_heartbeats.stop()
+    await telemetry.stop()
+    await journal.stop()
+    await manager.stop()
+
+
+app = FastAPI(title="L2pControl API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware - allow origins from environment variable or defaults
 allowed_origins = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173").split(",")
@@ -32,6 +91,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request tracing - a pass-through unless enabled via PUT /api/admin/tracing or TRACE_REQUESTS
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(events.router)
 app.include_router(pcs.router)
@@ -39,6 +101,8 @@ app.include_router(sessions.router)
 app.include_router(websocket.router)
 app.include_router(admin.router)
 app.include_router(beverages.router)
+app.include_router(stats.router)
+app.include_router(telemetry_router.router)
 
 
 @app.get("/")
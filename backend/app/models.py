@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Float, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
 from .database import Base
+from .venues import DEFAULT_VENUE
 
 
 class PCStatus(str, enum.Enum):
@@ -16,6 +17,12 @@ class PaidStatus(str, enum.Enum):
     PAID = "PAID"
 
 
+class MovementKind(str, enum.Enum):
+    SALE = "SALE"
+    RESTOCK = "RESTOCK"
+    COUNT = "COUNT"  # Stock count adjustment
+
+
 class PC(Base):
     __tablename__ = "pcs"
 
@@ -24,6 +31,7 @@ class PC(Base):
     clientUuid = Column(String(100), unique=True, nullable=False)
     lastSeenAt = Column(DateTime, default=datetime.utcnow)
     status = Column(Enum(PCStatus), default=PCStatus.OFFLINE)
+    venueId = Column(String(50), nullable=False, default=DEFAULT_VENUE, server_default=DEFAULT_VENUE, index=True)
 
     sessions = relationship("Session", back_populates="pc")
 
@@ -41,9 +49,18 @@ class Session(Base):
     amountDue = Column(Float, nullable=True)
     amountPaid = Column(Float, nullable=True)
     notes = Column(Text, nullable=True)
+    venueId = Column(String(50), nullable=False, default=DEFAULT_VENUE, server_default=DEFAULT_VENUE, index=True)
 
     pc = relationship("PC", back_populates="sessions")
 
+    __table_args__ = (
+        # At most one open session per PC, whichever worker writes it
+        Index(
+            "ux_sessions_open_pc", "pcId", unique=True,
+            sqlite_where=endAt.is_(None), postgresql_where=endAt.is_(None)
+        ),
+    )
+
 
 class Beverage(Base):
     __tablename__ = "beverages"
@@ -55,3 +72,130 @@ class Beverage(Base):
     pricePerUnit = Column(Float, nullable=False)
     createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
     updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    venueId = Column(String(50), nullable=False, default=DEFAULT_VENUE, server_default=DEFAULT_VENUE, index=True)
+
+
+class BeverageMovement(Base):
+    """Stock ledger - one row per sale, restock or count adjustment"""
+    __tablename__ = "beverage_movements"
+
+    id = Column(Integer, primary_key=True, index=True)
+    beverageId = Column(Integer, index=True, nullable=False)  # No FK: history outlives deleted beverages
+    kind = Column(Enum(MovementKind), nullable=False)
+    delta = Column(Integer, nullable=False)
+    quantityAfter = Column(Integer, nullable=False)
+    note = Column(Text, nullable=True)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BeverageTotals(Base):
+    """Running ledger totals per beverage, updated with each movement"""
+    __tablename__ = "beverage_totals"
+
+    beverageId = Column(Integer, ForeignKey("beverages.id"), primary_key=True)
+    sold = Column(Integer, default=0, nullable=False)
+    restocked = Column(Integer, default=0, nullable=False)
+    adjusted = Column(Integer, default=0, nullable=False)  # Net count corrections
+    updatedAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BroadcastMessage(Base):
+    """Short-lived WebSocket broadcasts shared between API workers (see services/broadcast_bus.py)"""
+    __tablename__ = "broadcast_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    payload = Column(Text, nullable=False)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class Event(Base):
+    """Append-only journal of every event received on /api/events"""
+    __tablename__ = "events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pcId = Column(String(100), index=True, nullable=False)
+    clientUuid = Column(String(100), nullable=False)
+    type = Column(String(20), nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Client time
+    receivedAt = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # Server time
+
+
+class EventReceipt(Base):
+    """Idempotency keys of applied start/stop events (see services/dedup.py)"""
+    __tablename__ = "event_receipts"
+
+    key = Column(String(250), primary_key=True)
+    pcId = Column(String(100), nullable=False)
+    type = Column(String(20), nullable=False)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class TelemetryValues:
+    """Station telemetry aggregated over an interval (see services/telemetry.py)"""
+    samples = Column(Integer, nullable=False)  # Local samples behind the aggregates
+    cpuAvg = Column(Float, nullable=True)  # Percent
+    cpuMax = Column(Float, nullable=True)
+    memAvg = Column(Float, nullable=True)  # Percent of RAM in use
+    memMax = Column(Float, nullable=True)
+    idleSeconds = Column(Integer, nullable=True)  # Longest time without user input
+    foreground = Column(String(100), nullable=True)  # Process in the foreground most of the time
+
+
+class TelemetrySample(TelemetryValues, Base):
+    """Telemetry as reported with each heartbeat, kept for a day"""
+    __tablename__ = "telemetry_raw"
+
+    id = Column(Integer, primary_key=True)
+    pcId = Column(String(100), nullable=False)
+    at = Column(DateTime, nullable=False, index=True)  # Server time
+
+    __table_args__ = (Index("ix_telemetry_raw_pc_at", "pcId", "at"),)
+
+
+class TelemetryMinute(TelemetryValues, Base):
+    """1-minute telemetry rollups"""
+    __tablename__ = "telemetry_minute"
+
+    pcId = Column(String(100), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # Start of the minute
+
+    __table_args__ = (Index("ix_telemetry_minute_bucket", "bucket"),)
+
+
+class TelemetryHour(TelemetryValues, Base):
+    """Hourly telemetry rollups"""
+    __tablename__ = "telemetry_hour"
+
+    pcId = Column(String(100), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour
+
+    __table_args__ = (Index("ix_telemetry_hour_bucket", "bucket"),)
+
+
+class JobStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class AdminJob(Base):
+    """Progress of long-running admin operations, visible to every worker"""
+    __tablename__ = "admin_jobs"
+
+    id = Column(String(36), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False)
+    processed = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, nullable=True)
+    detail = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    createdAt = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finishedAt = Column(DateTime, nullable=True)
+
+
+class SchemaVersion(Base):
+    """Single row holding the schema version applied by app/schema.py"""
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
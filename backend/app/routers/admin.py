@@ -1,40 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session as DBSession
+from typing import Optional
+import asyncio
+import hmac
 import logging
+import os
 
 from ..database import get_db
-from ..models import PC, Session
+from ..models import AdminJob
+from ..schemas import AdminJobBase, TracingSettings
+from ..services import admin_jobs
+from ..services.admission import admission
+from ..services.dedup import dedup
+from ..services.lanes import lanes
+from ..services.open_sessions import open_sessions
+from ..services.snapshot import snapshot
+from ..services import profiling
+from ..services.udp_heartbeat import udp_heartbeats
+from ..services.telemetry import telemetry
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 logger = logging.getLogger(__name__)
 
+# Profiling endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
-@router.delete("/reset-database")
-def reset_database(db: DBSession = Depends(get_db)):
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to enable this endpoint")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.delete("/reset-database", status_code=202)
+async def reset_database(background_tasks: BackgroundTasks):
     """
     DANGER: Delete all PCs and sessions from the database.
     This is irreversible and should only be used before production deployment.
+
+    Runs as a background job; poll GET /api/admin/jobs/{jobId} for progress.
+    """
+    job_id = await asyncio.to_thread(admin_jobs.create_job, admin_jobs.RESET_JOB)
+    if job_id is None:
+        raise HTTPException(status_code=409, detail="A database reset is already running")
+
+    background_tasks.add_task(admin_jobs.run_reset_job, job_id)
+    logger.info(f"Started database reset job {job_id}")
+
+    return {
+        "status": "accepted",
+        "message": "Database reset started",
+        "jobId": job_id
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=AdminJobBase)
+def get_job(job_id: str, db: DBSession = Depends(get_db)):
+    """Status and progress of a background admin job"""
+    job = db.query(AdminJob).filter(AdminJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+@router.get("/metrics")
+def get_metrics():
+    """Runtime counters for this worker"""
+    return {
+        "ingest": admission.stats(),
+        "lanes": lanes.stats(),
+        "dedup": dedup.stats(),
+        "snapshot": snapshot.stats(),
+        "openSessions": open_sessions.stats(),
+        "udpHeartbeats": udp_heartbeats.stats(),
+        "telemetry": telemetry.stats()
+    }
+
+
+@router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def capture_profile(
+    seconds: float = Query(10, gt=0, le=profiling.MAX_PROFILE_SECONDS),
+    intervalMs: float = Query(5, ge=1, le=1000)
+):
     """
-    try:
-        # Delete all sessions first (foreign key constraint)
-        sessions_deleted = db.query(Session).delete()
-
-        # Delete all PCs
-        pcs_deleted = db.query(PC).delete()
-
-        db.commit()
-
-        logger.info(f"Database reset: Deleted {pcs_deleted} PCs and {sessions_deleted} sessions")
-
-        return {
-            "status": "success",
-            "message": "Database cleared successfully",
-            "deleted": {
-                "pcs": pcs_deleted,
-                "sessions": sessions_deleted
-            }
-        }
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Failed to reset database: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to reset database: {str(e)}")
+    Sample this worker's stacks for `seconds` and return collapsed stacks
+    (feed to flamegraph.pl or speedscope).
+    """
+    stacks = await asyncio.to_thread(profiling.sample_stacks, seconds, intervalMs / 1000)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+    return stacks
+
+
+@router.get("/tracing", dependencies=[Depends(require_admin_token)])
+def get_tracing():
+    return profiling.tracer.settings()
+
+
+@router.put("/tracing", dependencies=[Depends(require_admin_token)])
+def set_tracing(settings: TracingSettings):
+    """Turn request tracing and slow-request logging on or off for this worker"""
+    profiling.tracer.configure(settings.enabled, settings.slowMs)
+    return profiling.tracer.settings()
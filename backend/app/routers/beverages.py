@@ -1,37 +1,243 @@
-from fastapi import APIRouter, Depends, HTTPException
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import update, insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session as DBSession
-from typing import List
+from typing import List, Optional
 import logging
 from datetime import datetime
 
-from ..database import get_db
-from ..models import Beverage
-from ..schemas import BeverageBase, BeverageCreate, BeverageUpdate
+from ..database import get_db, get_read_db
+from ..services.beverage_catalog import catalog, CHANGE_MESSAGE_TYPE
+from ..services.websocket_manager import manager
+from ..models import Beverage, BeverageMovement, BeverageTotals, MovementKind
+from ..schemas import (
+    BeverageBase, BeverageCreate, BeverageUpdate, StockOperation, BulkStockUpdate,
+    BulkStockResult, BeverageMovementBase, BeverageStockReport
+)
+from ..venues import DEFAULT_VENUE, get_venue
 
 router = APIRouter(prefix="/api", tags=["beverages"])
 logger = logging.getLogger(__name__)
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header (a list of ETags, weak or not, or *) matches etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
 @router.get("/beverages", response_model=List[BeverageBase])
-def get_beverages(db: DBSession = Depends(get_db)):
-    """Get all beverages in inventory"""
-    beverages = db.query(Beverage).order_by(Beverage.name).all()
-    return beverages
+def get_beverages(request: Request, venue: str = Depends(get_venue), db: DBSession = Depends(get_read_db)):
+    """Get all beverages in inventory (cached, supports If-None-Match)"""
+    _, body, etag = catalog.get(db, venue)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def publish_catalog(db: DBSession, venue: str = DEFAULT_VENUE):
+    """
+    Rebuild the venue's cached catalog and push it to its WebSocket clients.
+
+    Called from the sync handlers' worker thread: the catalog is built here
+    and only the broadcast runs on the event loop.
+    """
+    catalog.invalidate(venue)
+    try:
+        data, _, _ = catalog.get(db, venue)
+        from_thread.run(manager.broadcast, {
+            "type": CHANGE_MESSAGE_TYPE,
+            "venueId": venue,
+            "data": data
+        })
+    except Exception as e:
+        logger.error(f"Failed to broadcast beverage catalog: {e}")
+
+
+def apply_stock_operations(
+    db: DBSession,
+    operations: List[StockOperation],
+    venue: str = DEFAULT_VENUE
+) -> List[BeverageMovement]:
+    """
+    Apply stock operations to the venue's beverages inside the caller's transaction.
+
+    Sales and restocks are atomic `quantity = quantity + delta` UPDATEs, so
+    concurrent tills never lose updates; a sale only applies while enough
+    stock is left. Counts lock the row before setting the counted quantity.
+    Every operation is written to the ledger and the running totals are
+    upserted once per beverage.
+    """
+    now = datetime.utcnow()
+    movements = []
+    totals = {}
+
+    # Touch rows in id order so concurrent bulk updates cannot deadlock
+    for op in sorted(operations, key=lambda o: o.beverageId):
+        if op.kind == "count":
+            current = db.query(Beverage.quantity).filter(
+                Beverage.id == op.beverageId,
+                Beverage.venueId == venue
+            ).with_for_update().scalar()
+            if current is None:
+                raise HTTPException(status_code=404, detail=f"Beverage {op.beverageId} not found")
+            kind, delta = MovementKind.COUNT, op.quantity - current
+            new_value = op.quantity
+        else:
+            kind = MovementKind.SALE if op.kind == "sale" else MovementKind.RESTOCK
+            delta = -op.quantity if kind == MovementKind.SALE else op.quantity
+            new_value = Beverage.quantity + delta
+
+        statement = update(Beverage).where(Beverage.id == op.beverageId, Beverage.venueId == venue)
+        if kind == MovementKind.SALE:
+            statement = statement.where(Beverage.quantity >= op.quantity)
+        quantity_after = db.execute(
+            statement.values(quantity=new_value, updatedAt=now).returning(Beverage.quantity)
+        ).scalar()
+        if quantity_after is None:
+            exists = db.query(Beverage.id).filter(Beverage.id == op.beverageId, Beverage.venueId == venue).first()
+            if exists:
+                raise HTTPException(status_code=409, detail=f"Not enough stock of beverage {op.beverageId}")
+            raise HTTPException(status_code=404, detail=f"Beverage {op.beverageId} not found")
+
+        movements.append({
+            "beverageId": op.beverageId,
+            "kind": kind,
+            "delta": delta,
+            "quantityAfter": quantity_after,
+            "note": op.note,
+            "createdAt": now,
+        })
+
+        sold, restocked, adjusted = totals.get(op.beverageId, (0, 0, 0))
+        if kind == MovementKind.SALE:
+            sold += op.quantity
+        elif kind == MovementKind.RESTOCK:
+            restocked += op.quantity
+        else:
+            adjusted += delta
+        totals[op.beverageId] = (sold, restocked, adjusted)
+
+    if not movements:
+        return []
+
+    rows = db.execute(insert(BeverageMovement).returning(BeverageMovement, sort_by_parameter_order=True), movements).scalars().all()
+
+    # One INSERT ... ON CONFLICT DO UPDATE, so two tills creating a beverage's totals row can't collide
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    upsert = dialect.insert(BeverageTotals).values([
+        {"beverageId": beverage_id, "sold": sold, "restocked": restocked, "adjusted": adjusted, "updatedAt": now}
+        for beverage_id, (sold, restocked, adjusted) in totals.items()
+    ])
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[BeverageTotals.beverageId],
+        set_={
+            "sold": BeverageTotals.sold + upsert.excluded.sold,
+            "restocked": BeverageTotals.restocked + upsert.excluded.restocked,
+            "adjusted": BeverageTotals.adjusted + upsert.excluded.adjusted,
+            "updatedAt": upsert.excluded.updatedAt,
+        }
+    ))
+
+    return rows
+
+
+@router.post("/beverages/stock", response_model=BulkStockResult)
+def bulk_update_stock(
+    stock_update: BulkStockUpdate,
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_db)
+):
+    """Apply many sales, restocks and stock counts in one transaction"""
+    try:
+        movements = apply_stock_operations(db, stock_update.operations, venue)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    publish_catalog(db, venue)
+
+    beverage_ids = {m.beverageId for m in movements}
+    beverages = db.query(Beverage).filter(Beverage.id.in_(beverage_ids)).order_by(Beverage.name).all()
+
+    logger.info(f"Applied {len(movements)} stock operations to {len(beverage_ids)} beverages")
+    return {"beverages": beverages, "movements": movements}
+
+
+@router.get("/beverages/stock-report", response_model=List[BeverageStockReport])
+def get_stock_report(venue: str = Depends(get_venue), db: DBSession = Depends(get_read_db)):
+    """Current stock and running ledger totals, without scanning the ledger"""
+    rows = db.query(Beverage, BeverageTotals).outerjoin(
+        BeverageTotals, BeverageTotals.beverageId == Beverage.id
+    ).filter(Beverage.venueId == venue).order_by(Beverage.name).all()
+
+    return [
+        BeverageStockReport(
+            beverageId=beverage.id,
+            name=beverage.name,
+            quantity=beverage.quantity,
+            expectedStock=beverage.expectedStock,
+            sold=totals.sold if totals else 0,
+            restocked=totals.restocked if totals else 0,
+            adjusted=totals.adjusted if totals else 0
+        )
+        for beverage, totals in rows
+    ]
+
+
+@router.get("/beverages/{beverage_id}/movements", response_model=List[BeverageMovementBase])
+def get_beverage_movements(
+    beverage_id: int,
+    limit: int = 100,
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_read_db)
+):
+    """Most recent ledger entries for a beverage"""
+    # History of deleted beverages stays readable; other venues' beverages don't
+    beverage_venue = db.query(Beverage.venueId).filter(Beverage.id == beverage_id).scalar()
+    if beverage_venue is not None and beverage_venue != venue:
+        raise HTTPException(status_code=404, detail="Beverage not found")
+
+    return db.query(BeverageMovement).filter(
+        BeverageMovement.beverageId == beverage_id
+    ).order_by(BeverageMovement.id.desc()).limit(limit).all()
 
 
 @router.post("/beverages", response_model=BeverageBase)
-def create_beverage(beverage: BeverageCreate, db: DBSession = Depends(get_db)):
+def create_beverage(
+    beverage: BeverageCreate,
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_db)
+):
     """Add new beverage to inventory"""
     db_beverage = Beverage(
         name=beverage.name,
-        quantity=beverage.quantity,
+        quantity=0,
         expectedStock=beverage.expectedStock,
-        pricePerUnit=beverage.pricePerUnit
+        pricePerUnit=beverage.pricePerUnit,
+        venueId=venue
     )
     db.add(db_beverage)
+    db.flush()
+
+    # Opening stock goes through the ledger like any other count
+    if beverage.quantity:
+        apply_stock_operations(db, [
+            StockOperation(beverageId=db_beverage.id, kind="count", quantity=beverage.quantity, note="Initial stock")
+        ], venue)
     db.commit()
     db.refresh(db_beverage)
 
+    publish_catalog(db, venue)
+
     logger.info(f"Created beverage: {beverage.name} (qty: {beverage.quantity}, expected: {beverage.expectedStock}, price: ${beverage.pricePerUnit})")
     return db_beverage
 
@@ -40,16 +246,22 @@ def create_beverage(beverage: BeverageCreate, db: DBSession = Depends(get_db)):
 def update_beverage(
     beverage_id: int,
     beverage_update: BeverageUpdate,
+    venue: str = Depends(get_venue),
     db: DBSession = Depends(get_db)
 ):
     """Update beverage information"""
-    beverage = db.query(Beverage).filter(Beverage.id == beverage_id).first()
+    beverage = db.query(Beverage).filter(Beverage.id == beverage_id, Beverage.venueId == venue).first()
 
     if not beverage:
         raise HTTPException(status_code=404, detail="Beverage not found")
 
     update_data = beverage_update.model_dump(exclude_unset=True)
 
+    # Stock changes are recorded as count adjustments in the ledger
+    quantity = update_data.pop("quantity", None)
+    if quantity is not None:
+        apply_stock_operations(db, [StockOperation(beverageId=beverage_id, kind="count", quantity=quantity)], venue)
+
     for field, value in update_data.items():
         setattr(beverage, field, value)
 
@@ -57,22 +269,29 @@ def update_beverage(
 
     db.commit()
     db.refresh(beverage)
+    publish_catalog(db, venue)
 
     logger.info(f"Updated beverage {beverage_id}: {beverage.name}")
     return beverage
 
 
 @router.delete("/beverages/{beverage_id}")
-def delete_beverage(beverage_id: int, db: DBSession = Depends(get_db)):
+def delete_beverage(
+    beverage_id: int,
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_db)
+):
     """Remove beverage from inventory"""
-    beverage = db.query(Beverage).filter(Beverage.id == beverage_id).first()
+    beverage = db.query(Beverage).filter(Beverage.id == beverage_id, Beverage.venueId == venue).first()
 
     if not beverage:
         raise HTTPException(status_code=404, detail="Beverage not found")
 
     beverage_name = beverage.name
+    db.query(BeverageTotals).filter(BeverageTotals.beverageId == beverage_id).delete()
     db.delete(beverage)
     db.commit()
+    publish_catalog(db, venue)
 
     logger.info(f"Deleted beverage: {beverage_name}")
     return {"status": "success", "message": f"Beverage '{beverage_name}' deleted"}
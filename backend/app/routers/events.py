@@ -1,13 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session as DBSession
 from datetime import datetime, timezone
+from typing import Optional
+import asyncio
 import logging
 
 from ..database import get_db
-from ..models import PC, Session, PCStatus, PaidStatus
 from ..schemas import EventCreate
 from ..services.websocket_manager import manager
-from .websocket import get_pcs_with_sessions
+from ..services.snapshot import snapshot
+from ..services.event_journal import journal
+from ..services.admission import admission, Overloaded
+from ..services.lanes import lanes
+from ..services.ingest import apply_event
+from ..services.dedup import dedup, event_key, event_result, DuplicateEvent
+from ..services.telemetry import telemetry
+from ..services.profiling import span
 
 router = APIRouter(prefix="/api", tags=["events"])
 logger = logging.getLogger(__name__)
@@ -22,98 +30,83 @@ def normalize_timestamp(dt: datetime) -> datetime:
 
 @router.post("/events")
 async def handle_event(event: EventCreate, db: DBSession = Depends(get_db)):
+    # Normalize timestamp for SQLite compatibility
+    timestamp = normalize_timestamp(event.timestamp)
+    key = event_key(event.clientUuid, event.idempotencyKey, event.type, timestamp)
+
+    try:
+        # One PC's events apply in order; waiting in its lane holds no processing slot
+        async with lanes.hold(event.pcId):
+            # A retry of an event applied recently: answer without touching the database
+            result = dedup.recent(key)
+            if result is not None:
+                return result
+
+            # start/stop change sessions and must not be starved by heartbeats
+            async with admission.admit(priority=event.type != "heartbeat"):
+                return await process_event(event, timestamp, key, db)
+    except Overloaded as e:
+        logger.warning(f"Rejected {event.type} from {event.pcId}: ingestion overloaded")
+        raise HTTPException(
+            status_code=503,
+            detail="Event ingestion overloaded, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+def apply_once(db: DBSession, event: EventCreate, timestamp: datetime, key: str) -> Optional[str]:
+    """Apply an event unless its key was already applied, returns the PC's venue (None for a duplicate)"""
+    # start/stop receipts are kept in the database, so any worker recognizes their retries
+    persistent = event.type != "heartbeat"
+    if persistent and dedup.persisted(db, key) is not None:
+        return None
+
+    # Journal the raw event (buffered, flushed in bulk in the background)
+    journal.add({
+        "pcId": event.pcId,
+        "clientUuid": event.clientUuid,
+        "type": event.type,
+        "timestamp": timestamp,
+        "receivedAt": datetime.utcnow(),
+    })
+
     try:
-        # Normalize timestamp for SQLite compatibility
-        timestamp = normalize_timestamp(event.timestamp)
-
-        # Find or create PC
-        pc = db.query(PC).filter(PC.pcId == event.pcId).first()
-
-        if not pc:
-            pc = PC(
-                pcId=event.pcId,
-                clientUuid=event.clientUuid,
-                lastSeenAt=datetime.utcnow(),
-                status=PCStatus.OFFLINE
-            )
-            db.add(pc)
-            db.commit()
-            db.refresh(pc)
-
-        # Update lastSeenAt with server time (not client time) to avoid clock drift issues
-        pc.lastSeenAt = datetime.utcnow()
-
-        if event.type == "start":
-            pc.status = PCStatus.ONLINE
-
-            # Close any existing open session for this PC
-            open_session = db.query(Session).filter(
-                Session.pcId == event.pcId,
-                Session.endAt.is_(None)
-            ).first()
-
-            if open_session:
-                open_session.endAt = timestamp
-                open_session.durationSeconds = int(
-                    (timestamp - open_session.startAt).total_seconds()
-                )
-
-            # Create new session
-            new_session = Session(
-                pcId=event.pcId,
-                startAt=timestamp,
-                paidStatus=PaidStatus.UNPAID
-            )
-            db.add(new_session)
-
-        elif event.type == "heartbeat":
-            pc.status = PCStatus.ONLINE
-
-            # Auto-create session if PC is online but has no active session
-            open_session = db.query(Session).filter(
-                Session.pcId == event.pcId,
-                Session.endAt.is_(None)
-            ).first()
-
-            if not open_session:
-                # No active session exists - create one automatically
-                logger.info(f"Auto-creating session for {event.pcId} (heartbeat received without active session)")
-                new_session = Session(
-                    pcId=event.pcId,
-                    startAt=timestamp,
-                    paidStatus=PaidStatus.UNPAID
-                )
-                db.add(new_session)
-
-        elif event.type == "stop":
-            pc.status = PCStatus.OFFLINE
-
-            # Close open session
-            open_session = db.query(Session).filter(
-                Session.pcId == event.pcId,
-                Session.endAt.is_(None)
-            ).first()
-
-            if open_session:
-                open_session.endAt = timestamp
-                open_session.durationSeconds = int(
-                    (timestamp - open_session.startAt).total_seconds()
-                )
-
-        db.commit()
-
-        # Broadcast update to all WebSocket clients
+        venue = apply_event(
+            db, event.pcId, event.clientUuid, event.type, timestamp, event.venueId,
+            receipt=dedup.receipt(key, event.pcId, event.type) if persistent else None
+        )
+    except DuplicateEvent:
+        return None
+    dedup.remember(key, event_result(event.pcId, event.type), applied=True)
+    if event.telemetry is not None:
+        telemetry.record(event.pcId, event.telemetry.model_dump())
+    if persistent:
+        dedup.prune(db)
+    return venue
+
+
+async def process_event(event: EventCreate, timestamp: datetime, key: str, db: DBSession):
+    try:
+        # Database work runs in the threadpool so other PCs' events proceed meanwhile
+        with span("apply_event"):
+            venue = await asyncio.to_thread(apply_once, db, event, timestamp, key)
+        if venue is None:
+            return event_result(event.pcId, event.type)
+
+        # Broadcast update to the venue's WebSocket clients
         try:
-            pcs = get_pcs_with_sessions(db)
+            with span("snapshot"):
+                data = await asyncio.to_thread(snapshot.refresh, db, venue)
             await manager.broadcast({
                 "type": "update",
-                "data": [pc.model_dump() for pc in pcs]
+                "venueId": venue,
+                "data": data
             })
         except Exception as e:
             logger.error(f"Failed to broadcast WebSocket update: {e}")
 
-        return {"status": "ok", "pcId": event.pcId, "eventType": event.type}
+        return event_result(event.pcId, event.type)
     except Exception as e:
         db.rollback()
-        print(f"Error handling event: {str(e)}")
+        logger.exception(f"Error handling {event.type} event from {event.pcId}")
         raise HTTPException(status_code=500, detail=f"Error processing event: {str(e)}")
@@ -1,14 +1,20 @@
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import update
 from sqlalchemy.orm import Session as DBSession
 from datetime import datetime, date
 from typing import List, Optional
 import logging
 
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..models import Session, PaidStatus
-from ..schemas import SessionBase, SessionUpdate
+from ..schemas import SessionBase, SessionUpdate, RepriceRequest
 from ..services.websocket_manager import manager
-from .websocket import get_pcs_with_sessions
+from ..services.snapshot import snapshot
+from ..services import billing
+from ..services.ingest import close_open_session
+from ..services.open_sessions import open_sessions, to_entry
+from ..venues import get_venue
 
 router = APIRouter(prefix="/api", tags=["sessions"])
 logger = logging.getLogger(__name__)
@@ -21,9 +27,10 @@ def get_sessions(
     user: Optional[str] = Query(None, description="Filter by user name"),
     dateFrom: Optional[date] = Query(None, description="Filter from date"),
     dateTo: Optional[date] = Query(None, description="Filter to date"),
-    db: DBSession = Depends(get_db)
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_read_db)
 ):
-    query = db.query(Session)
+    query = db.query(Session).filter(Session.venueId == venue)
 
     if status:
         query = query.filter(Session.paidStatus == status)
@@ -44,70 +51,106 @@ def get_sessions(
     return sessions
 
 
-@router.patch("/sessions/{session_id}", response_model=SessionBase)
-async def update_session(
-    session_id: int,
-    session_update: SessionUpdate,
-    db: DBSession = Depends(get_db)
-):
-    session = db.query(Session).filter(Session.id == session_id).first()
+@router.post("/sessions/reprice")
+def reprice_sessions(reprice: RepriceRequest, db: DBSession = Depends(get_db)):
+    """Recompute amountDue for closed sessions with the configured tariff"""
+    if billing.tariff is None:
+        raise HTTPException(status_code=400, detail="No tariff configured")
 
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        updated = billing.reprice_sessions(db, reprice.dateFrom, reprice.dateTo, reprice.overwrite)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to reprice sessions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to reprice sessions: {str(e)}")
 
-    update_data = session_update.model_dump(exclude_unset=True)
+    logger.info(f"Repriced {updated} sessions")
+    return {"status": "ok", "updated": updated}
 
-    for field, value in update_data.items():
-        if field == "paidStatus" and value:
-            setattr(session, field, PaidStatus(value))
-        else:
-            setattr(session, field, value)
 
-    db.commit()
-    db.refresh(session)
+def publish_snapshot(db: DBSession, venue: str):
+    """
+    Rebuild the venue's fleet snapshot and push it to its WebSocket clients.
 
-    # Broadcast update to all WebSocket clients
+    Called from the sync handlers' worker thread: the rebuild runs here and
+    only the broadcast runs on the event loop.
+    """
     try:
-        pcs = get_pcs_with_sessions(db)
-        await manager.broadcast({
-            "type": "update",
-            "data": [pc.model_dump() for pc in pcs]
-        })
+        data = snapshot.refresh(db, venue)
+        from_thread.run(manager.broadcast, {"type": "update", "venueId": venue, "data": data})
     except Exception as e:
         logger.error(f"Failed to broadcast WebSocket update: {e}")
 
-    return session
-
 
-@router.post("/sessions/{session_id}/close", response_model=SessionBase)
-async def close_session(
+@router.patch("/sessions/{session_id}", response_model=SessionBase)
+def update_session(
     session_id: int,
+    session_update: SessionUpdate,
+    venue: str = Depends(get_venue),
     db: DBSession = Depends(get_db)
 ):
-    session = db.query(Session).filter(Session.id == session_id).first()
+    update_data = session_update.model_dump(exclude_unset=True)
+    if update_data.get("paidStatus"):
+        update_data["paidStatus"] = PaidStatus(update_data["paidStatus"])
+
+    if update_data:
+        # Single UPDATE ... RETURNING, no load before saving
+        session = db.scalars(
+            update(Session)
+            .where(Session.id == session_id, Session.venueId == venue)
+            .values(**update_data)
+            .returning(Session)
+        ).first()
+    else:
+        session = db.query(Session).filter(Session.id == session_id, Session.venueId == venue).first()
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    if session.endAt:
-        raise HTTPException(status_code=400, detail="Session already closed")
+    result = SessionBase.model_validate(session)
+    db.commit()
+    if result.endAt is None:
+        open_sessions.set(result.pcId, to_entry(result))
 
-    session.endAt = datetime.utcnow()
-    session.durationSeconds = int(
-        (session.endAt - session.startAt).total_seconds()
-    )
+    publish_snapshot(db, venue)
 
+    return result
+
+
+@router.post("/sessions/{session_id}/close", response_model=SessionBase)
+def close_session(
+    session_id: int,
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_db)
+):
+    session = None
+    pc_id = open_sessions.find(session_id)
+    if pc_id:
+        entry = open_sessions.get(db, pc_id)
+        if entry is not None and entry["venueId"] == venue:
+            session = close_open_session(db, pc_id, entry, datetime.utcnow())
+
+    if session is None:
+        # Not known to be open here: load it to report why, or close it
+        session = db.query(Session).filter(Session.id == session_id, Session.venueId == venue).first()
+
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        if session.endAt:
+            raise HTTPException(status_code=400, detail="Session already closed")
+
+        session.endAt = datetime.utcnow()
+        session.durationSeconds = int(
+            (session.endAt - session.startAt).total_seconds()
+        )
+        billing.bill_closed_session(session)
+        db.flush()
+
+    result = SessionBase.model_validate(session)
     db.commit()
-    db.refresh(session)
+    open_sessions.discard(result.pcId, result.id)
 
-    # Broadcast update to all WebSocket clients
-    try:
-        pcs = get_pcs_with_sessions(db)
-        await manager.broadcast({
-            "type": "update",
-            "data": [pc.model_dump() for pc in pcs]
-        })
-    except Exception as e:
-        logger.error(f"Failed to broadcast WebSocket update: {e}")
+    publish_snapshot(db, venue)
 
-    return session
+    return result
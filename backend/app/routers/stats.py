@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session as DBSession
+from datetime import date
+import logging
+
+from ..database import get_read_db
+from ..services.occupancy import occupancy
+from ..venues import get_venue
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+logger = logging.getLogger(__name__)
+
+MAX_RANGE_DAYS = 366
+
+
+@router.get("/occupancy")
+def get_occupancy(
+    dateFrom: date = Query(..., description="First day (UTC)"),
+    dateTo: date = Query(..., description="Last day (UTC), inclusive"),
+    bucketMinutes: int = Query(15, description="Bucket size, must divide a day"),
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_read_db)
+):
+    """Busy stations per time bucket and utilization per PC"""
+    if dateTo < dateFrom:
+        raise HTTPException(status_code=400, detail="dateTo must not be before dateFrom")
+    if (dateTo - dateFrom).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+    if bucketMinutes <= 0 or (24 * 60) % bucketMinutes:
+        raise HTTPException(status_code=400, detail="bucketMinutes must divide 1440")
+
+    return occupancy.compute(db, dateFrom, dateTo, bucketMinutes, venue)
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session as DBSession
+from datetime import datetime, timedelta
+from typing import Literal, Optional
+
+from ..database import get_read_db
+from ..models import PC
+from ..services.telemetry import telemetry, naive_utc
+from ..venues import get_venue
+
+router = APIRouter(prefix="/api", tags=["telemetry"])
+
+MAX_POINTS = 10000
+DEFAULT_RANGE = timedelta(hours=24)
+
+
+@router.get("/pcs/{pc_id}/telemetry")
+def get_telemetry(
+    pc_id: str,
+    start: Optional[datetime] = Query(None, alias="from", description="Default: 24 hours before to"),
+    end: Optional[datetime] = Query(None, alias="to", description="Default: now"),
+    resolution: Literal["auto", "raw", "minute", "hour"] = Query("auto"),
+    maxPoints: int = Query(1000, ge=1, le=MAX_POINTS, description="Target series length for resolution=auto"),
+    venue: str = Depends(get_venue),
+    db: DBSession = Depends(get_read_db)
+):
+    """CPU, memory, idle time and foreground process of one PC as columnar series"""
+    # Times without a timezone are UTC
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - DEFAULT_RANGE
+    if end <= start:
+        raise HTTPException(status_code=400, detail="to must be after from")
+
+    if not db.query(PC.id).filter(PC.pcId == pc_id, PC.venueId == venue).first():
+        raise HTTPException(status_code=404, detail="PC not found")
+
+    if resolution == "auto":
+        resolution = telemetry.pick_resolution(start, end, maxPoints)
+    elif telemetry.estimated_points(start, end, resolution) > MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"More than {MAX_POINTS} points, use a shorter range or a coarser resolution"
+        )
+
+    return telemetry.series(db, pc_id, start, end, resolution)
@@ -1,80 +1,41 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session as DBSession
-from datetime import datetime, timedelta
+from typing import Optional
 import logging
 
 from ..database import SessionLocal
 from ..services.websocket_manager import manager
-from ..models import PC, Session, PCStatus
-from ..schemas import PCWithSession, SessionBase
+from ..services.snapshot import snapshot
+from ..services.ws_encoding import parse_format
+from ..venues import DEFAULT_VENUE, is_valid_venue
 
 router = APIRouter(tags=["websocket"])
 logger = logging.getLogger(__name__)
 
-# Same threshold as pcs.py for consistency
-OFFLINE_THRESHOLD_MINUTES = 0.75
-
-
-def get_pcs_with_sessions(db: DBSession):
-    """Get all PCs with their active sessions (same logic as /api/pcs endpoint)"""
-    # Update offline status for PCs that haven't sent heartbeat
-    threshold = datetime.utcnow() - timedelta(minutes=OFFLINE_THRESHOLD_MINUTES)
-
-    stale_pcs = db.query(PC).filter(
-        PC.status == PCStatus.ONLINE,
-        PC.lastSeenAt < threshold
-    ).all()
-
-    for pc in stale_pcs:
-        pc.status = PCStatus.OFFLINE
-        # Close any open sessions
-        open_session = db.query(Session).filter(
-            Session.pcId == pc.pcId,
-            Session.endAt.is_(None)
-        ).first()
-        if open_session:
-            open_session.endAt = pc.lastSeenAt
-            open_session.durationSeconds = int(
-                (pc.lastSeenAt - open_session.startAt).total_seconds()
-            )
-
-    db.commit()
-
-    # Get all PCs with their active sessions
-    pcs = db.query(PC).order_by(PC.pcId).all()
-    result = []
-
-    for pc in pcs:
-        active_session = db.query(Session).filter(
-            Session.pcId == pc.pcId,
-            Session.endAt.is_(None)
-        ).first()
-
-        pc_data = PCWithSession(
-            id=pc.id,
-            pcId=pc.pcId,
-            clientUuid=pc.clientUuid,
-            lastSeenAt=pc.lastSeenAt,
-            status=pc.status.value,
-            activeSession=SessionBase.model_validate(active_session) if active_session else None
-        )
-        result.append(pc_data)
-
-    return result
-
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    venue: str = DEFAULT_VENUE,
+    encoding: Optional[str] = None,
+    layout: Optional[str] = None
+):
+    if not is_valid_venue(venue):
+        await websocket.close(code=1008, reason="Invalid venue")
+        return
+
+    # Optional compact formats: ?encoding=msgpack and/or ?layout=columnar
+    await manager.connect(websocket, parse_format(encoding, layout), venue)
 
     try:
         # Send initial state immediately upon connection
         db: DBSession = SessionLocal()
         try:
-            pcs = get_pcs_with_sessions(db)
-            await websocket.send_json({
+            await manager.send(websocket, {
                 "type": "initial_state",
-                "data": [pc.model_dump() for pc in pcs]
+                "venueId": venue,
+                "data": await run_in_threadpool(snapshot.get, db, venue)
             })
         finally:
             db.close()
@@ -83,7 +44,7 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_json({"type": "pong"})
+                await manager.send(websocket, {"type": "pong"})
 
     except WebSocketDisconnect:
         logger.info("Client disconnected normally")
@@ -0,0 +1,94 @@
+"""
+Schema management at startup.
+
+The database records the schema version it was built for. When it matches
+SCHEMA_VERSION, startup does no DDL at all; otherwise missing tables are
+created, pending migrations run and the version is stored.
+"""
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import Base
+from .models import SchemaVersion
+from .venues import DEFAULT_VENUE
+
+logger = logging.getLogger(__name__)
+
+# Bump when models change and add the matching statements to MIGRATIONS
+SCHEMA_VERSION = 6
+
+# version -> statements that upgrade a database from version - 1.
+# New tables are handled by create_all; only changes to existing ones go here.
+MIGRATIONS = {
+    2: [],  # admin_jobs table
+    3: [
+        # Venue (tenant) key; existing rows belong to the default venue
+        *[
+            statement
+            for table in ("pcs", "sessions", "beverages")
+            for statement in (
+                f'ALTER TABLE {table} ADD COLUMN "venueId" VARCHAR(50) NOT NULL DEFAULT \'{DEFAULT_VENUE}\'',
+                f'CREATE INDEX "ix_{table}_venueId" ON {table} ("venueId")',
+            )
+        ],
+    ],
+    4: [
+        # Keep only the newest open session per PC before enforcing one
+        'UPDATE sessions SET "endAt" = "startAt", "durationSeconds" = 0 '
+        'WHERE "endAt" IS NULL AND id NOT IN '
+        '(SELECT MAX(id) FROM sessions WHERE "endAt" IS NULL GROUP BY "pcId")',
+        'CREATE UNIQUE INDEX ux_sessions_open_pc ON sessions ("pcId") WHERE "endAt" IS NULL',
+    ],
+    5: [],  # event_receipts table
+    6: [],  # telemetry_raw, telemetry_minute and telemetry_hour tables
+}
+
+# Serializes schema upgrades when several workers start at once (Postgres)
+ADVISORY_LOCK_ID = 7204019
+
+
+def current_version(engine):
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    except SQLAlchemyError:
+        return None  # Table doesn't exist yet
+
+
+def ensure_schema(engine) -> bool:
+    """Bring the schema up to date, returns True if any DDL was run"""
+    if current_version(engine) == SCHEMA_VERSION:
+        logger.info(f"Database schema is current (version {SCHEMA_VERSION})")
+        return False
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+
+        # Another worker may have finished the upgrade while we waited
+        if engine.dialect.has_table(conn, SchemaVersion.__tablename__):
+            version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 1
+        elif engine.dialect.has_table(conn, "pcs"):
+            version = 1  # Created before schema versioning
+        else:
+            version = SCHEMA_VERSION  # Empty database, create_all builds the current schema
+        if version == SCHEMA_VERSION and engine.dialect.has_table(conn, SchemaVersion.__tablename__):
+            return False
+
+        if version == SCHEMA_VERSION:
+            logger.info(f"Creating database schema (version {SCHEMA_VERSION})")
+        else:
+            logger.info(f"Upgrading database schema from version {version} to {SCHEMA_VERSION}")
+        Base.metadata.create_all(bind=conn)
+
+        for step in range(version + 1, SCHEMA_VERSION + 1):
+            for statement in MIGRATIONS.get(step, []):
+                conn.execute(text(statement))
+
+        conn.execute(SchemaVersion.__table__.delete())
+        conn.execute(SchemaVersion.__table__.insert().values(version=SCHEMA_VERSION))
+
+    return True
@@ -1,6 +1,40 @@
-from pydantic import BaseModel, field_serializer
-from datetime import datetime, timezone
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, field_serializer, field_validator
+from datetime import date, datetime, timezone
+from typing import Optional, Literal, List
+
+from .venues import DEFAULT_VENUE, is_valid_venue
+
+
+class TelemetrySummary(BaseModel):
+    """Station telemetry aggregated by the client over one heartbeat interval"""
+    samples: int = 1
+    cpuAvg: Optional[float] = None  # Percent
+    cpuMax: Optional[float] = None
+    memAvg: Optional[float] = None  # Percent of RAM in use
+    memMax: Optional[float] = None
+    idleSeconds: Optional[int] = None  # Time without user input
+    foreground: Optional[str] = None  # Executable name
+
+    # Out-of-range values are clamped rather than rejected, so odd readings never cost a heartbeat
+    @field_validator('samples')
+    @classmethod
+    def clamp_samples(cls, samples: int) -> int:
+        return max(samples, 1)
+
+    @field_validator('cpuAvg', 'cpuMax', 'memAvg', 'memMax')
+    @classmethod
+    def clamp_percent(cls, value: Optional[float]) -> Optional[float]:
+        return None if value is None else min(max(value, 0.0), 100.0)
+
+    @field_validator('idleSeconds')
+    @classmethod
+    def clamp_idle(cls, seconds: Optional[int]) -> Optional[int]:
+        return None if seconds is None else max(seconds, 0)
+
+    @field_validator('foreground')
+    @classmethod
+    def truncate_foreground(cls, name: Optional[str]) -> Optional[str]:
+        return name[:100] if name else None
 
 
 class EventCreate(BaseModel):
@@ -8,6 +42,24 @@ class EventCreate(BaseModel):
     clientUuid: str
     type: Literal["start", "heartbeat", "stop"]
     timestamp: datetime
+    venueId: Optional[str] = None  # Only used when a PC reports for the first time
+    # Same key = same event; defaults to type + timestamp, so a retry must resend the same payload
+    idempotencyKey: Optional[str] = None
+    telemetry: Optional[TelemetrySummary] = None  # Sent with heartbeats
+
+    @field_validator('venueId')
+    @classmethod
+    def check_venue(cls, venue: Optional[str]) -> Optional[str]:
+        if venue is not None and not is_valid_venue(venue):
+            raise ValueError("Invalid venue")
+        return venue
+
+    @field_validator('idempotencyKey')
+    @classmethod
+    def check_idempotency_key(cls, key: Optional[str]) -> Optional[str]:
+        if key is not None and not 0 < len(key) <= 100:
+            raise ValueError("idempotencyKey must be 1-100 characters")
+        return key
 
 
 class SessionBase(BaseModel):
@@ -21,6 +73,7 @@ class SessionBase(BaseModel):
     amountDue: Optional[float] = None
     amountPaid: Optional[float] = None
     notes: Optional[str] = None
+    venueId: str = DEFAULT_VENUE
 
     @field_serializer('startAt', 'endAt')
     def serialize_datetime(self, dt: Optional[datetime], _info) -> Optional[str]:
@@ -43,12 +96,19 @@ class SessionUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class RepriceRequest(BaseModel):
+    dateFrom: Optional[date] = None
+    dateTo: Optional[date] = None
+    overwrite: bool = False  # Also replace amounts set by staff
+
+
 class PCBase(BaseModel):
     id: int
     pcId: str
     clientUuid: str
     lastSeenAt: datetime
     status: str
+    venueId: str = DEFAULT_VENUE
 
     @field_serializer('lastSeenAt')
     def serialize_datetime(self, dt: datetime, _info) -> str:
@@ -63,6 +123,7 @@ class PCBase(BaseModel):
 
 class PCWithSession(PCBase):
     activeSession: Optional[SessionBase] = None
+    liveCost: Optional[float] = None  # Projected amountDue if the session closed now
 
 
 class BeverageBase(BaseModel):
@@ -73,6 +134,7 @@ class BeverageBase(BaseModel):
     pricePerUnit: float
     createdAt: datetime
     updatedAt: datetime
+    venueId: str = DEFAULT_VENUE
 
     @field_serializer('createdAt', 'updatedAt')
     def serialize_datetime(self, dt: Optional[datetime], _info) -> Optional[str]:
@@ -88,13 +150,86 @@ class BeverageBase(BaseModel):
 
 class BeverageCreate(BaseModel):
     name: str
-    quantity: int = 0  # Actual counted stock
+    quantity: int = Field(0, ge=0)  # Actual counted stock
     expectedStock: int = 0  # Normal/target stock level
     pricePerUnit: float
 
 
 class BeverageUpdate(BaseModel):
     name: Optional[str] = None
-    quantity: Optional[int] = None  # Actual counted stock
+    quantity: Optional[int] = Field(None, ge=0)  # Actual counted stock
     expectedStock: Optional[int] = None  # Normal/target stock level
     pricePerUnit: Optional[float] = None
+
+
+class StockOperation(BaseModel):
+    beverageId: int
+    kind: Literal["sale", "restock", "count"]
+    quantity: int = Field(ge=0)  # Units sold/restocked, or counted stock for "count"
+    note: Optional[str] = None
+
+
+class BulkStockUpdate(BaseModel):
+    operations: List[StockOperation]
+
+
+class BeverageMovementBase(BaseModel):
+    id: int
+    beverageId: int
+    kind: str
+    delta: int
+    quantityAfter: int
+    note: Optional[str] = None
+    createdAt: datetime
+
+    @field_serializer('createdAt')
+    def serialize_datetime(self, dt: datetime, _info) -> str:
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.isoformat()
+
+    class Config:
+        from_attributes = True
+
+
+class BulkStockResult(BaseModel):
+    beverages: List[BeverageBase]
+    movements: List[BeverageMovementBase]
+
+
+class BeverageStockReport(BaseModel):
+    beverageId: int
+    name: str
+    quantity: int
+    expectedStock: int
+    sold: int
+    restocked: int
+    adjusted: int
+
+
+class AdminJobBase(BaseModel):
+    id: str
+    kind: str
+    status: str
+    processed: int
+    total: Optional[int] = None
+    detail: Optional[str] = None
+    error: Optional[str] = None
+    createdAt: datetime
+    finishedAt: Optional[datetime] = None
+
+    @field_serializer('createdAt', 'finishedAt')
+    def serialize_datetime(self, dt: Optional[datetime], _info) -> Optional[str]:
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.isoformat()
+
+    class Config:
+        from_attributes = True
+
+
+class TracingSettings(BaseModel):
+    enabled: bool
+    slowMs: Optional[int] = None
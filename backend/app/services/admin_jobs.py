@@ -0,0 +1,137 @@
+"""
+Background admin jobs.
+
+The database reset runs outside the request: TRUNCATE on PostgreSQL,
+bounded batched DELETEs elsewhere, so live heartbeat ingestion is never
+blocked behind one huge transaction. Progress is stored in admin_jobs so
+any worker can report it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select, text
+
+from ..database import SessionLocal, get_engine
+from ..models import AdminJob, EventReceipt, JobStatus, PC, Session
+from .broadcast_bus import RESET_MESSAGE_TYPE
+from .snapshot import snapshot
+from .websocket_manager import manager
+from ..venues import DEFAULT_VENUE
+
+logger = logging.getLogger(__name__)
+
+RESET_JOB = "reset-database"
+DELETE_BATCH_SIZE = int(os.getenv("RESET_BATCH_SIZE", "5000"))
+
+# Jobs still unfinished after this long belong to a worker that died
+STALE_AFTER = timedelta(hours=1)
+
+# Children before parents (sessions reference pcs); receipts of events
+# applied to the deleted sessions go too, or their retries would be ignored
+RESET_TABLES = (EventReceipt.__table__, Session.__table__, PC.__table__)
+
+
+def create_job(kind: str) -> Optional[str]:
+    """Register a job, returns None if one of the same kind is already running"""
+    db = SessionLocal()
+    try:
+        running = db.query(AdminJob).filter(
+            AdminJob.kind == kind,
+            AdminJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+            AdminJob.createdAt > datetime.utcnow() - STALE_AFTER
+        ).first()
+        if running:
+            return None
+
+        job = AdminJob(id=str(uuid.uuid4()), kind=kind, status=JobStatus.PENDING)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def update_job(job_id: str, **fields):
+    db = SessionLocal()
+    try:
+        db.query(AdminJob).filter(AdminJob.id == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _reset_tables(job_id: str) -> dict:
+    engine = get_engine()
+
+    with engine.connect() as conn:
+        counts = {
+            table.name: conn.execute(text(f"SELECT COUNT(*) FROM {table.name}")).scalar()
+            for table in RESET_TABLES
+        }
+    update_job(job_id, status=JobStatus.RUNNING, total=sum(counts.values()))
+
+    if engine.dialect.name == "postgresql":
+        # Constant time and almost no WAL; the exclusive lock is held only briefly
+        with engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {', '.join(t.name for t in RESET_TABLES)}"))
+        update_job(job_id, processed=sum(counts.values()))
+        return counts
+
+    # Short transactions let heartbeats interleave between batches
+    processed = 0
+    deleted = {}
+    for table in RESET_TABLES:
+        key = table.primary_key.columns[0]
+        deleted[table.name] = 0
+        while True:
+            with engine.begin() as conn:
+                batch = conn.execute(
+                    delete(table).where(key.in_(select(key).limit(DELETE_BATCH_SIZE)))
+                ).rowcount
+            if not batch:
+                break
+            deleted[table.name] += batch
+            processed += batch
+            update_job(job_id, processed=processed)
+    return deleted
+
+
+def _refresh_snapshots(venues) -> list:
+    db = SessionLocal()
+    try:
+        return [(venue, snapshot.refresh(db, venue)) for venue in venues]
+    finally:
+        db.close()
+
+
+async def run_reset_job(job_id: str):
+    """Clear PCs and sessions, then invalidate caches and clients"""
+    try:
+        deleted = await asyncio.to_thread(_reset_tables, job_id)
+    except Exception as e:
+        logger.error(f"Database reset job {job_id} failed: {e}")
+        await asyncio.to_thread(
+            update_job, job_id, status=JobStatus.FAILED, error=str(e), finishedAt=datetime.utcnow()
+        )
+        return
+
+    # The reset covers every venue; "reset" makes every worker drop its caches
+    venues = set(snapshot.venues()) | {DEFAULT_VENUE}
+    updates = await asyncio.to_thread(_refresh_snapshots, sorted(venues))
+    for venue, data in updates:
+        await manager.broadcast({"type": "update", "venueId": venue, "data": data})
+    await manager.broadcast({"type": RESET_MESSAGE_TYPE})
+
+    await asyncio.to_thread(
+        update_job, job_id,
+        status=JobStatus.DONE,
+        detail=json.dumps({"deleted": {"pcs": deleted["pcs"], "sessions": deleted["sessions"]}}),
+        finishedAt=datetime.utcnow()
+    )
+    logger.info(f"Database reset: Deleted {deleted['pcs']} PCs and {deleted['sessions']} sessions")
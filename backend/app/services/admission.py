@@ -0,0 +1,115 @@
+"""
+Admission control for event ingestion.
+
+Limits how many events are processed at once and how many may wait for a
+slot. When the database slows down, excess requests are rejected quickly
+with a Retry-After hint instead of piling up and holding connections.
+start/stop events are served before heartbeats and may queue deeper.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT = int(os.getenv("INGEST_MAX_CONCURRENCY", "8"))
+MAX_QUEUED = int(os.getenv("INGEST_MAX_QUEUE", "32"))
+MAX_PRIORITY_QUEUED = int(os.getenv("INGEST_MAX_PRIORITY_QUEUE", str(MAX_QUEUED * 4)))
+MAX_WAIT_SECONDS = int(os.getenv("INGEST_MAX_WAIT_MS", "2000")) / 1000
+RETRY_AFTER_SECONDS = int(os.getenv("INGEST_RETRY_AFTER", "5"))
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Event ingestion overloaded")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT,
+        max_queued: int = MAX_QUEUED,
+        max_priority_queued: int = MAX_PRIORITY_QUEUED,
+        max_wait: float = MAX_WAIT_SECONDS,
+        retry_after: int = RETRY_AFTER_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_priority_queued = max_priority_queued
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.active = 0
+        self._priority_waiters = deque()
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._priority_waiters) + len(self._waiters)
+
+    @asynccontextmanager
+    async def admit(self, priority: bool = False):
+        """Hold a processing slot for the duration of the block, or raise Overloaded"""
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+        else:
+            await self._wait(priority)
+
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(self, priority: bool):
+        # Each queue has its own limit, so a flood of heartbeats cannot use up start/stop's room
+        waiters = self._priority_waiters if priority else self._waiters
+        limit = self.max_priority_queued if priority else self.max_queued
+        if len(waiters) >= limit:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+
+        slot = asyncio.get_running_loop().create_future()
+        waiters.append(slot)
+        try:
+            # The releasing request hands its slot over by resolving the future
+            await asyncio.wait_for(slot, self.max_wait)
+        except asyncio.TimeoutError:
+            if slot.done() and not slot.cancelled():
+                return  # Slot was handed over as the timeout fired
+            if slot in waiters:
+                waiters.remove(slot)
+            self.timed_out += 1
+            raise Overloaded(self.retry_after)
+
+    def _release(self):
+        for waiters in (self._priority_waiters, self._waiters):
+            while waiters:
+                slot = waiters.popleft()
+                if not slot.done():
+                    slot.set_result(None)
+                    return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "priorityQueued": len(self._priority_waiters),
+            "maxConcurrent": self.max_concurrent,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timedOut": self.timed_out,
+        }
+
+
+# Global controller for /api/events
+admission = AdmissionController()
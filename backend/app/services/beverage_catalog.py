@@ -0,0 +1,70 @@
+"""
+In-process cache of the beverage catalog, one entry per venue.
+
+The catalog changes a few times a day but is polled by every POS screen.
+It is serialized once per change and served as pre-encoded bytes with an
+ETag derived from the content, so every worker produces the same ETag.
+Writers call invalidate() and broadcast the fresh catalog; every worker
+adopts the broadcast copy without querying the database.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import Beverage
+from ..schemas import BeverageBase
+from ..venues import DEFAULT_VENUE
+
+CHANGE_MESSAGE_TYPE = "beverages"
+
+
+def _encode(data: List[dict]) -> Tuple[bytes, str]:
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+class BeverageCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self._venues: Dict[str, Tuple[List[dict], bytes, str]] = {}
+
+    def get(self, db: DBSession, venue: str = DEFAULT_VENUE) -> Tuple[List[dict], bytes, str]:
+        """Return the venue's (data, encoded body, etag), building them on a cache miss"""
+        with self._lock:
+            cached = self._venues.get(venue)
+            if cached is not None:
+                return cached
+            version = self.version
+
+        beverages = db.query(Beverage).filter(Beverage.venueId == venue).order_by(Beverage.name).all()
+        data = [BeverageBase.model_validate(b).model_dump() for b in beverages]
+        body, etag = _encode(data)
+
+        with self._lock:
+            # Don't store a snapshot that was invalidated while it was being built
+            if version == self.version:
+                self._venues[venue] = (data, body, etag)
+        return data, body, etag
+
+    def invalidate(self, venue: str = DEFAULT_VENUE):
+        with self._lock:
+            self.version += 1
+            self._venues.pop(venue, None)
+
+    def on_broadcast(self, message: dict):
+        """Adopt the catalog pushed by whichever worker changed it"""
+        if message.get("type") != CHANGE_MESSAGE_TYPE:
+            return
+        body, etag = _encode(message["data"])
+        with self._lock:
+            self.version += 1
+            self._venues[message.get("venueId", DEFAULT_VENUE)] = (message["data"], body, etag)
+
+
+# Global instance
+catalog = BeverageCatalog()
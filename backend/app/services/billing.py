@@ -0,0 +1,195 @@
+"""
+Tariff-based billing.
+
+Tariffs are read from the JSON file named by TARIFF_CONFIG (default
+backend/tariffs.json, see tariffs.example.json). Without a tariff file
+billing is disabled and amountDue is left to staff.
+
+Each PC class has a per-minute rate with optional time-of-day bands. The
+rates are turned into a cumulative cost curve over the day, so the price of
+any interval is F(end) - F(start) and whole batches of sessions are priced
+with a few NumPy array operations instead of per-row loops.
+"""
+
+import fnmatch
+import json
+import logging
+import os
+from datetime import date, datetime, timezone
+from typing import List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import Session
+
+logger = logging.getLogger(__name__)
+
+TARIFF_CONFIG = os.getenv(
+    "TARIFF_CONFIG",
+    os.path.join(os.path.dirname(__file__), "..", "..", "tariffs.json")
+)
+MINUTES_PER_DAY = 24 * 60
+REPRICE_BATCH_SIZE = 10000
+
+
+def _parse_minute(value: str) -> int:
+    """'HH:MM' -> minute of day ('24:00' is the end of the day)"""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _epoch_seconds(values: Sequence[datetime]) -> np.ndarray:
+    """Naive UTC datetimes -> float seconds since the epoch"""
+    return np.array(values, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+class Tariff:
+    def __init__(self, config: dict):
+        self.zone = ZoneInfo(config.get("timezone", "UTC"))
+        classes = config["classes"]
+        self.class_names: List[str] = list(classes)
+        self.default_class = self.class_names.index(config.get("defaultClass", self.class_names[0]))
+        self.pc_classes = config.get("pcClasses", {})
+        self._class_cache = {}
+
+        # Per-minute rate for every minute of the day, one row per PC class
+        self.rates = np.zeros((len(classes), MINUTES_PER_DAY))
+        for i, name in enumerate(self.class_names):
+            spec = classes[name]
+            self.rates[i, :] = spec["ratePerMinute"]
+            for band in spec.get("bands", []):
+                start, end = _parse_minute(band["from"]), _parse_minute(band["to"])
+                if start <= end:
+                    self.rates[i, start:end] = band["ratePerMinute"]
+                else:
+                    # Band wraps past midnight (e.g. 22:00-02:00)
+                    self.rates[i, start:] = band["ratePerMinute"]
+                    self.rates[i, :end] = band["ratePerMinute"]
+
+        # cumulative[c, m] = cost of minutes [0, m) of a day
+        self.cumulative = np.zeros((len(classes), MINUTES_PER_DAY + 1))
+        np.cumsum(self.rates, axis=1, out=self.cumulative[:, 1:])
+
+        rounding = config.get("rounding", {})
+        self.round_minutes = rounding.get("minutes", 1)
+        self.round_mode = rounding.get("mode", "up")
+        self.minimum_minutes = rounding.get("minimumMinutes", 0)
+        self.amount_step = rounding.get("amountStep", 0.01)
+
+    def class_index(self, pc_id: str) -> int:
+        if pc_id not in self._class_cache:
+            index = self.default_class
+            for pattern, name in self.pc_classes.items():
+                if fnmatch.fnmatch(pc_id, pattern):
+                    index = self.class_names.index(name)
+                    break
+            self._class_cache[pc_id] = index
+        return self._class_cache[pc_id]
+
+    def _to_local(self, utc_seconds: np.ndarray) -> np.ndarray:
+        # UTC offsets only change on the hour, so look them up once per distinct hour
+        hours, inverse = np.unique(np.floor(utc_seconds / 3600).astype(np.int64), return_inverse=True)
+        offsets = np.array([
+            datetime.fromtimestamp(int(h) * 3600, tz=timezone.utc).astimezone(self.zone).utcoffset().total_seconds()
+            for h in hours
+        ])
+        return utc_seconds + offsets[inverse.reshape(-1)]
+
+    def _cost_until(self, classes: np.ndarray, local_seconds: np.ndarray) -> np.ndarray:
+        """Cumulative cost from the epoch to each local time"""
+        minutes = local_seconds / 60
+        days = np.floor(minutes / MINUTES_PER_DAY)
+        minute_of_day = minutes - days * MINUTES_PER_DAY
+        whole = np.minimum(minute_of_day.astype(np.int64), MINUTES_PER_DAY - 1)
+        return (
+            days * self.cumulative[classes, MINUTES_PER_DAY]
+            + self.cumulative[classes, whole]
+            + (minute_of_day - whole) * self.rates[classes, whole]
+        )
+
+    def price(self, pc_ids: Sequence[str], starts: Sequence[datetime], ends: Sequence[datetime]) -> np.ndarray:
+        """Price many sessions at once; datetimes are naive UTC"""
+        if not len(pc_ids):
+            return np.zeros(0)
+
+        unique_pcs, pc_index = np.unique(np.array(pc_ids), return_inverse=True)
+        classes = np.array([self.class_index(pc) for pc in unique_pcs])[pc_index.reshape(-1)]
+
+        start_utc = _epoch_seconds(starts)
+        start_local = self._to_local(start_utc)
+
+        rounding = {"up": np.ceil, "down": np.floor, "nearest": np.round}[self.round_mode]
+        minutes = np.maximum((_epoch_seconds(ends) - start_utc) / 60, self.minimum_minutes)
+        # Tolerate float noise so 30.0000001 minutes doesn't round up a whole step
+        billed = rounding(minutes / self.round_minutes - 1e-9) * self.round_minutes
+
+        amounts = self._cost_until(classes, start_local + billed * 60) - self._cost_until(classes, start_local)
+        return np.round(np.round(amounts / self.amount_step) * self.amount_step, 2)
+
+
+def load_tariff(path: str = TARIFF_CONFIG) -> Optional[Tariff]:
+    if not os.path.exists(path):
+        logger.info("No tariff configured, automatic billing disabled")
+        return None
+    with open(path, "r") as f:
+        tariff = Tariff(json.load(f))
+    logger.info(f"Loaded tariff with classes: {', '.join(tariff.class_names)}")
+    return tariff
+
+
+tariff = load_tariff()
+
+
+def price_session(pc_id: str, start_at: datetime, end_at: datetime) -> Optional[float]:
+    """Price a single interval, None when billing is disabled"""
+    if tariff is None:
+        return None
+    return float(tariff.price([pc_id], [start_at], [end_at])[0])
+
+
+def bill_closed_session(session: Session):
+    """Set amountDue on a session that was just closed, unless staff already priced it"""
+    if tariff is None or session.amountDue is not None or session.endAt is None:
+        return
+    session.amountDue = price_session(session.pcId, session.startAt, session.endAt)
+
+
+def reprice_sessions(
+    db: DBSession,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    overwrite: bool = False
+) -> int:
+    """Recompute amountDue for closed sessions in batches, returns the number updated"""
+    if tariff is None:
+        raise ValueError("No tariff configured")
+
+    query = db.query(Session.id, Session.pcId, Session.startAt, Session.endAt).filter(
+        Session.endAt.isnot(None)
+    )
+    if not overwrite:
+        query = query.filter(Session.amountDue.is_(None))
+    if date_from:
+        query = query.filter(Session.startAt >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(Session.startAt <= datetime.combine(date_to, datetime.max.time()))
+
+    rows = query.order_by(Session.id).all()
+    statement = update(Session).where(Session.id == bindparam("session_id")).values(amountDue=bindparam("amount"))
+
+    updated = 0
+    for i in range(0, len(rows), REPRICE_BATCH_SIZE):
+        batch = rows[i:i + REPRICE_BATCH_SIZE]
+        ids, pc_ids, starts, ends = zip(*batch)
+        amounts = tariff.price(pc_ids, starts, ends)
+        db.connection().execute(statement, [
+            {"session_id": session_id, "amount": float(amount)}
+            for session_id, amount in zip(ids, amounts)
+        ])
+        updated += len(batch)
+
+    db.commit()
+    return updated
@@ -0,0 +1,306 @@
+"""
+Pub/sub backends for WebSocket broadcasts.
+
+Each API worker keeps its own set of WebSocket connections. A broadcast is
+published to the bus and every worker subscribed to it fans the message out
+to its own sockets, so the API can run with several uvicorn workers or
+instances.
+
+Backends (selected with BROADCAST_BACKEND):
+    memory   - in-process only, default (single worker)
+    postgres - Postgres LISTEN/NOTIFY (production, multiple workers/instances)
+    db-poll  - polls the broadcast_messages table (SQLite, tests, single box)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from ..database import DATABASE_URL, SessionLocal
+from ..models import BroadcastMessage
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+CHANNEL = os.getenv("BROADCAST_CHANNEL", "l2p_broadcast")
+POLL_INTERVAL_SECONDS = float(os.getenv("BROADCAST_POLL_INTERVAL", "0.25"))
+RETENTION_SECONDS = 60
+
+# Rows can become visible out of id order (a lower id committing after a
+# higher one), so each poll rereads this much of the recent past and skips
+# the ids it has already delivered
+POLL_WINDOW_SECONDS = 10
+
+# Backoff between attempts to re-establish a lost LISTEN connection
+RECONNECT_MAX_SECONDS = 30
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more; larger messages
+# are stored in broadcast_messages and only their id is sent.
+NOTIFY_MAX_BYTES = 7900
+SPILL_PREFIX = "#"
+
+# Tells every worker to drop its caches (database reset, missed broadcasts)
+RESET_MESSAGE_TYPE = "reset"
+
+
+def _store_message(payload: str) -> int:
+    """Insert a payload into broadcast_messages and prune expired rows"""
+    db = SessionLocal()
+    try:
+        row = BroadcastMessage(payload=payload)
+        db.add(row)
+        cutoff = datetime.utcnow() - timedelta(seconds=RETENTION_SECONDS)
+        db.query(BroadcastMessage).filter(BroadcastMessage.createdAt < cutoff).delete()
+        db.commit()
+        return row.id
+    finally:
+        db.close()
+
+
+class InProcessBus:
+    """Delivers messages directly to this process's handler"""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, message: dict):
+        if self._handler:
+            await self._handler(message)
+
+
+class DatabasePollingBus:
+    """
+    Stores messages in broadcast_messages and polls for new rows.
+
+    Works on any database, including a SQLite file shared by several
+    workers on one machine.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL_SECONDS, window: float = POLL_WINDOW_SECONDS):
+        self.poll_interval = poll_interval
+        self.window = timedelta(seconds=window)
+        self._handler: Optional[Handler] = None
+        self._task: Optional[asyncio.Task] = None
+        self._started_at = datetime.utcnow()
+        # id -> when it was delivered, for ids still inside the window
+        self._seen: Dict[int, datetime] = {}
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        # Messages published before this worker started are not replayed
+        self._started_at = datetime.utcnow()
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._handler = None
+
+    async def publish(self, message: dict):
+        await asyncio.to_thread(_store_message, json.dumps(message))
+
+    def _fetch_since(self, since: datetime):
+        db = SessionLocal()
+        try:
+            return db.query(BroadcastMessage.id, BroadcastMessage.payload).filter(
+                BroadcastMessage.createdAt >= since
+            ).order_by(BroadcastMessage.id).all()
+        finally:
+            db.close()
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                now = datetime.utcnow()
+                since = max(self._started_at, now - self.window)
+                rows = await asyncio.to_thread(self._fetch_since, since)
+                # Ids seen before the window can't be read again
+                self._seen = {row_id: seen_at for row_id, seen_at in self._seen.items() if seen_at >= since}
+                for row_id, payload in rows:
+                    if row_id in self._seen:
+                        continue
+                    self._seen[row_id] = now
+                    if self._handler:
+                        await self._handler(json.loads(payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class PostgresBus:
+    """
+    Postgres LISTEN/NOTIFY backend shared by all workers and instances.
+
+    If the LISTEN connection drops, it is re-established with exponential
+    backoff. Notifications sent in the meantime are lost, so once it is
+    back a reset is delivered locally and this worker's caches reload from
+    the database.
+    """
+
+    def __init__(self, dsn: str, channel: str = CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self._handler: Optional[Handler] = None
+        self._listen_conn = None
+        self._listen_fd: Optional[int] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # Publishes run in threadpool threads; one connection, used by one at a time
+        self._publish_lock = threading.Lock()
+        self._publish_conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reconnects = 0
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        self._loop = asyncio.get_running_loop()
+        await self._listen()
+        logger.info(f"Listening for broadcasts on Postgres channel '{self.channel}'")
+
+    async def stop(self):
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+            self._reconnect_task = None
+        self._drop_listener()
+        with self._publish_lock:
+            if self._publish_conn is not None:
+                self._publish_conn.close()
+                self._publish_conn = None
+        self._handler = None
+
+    async def _listen(self):
+        conn = await asyncio.to_thread(self._connect)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+        except Exception:
+            conn.close()
+            raise
+        self._listen_conn = conn
+        # fileno() fails once the connection is closed, keep it for remove_reader
+        self._listen_fd = conn.fileno()
+        self._loop.add_reader(self._listen_fd, self._on_readable)
+
+    def _drop_listener(self):
+        if self._listen_fd is not None:
+            self._loop.remove_reader(self._listen_fd)
+            self._listen_fd = None
+        if self._listen_conn is not None:
+            self._listen_conn.close()
+            self._listen_conn = None
+
+    async def _reconnect(self):
+        delay = 1
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+            except Exception as e:
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                logger.warning(f"Broadcast listener reconnect failed, retrying in {delay}s: {e}")
+                continue
+            self.reconnects += 1
+            logger.info(f"Broadcast listener reconnected to channel '{self.channel}'")
+            # Updates published while disconnected were missed
+            await self._deliver(json.dumps({"type": RESET_MESSAGE_TYPE}))
+            return
+
+    async def publish(self, message: dict):
+        await asyncio.to_thread(self._notify, json.dumps(message))
+
+    def _notify(self, payload: str):
+        import psycopg2
+
+        if len(payload.encode("utf-8")) > NOTIFY_MAX_BYTES:
+            payload = f"{SPILL_PREFIX}{_store_message(payload)}"
+
+        with self._publish_lock:
+            for attempt in range(2):
+                if self._publish_conn is None or self._publish_conn.closed:
+                    self._publish_conn = self._connect()
+                try:
+                    with self._publish_conn.cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    # Server restarted or connection dropped: retry once on a new one
+                    self._publish_conn.close()
+                    self._publish_conn = None
+                    if attempt:
+                        raise
+
+    def _load_spilled(self, message_id: int) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            row = db.query(BroadcastMessage.payload).filter(BroadcastMessage.id == message_id).first()
+            return row[0] if row else None
+        finally:
+            db.close()
+
+    def _on_readable(self):
+        import psycopg2
+
+        try:
+            self._listen_conn.poll()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.error(f"Lost broadcast listener connection: {e}")
+            self._drop_listener()
+            self._reconnect_task = self._loop.create_task(self._reconnect())
+            return
+        while self._listen_conn.notifies:
+            notify = self._listen_conn.notifies.pop(0)
+            self._loop.create_task(self._deliver(notify.payload))
+
+    async def _deliver(self, payload: str):
+        try:
+            if payload.startswith(SPILL_PREFIX):
+                payload = await asyncio.to_thread(self._load_spilled, int(payload[len(SPILL_PREFIX):]))
+                if payload is None:
+                    return
+            if self._handler:
+                await self._handler(json.loads(payload))
+        except Exception as e:
+            logger.error(f"Failed to deliver broadcast: {e}")
+
+
+def create_bus():
+    """Build the bus configured by BROADCAST_BACKEND"""
+    backend = os.getenv("BROADCAST_BACKEND", "memory").lower()
+
+    if backend == "postgres":
+        if not DATABASE_URL.startswith("postgresql"):
+            raise RuntimeError("BROADCAST_BACKEND=postgres requires a PostgreSQL DATABASE_URL")
+        return PostgresBus(DATABASE_URL)
+    if backend in ("db-poll", "sqlite"):
+        return DatabasePollingBus()
+    if backend != "memory":
+        logger.warning(f"Unknown BROADCAST_BACKEND '{backend}', using in-process broadcasts")
+    return InProcessBus()
@@ -0,0 +1,148 @@
+"""
+Idempotent event ingestion.
+
+Every event has an idempotency key: the client's idempotencyKey, or else its
+type and timestamp, scoped to the clientUuid. A client that retries with
+the same payload therefore sends the same key.
+
+Recently applied keys are kept in a bounded LRU with a TTL, so a duplicate
+is answered with the original result without touching pcs/sessions or
+broadcasting. start/stop keys are also written to event_receipts in the
+transaction that applies the event, so duplicates are recognized by every
+worker and across restarts; heartbeats are cheap and only use the LRU.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import EventReceipt
+from .broadcast_bus import RESET_MESSAGE_TYPE
+
+logger = logging.getLogger(__name__)
+
+DEDUP_SIZE = int(os.getenv("EVENT_DEDUP_SIZE", "10000"))
+DEDUP_TTL_SECONDS = int(os.getenv("EVENT_DEDUP_TTL_SECONDS", str(24 * 3600)))
+
+# How often expired receipts are deleted
+PRUNE_INTERVAL_SECONDS = 600
+
+
+class DuplicateEvent(Exception):
+    """Raised when another worker committed the same event first"""
+
+    def __init__(self, key: str):
+        super().__init__(f"Duplicate event {key}")
+        self.key = key
+
+
+def event_key(client_uuid: str, idempotency_key: Optional[str], event_type: str, timestamp: datetime) -> str:
+    """Idempotency key of an event; timestamp is naive UTC"""
+    if idempotency_key:
+        return f"{client_uuid}:{idempotency_key}"
+    return f"{client_uuid}:{event_type}:{timestamp.isoformat()}"
+
+
+def event_result(pc_id: str, event_type: str) -> dict:
+    """Response body of an applied event"""
+    return {"status": "ok", "pcId": pc_id, "eventType": event_type}
+
+
+class EventDedup:
+    def __init__(self, max_size: int = DEDUP_SIZE, ttl: int = DEDUP_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expiry on the monotonic clock, result)
+        self._recent: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._pruned_at = 0.0
+        self.hits = 0
+        self.persisted_hits = 0
+        self.applied = 0
+
+    def recent(self, key: str) -> Optional[dict]:
+        """Result of a recently applied event with this key, if any"""
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._recent[key]
+                return None
+            self._recent.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def persisted(self, db: DBSession, key: str) -> Optional[dict]:
+        """Result of a start/stop applied by any worker with this key, if any"""
+        receipt = db.get(EventReceipt, key)
+        if receipt is None or receipt.createdAt < datetime.utcnow() - timedelta(seconds=self.ttl):
+            return None
+        result = event_result(receipt.pcId, receipt.type)
+        with self._lock:
+            self.hits += 1
+            self.persisted_hits += 1
+        self.remember(key, result)
+        return result
+
+    def receipt(self, key: str, pc_id: str, event_type: str) -> EventReceipt:
+        """Receipt row to write in the transaction that applies the event"""
+        return EventReceipt(key=key, pcId=pc_id, type=event_type, createdAt=datetime.utcnow())
+
+    def remember(self, key: str, result: dict, applied: bool = False):
+        with self._lock:
+            self._recent[key] = (time.monotonic() + self.ttl, result)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_size:
+                self._recent.popitem(last=False)
+            if applied:
+                self.applied += 1
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+    def on_broadcast(self, message: dict):
+        # A database reset deletes the receipts, so cached results would be stale too
+        if message.get("type") == RESET_MESSAGE_TYPE:
+            self.clear()
+
+    def prune(self, db: DBSession):
+        """Delete expired receipts, at most every PRUNE_INTERVAL_SECONDS"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+                return
+            self._pruned_at = now
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        try:
+            deleted = db.query(EventReceipt).filter(EventReceipt.createdAt < cutoff).delete()
+            db.commit()
+            if deleted:
+                logger.info(f"Pruned {deleted} expired event receipts")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to prune event receipts: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            seen = self.hits + self.applied
+            return {
+                "size": len(self._recent),
+                "applied": self.applied,
+                "hits": self.hits,
+                "persistedHits": self.persisted_hits,
+                "hitRate": round(self.hits / seen, 4) if seen else 0.0,
+            }
+
+
+# Global instance
+dedup = EventDedup()
@@ -0,0 +1,166 @@
+"""
+Buffered bulk inserts for append-only tables.
+
+Rows are collected in memory and written in one statement every
+EVENT_JOURNAL_FLUSH_ROWS rows or EVENT_JOURNAL_FLUSH_MS milliseconds,
+whichever comes first, so journaling adds no DB round trip to requests.
+PostgreSQL uses COPY, other databases a single executemany INSERT.
+
+A flush that fails because the database is unreachable keeps its rows for
+the next one. A flush rejected for the rows themselves (a value the column
+cannot hold) is retried row by row and the offending rows are dropped, so
+one bad row cannot block the table.
+"""
+
+import asyncio
+import csv
+import io
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Table
+
+from ..database import get_engine
+from ..models import Event
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ROWS = int(os.getenv("EVENT_JOURNAL_FLUSH_ROWS", "500"))
+FLUSH_INTERVAL_MS = int(os.getenv("EVENT_JOURNAL_FLUSH_MS", "1000"))
+
+# Rows kept for retry after a failed flush before the oldest are dropped
+MAX_BUFFERED_ROWS = FLUSH_ROWS * 20
+
+
+def _is_bad_data(error: Exception) -> bool:
+    """True if the rows were rejected, not the connection (PEP 249 DataError/IntegrityError)"""
+    # Matches both SQLAlchemy's wrappers and raw DB-API errors from COPY
+    return any(cls.__name__ in ("DataError", "IntegrityError") for cls in type(error).__mro__)
+
+
+def _csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class BufferedInserter:
+    """Collects rows for one table and flushes them in bulk from a background task"""
+
+    def __init__(self, table: Table, flush_rows: int = FLUSH_ROWS, flush_interval_ms: int = FLUSH_INTERVAL_MS):
+        self.table = table
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self._rows: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, row: dict):
+        """Queue a row; safe to call from the event loop or worker threads"""
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.flush_rows
+
+        if not full:
+            return
+        if self._task is None:
+            # No background flusher (scripts, tests) - write synchronously
+            self.flush()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def flush(self) -> int:
+        """Write all buffered rows, returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            try:
+                if get_engine().dialect.name == "postgresql":
+                    self._copy(rows)
+                else:
+                    with get_engine().begin() as conn:
+                        conn.execute(self.table.insert(), rows)
+                return len(rows)
+            except Exception as e:
+                if _is_bad_data(e):
+                    logger.warning(f"Rows rejected by {self.table.name}, writing them one by one: {e}")
+                    return self._insert_each(rows)
+                logger.error(f"Failed to flush {len(rows)} rows to {self.table.name}: {e}")
+                self._requeue(rows)
+                return 0
+
+    def _requeue(self, rows: List[dict]):
+        with self._lock:
+            self._rows = (rows + self._rows)[-MAX_BUFFERED_ROWS:]
+
+    def _insert_each(self, rows: List[dict]) -> int:
+        """Insert rows one per transaction, dropping those the table rejects"""
+        written = 0
+        for index, row in enumerate(rows):
+            try:
+                with get_engine().begin() as conn:
+                    conn.execute(self.table.insert(), row)
+                written += 1
+            except Exception as e:
+                if not _is_bad_data(e):
+                    logger.error(f"Failed to flush {len(rows) - index} rows to {self.table.name}: {e}")
+                    self._requeue(rows[index:])
+                    break
+                logger.error(f"Dropped row rejected by {self.table.name}: {e}")
+        return written
+
+    def _copy(self, rows: List[dict]):
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        buffer.seek(0)
+
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        raw = get_engine().raw_connection()
+        try:
+            with raw.cursor() as cur:
+                cur.copy_expert(f"COPY {self.table.name} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            raw.commit()
+        finally:
+            raw.close()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await asyncio.to_thread(self.flush)
+
+
+# Global journal of received events
+journal = BufferedInserter(Event.__table__)
@@ -0,0 +1,185 @@
+"""
+Client event state machine.
+
+Shared by the HTTP events endpoint and the UDP heartbeat listener so both
+paths open, keep and close sessions exactly the same way. The open session
+comes from the in-memory index, so an event costs only the writes it makes.
+
+Callers run events of one PC in order (see lanes.py). Another worker can
+still race us; the database then rejects the second open session or PC row,
+and the event is applied again against what that worker committed.
+
+Clients queue start/stop but send heartbeats right away, so a start that
+was held back (network down at boot) can arrive after heartbeats already
+opened a session for the same run. A start older than the open session
+therefore moves that session's start back instead of closing it, and a
+stop older than the open session (left over from the previous boot) is
+ignored instead of closing it before it started.
+"""
+
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import PC, Session, EventReceipt, PCStatus, PaidStatus
+from ..venues import DEFAULT_VENUE
+from . import billing
+from .dedup import DuplicateEvent
+from .occupancy import occupancy
+from .open_sessions import open_sessions, to_entry
+
+logger = logging.getLogger(__name__)
+
+
+def close_open_session(db: DBSession, pc_id: str, entry: dict, end_at: datetime) -> Optional[Session]:
+    """
+    Close an open session without loading it first.
+
+    Returns the updated session, or None if it was already closed elsewhere.
+    Does not commit.
+    """
+    values = {
+        "endAt": end_at,
+        "durationSeconds": int((end_at - entry["startAt"]).total_seconds()),
+    }
+    amount = billing.price_session(pc_id, entry["startAt"], end_at)
+    if amount is not None:
+        # Keep an amount staff already entered
+        values["amountDue"] = func.coalesce(Session.amountDue, amount)
+
+    return db.scalars(
+        update(Session)
+        .where(Session.id == entry["id"], Session.endAt.is_(None))
+        .values(**values)
+        .returning(Session)
+    ).first()
+
+
+def backdate_open_session(db: DBSession, entry: dict, start_at: datetime) -> Optional[Session]:
+    """
+    Move an open session's start back to start_at.
+
+    Returns the updated session, or None if it was already closed elsewhere.
+    Does not commit.
+    """
+    return db.scalars(
+        update(Session)
+        .where(Session.id == entry["id"], Session.endAt.is_(None))
+        .values(startAt=start_at)
+        .returning(Session)
+    ).first()
+
+
+def apply_event(
+    db: DBSession,
+    pc_id: str,
+    client_uuid: str,
+    event_type: str,
+    timestamp: datetime,
+    venue_id: Optional[str] = None,
+    receipt: Optional[EventReceipt] = None
+) -> str:
+    """
+    Apply one start/heartbeat/stop event and commit. timestamp is naive UTC.
+
+    venue_id places a PC seen for the first time; a known PC keeps its venue.
+    receipt, if given, is written in the same transaction. Returns the PC's
+    venue; raises DuplicateEvent if another worker committed the receipt first.
+    """
+    try:
+        return _apply_event(db, pc_id, client_uuid, event_type, timestamp, venue_id, receipt)
+    except IntegrityError:
+        db.rollback()
+        open_sessions.forget(pc_id)
+        if receipt is not None and db.get(EventReceipt, receipt.key) is not None:
+            raise DuplicateEvent(receipt.key)
+        # Lost a race with another worker: re-read the PC's open session and apply once more
+        logger.info(f"Concurrent write for {pc_id}, retrying {event_type}")
+        return _apply_event(db, pc_id, client_uuid, event_type, timestamp, venue_id, receipt)
+
+
+def _apply_event(
+    db: DBSession,
+    pc_id: str,
+    client_uuid: str,
+    event_type: str,
+    timestamp: datetime,
+    venue_id: Optional[str],
+    receipt: Optional[EventReceipt]
+) -> str:
+    open_session = open_sessions.get(db, pc_id)
+    # A stop from the previous boot, delivered after heartbeats opened this run's session
+    late_stop = event_type == "stop" and open_session is not None and timestamp < open_session["startAt"]
+    if late_stop:
+        logger.info(f"Ignoring stop for {pc_id} older than its open session")
+
+    status = PCStatus.OFFLINE if event_type == "stop" and not late_stop else PCStatus.ONLINE
+
+    # Update lastSeenAt with server time (not client time) to avoid clock drift issues
+    pc_venue = db.execute(
+        update(PC).where(PC.pcId == pc_id).values(lastSeenAt=datetime.utcnow(), status=status)
+        .returning(PC.venueId),
+        execution_options={"synchronize_session": False}
+    ).scalar()
+    if pc_venue is None:
+        pc_venue = venue_id or DEFAULT_VENUE
+        db.execute(insert(PC).values(
+            pcId=pc_id,
+            clientUuid=client_uuid,
+            lastSeenAt=datetime.utcnow(),
+            status=status,
+            venueId=pc_venue
+        ))
+    elif venue_id is not None and venue_id != pc_venue:
+        logger.warning(f"{pc_id} reported venue '{venue_id}' but belongs to '{pc_venue}'")
+
+    new_session = None
+    backdated = None
+
+    if open_session and event_type == "start" and timestamp <= open_session["startAt"]:
+        # A late start of the run whose heartbeats opened this session
+        backdated = backdate_open_session(db, open_session, timestamp)
+        if backdated is not None:
+            open_session = to_entry(backdated)
+        else:
+            # Stale entry, handle it as a normal start
+            open_sessions.forget(pc_id)
+            open_session = open_sessions.get(db, pc_id)
+
+    # start closes any existing open session, stop closes it
+    if open_session and event_type in ("start", "stop") and backdated is None and not late_stop:
+        if close_open_session(db, pc_id, open_session, timestamp) is None:
+            # Stale entry: another worker closed that session and may have opened a newer one.
+            # A start older than that one collides with it and is retried as a late start.
+            open_sessions.forget(pc_id)
+            current = open_sessions.get(db, pc_id)
+            if current is not None and current["startAt"] <= timestamp:
+                close_open_session(db, pc_id, current, timestamp)
+        open_session = None
+
+    if (event_type == "start" and backdated is None) or (event_type == "heartbeat" and not open_session):
+        if event_type == "heartbeat":
+            # No active session exists - create one automatically
+            logger.info(f"Auto-creating session for {pc_id} (heartbeat received without active session)")
+        new_session = Session(
+            pcId=pc_id,
+            startAt=timestamp,
+            paidStatus=PaidStatus.UNPAID,
+            venueId=pc_venue
+        )
+        db.add(new_session)
+        db.flush()
+        open_session = to_entry(new_session)
+
+    if receipt is not None:
+        db.add(receipt)
+    db.commit()
+    if backdated is not None:
+        occupancy.drop_days(pc_venue, timestamp)
+    if event_type != "heartbeat" or new_session is not None:
+        open_sessions.set(pc_id, open_session)
+    return pc_venue
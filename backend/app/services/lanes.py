@@ -0,0 +1,78 @@
+"""
+Per-PC ordered lanes for event ingestion.
+
+Events for one PC are applied one at a time, in arrival order (asyncio.Lock
+wakes waiters first-in first-out); events for different PCs run in
+parallel. A lane exists only while it has events in flight, so memory is
+bounded by concurrency, not by fleet size. Waiting in a lane holds no
+processing slot, so a lane takes at most INGEST_MAX_LANE_DEPTH events; a PC
+sending more than that (a retry storm) gets Overloaded like any other
+excess request.
+
+Lanes order events within one worker. Across workers the partial unique
+index on open sessions (one per PC) is the backstop.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from .admission import Overloaded, RETRY_AFTER_SECONDS
+
+MAX_LANE_DEPTH = int(os.getenv("INGEST_MAX_LANE_DEPTH", "4"))
+
+
+class _Lane:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class PcLanes:
+    def __init__(self, max_depth: int = MAX_LANE_DEPTH, retry_after: int = RETRY_AFTER_SECONDS):
+        self.depth_limit = max_depth
+        self.retry_after = retry_after
+        self._lanes: Dict[str, _Lane] = {}
+        self.entered = 0
+        self.waited = 0
+        self.rejected = 0
+        self.max_depth = 0
+
+    @asynccontextmanager
+    async def hold(self, pc_id: str):
+        """Run the block after every earlier event of this PC has finished, or raise Overloaded"""
+        lane = self._lanes.get(pc_id)
+        if lane is None:
+            lane = self._lanes[pc_id] = _Lane()
+        elif lane.users >= self.depth_limit:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+        lane.users += 1
+        self.entered += 1
+        if lane.users > 1:
+            self.waited += 1
+            self.max_depth = max(self.max_depth, lane.users)
+
+        try:
+            async with lane.lock:
+                yield
+        finally:
+            lane.users -= 1
+            if not lane.users:
+                del self._lanes[pc_id]
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._lanes),
+            "entered": self.entered,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "maxDepth": self.max_depth,
+        }
+
+
+# Global instance
+lanes = PcLanes()
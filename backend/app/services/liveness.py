@@ -0,0 +1,140 @@
+"""
+Liveness tracking for heartbeats that arrive outside the HTTP path.
+
+touch() only records the latest heartbeat per PC in memory. A background
+task flushes them every LIVENESS_FLUSH_SECONDS: PCs that are already ONLINE
+with an open session get lastSeenAt bumped by one UPDATE for the whole
+batch; anything else (unknown, OFFLINE, no open session) goes through the
+regular event state machine, in the PC's lane like an HTTP event. One
+snapshot per touched venue is broadcast per flush instead of one per
+heartbeat.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from ..database import SessionLocal
+from ..models import PC, Session, PCStatus
+from .ingest import apply_event
+from .lanes import lanes
+from .snapshot import snapshot
+from .websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LIVENESS_FLUSH_SECONDS", "5"))
+
+# Keeps IN lists well below SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+
+class LivenessTracker:
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        # pcId -> (clientUuid, client timestamp as naive UTC)
+        self._pending: Dict[str, Tuple[str, datetime]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.fast_path = 0
+        self.slow_path = 0
+
+    def touch(self, pc_id: str, client_uuid: str, timestamp: datetime):
+        """Record a heartbeat; repeated heartbeats before a flush are coalesced"""
+        with self._lock:
+            self._pending[pc_id] = (client_uuid, timestamp)
+            self.received += 1
+
+    async def flush(self) -> Optional[Dict[str, list]]:
+        """Write pending heartbeats, returns the refreshed snapshot of each venue written to"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return None
+
+        db = SessionLocal()
+        try:
+            live = await asyncio.to_thread(self._bump_live, db, list(pending))
+            venues = set(live.values())
+
+            slow = [pc_id for pc_id in pending if pc_id not in live]
+            for pc_id in slow:
+                client_uuid, timestamp = pending[pc_id]
+                try:
+                    # Heartbeats carry no venue: known PCs keep theirs, new ones join the default
+                    async with lanes.hold(pc_id):
+                        venues.add(await asyncio.to_thread(
+                            apply_event, db, pc_id, client_uuid, "heartbeat", timestamp
+                        ))
+                except Exception as e:
+                    await asyncio.to_thread(db.rollback)
+                    logger.error(f"Failed to apply heartbeat from {pc_id}: {e}")
+
+            self.fast_path += len(live)
+            self.slow_path += len(slow)
+            return {venue: await asyncio.to_thread(snapshot.refresh, db, venue) for venue in sorted(venues)}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _bump_live(db, pc_ids: List[str]) -> Dict[str, str]:
+        """Bump lastSeenAt of PCs that are ONLINE with an open session, returns their pcId -> venue"""
+        live: Dict[str, str] = {}
+        for i in range(0, len(pc_ids), BATCH_SIZE):
+            chunk = pc_ids[i:i + BATCH_SIZE]
+            live.update(db.query(PC.pcId, PC.venueId).join(
+                Session, (Session.pcId == PC.pcId) & Session.endAt.is_(None)
+            ).filter(PC.pcId.in_(chunk), PC.status == PCStatus.ONLINE).all())
+
+        # Server time, like the HTTP path, to avoid clock drift issues
+        now = datetime.utcnow()
+        fast = list(live)
+        for i in range(0, len(fast), BATCH_SIZE):
+            db.execute(
+                update(PC).where(PC.pcId.in_(fast[i:i + BATCH_SIZE])).values(lastSeenAt=now),
+                execution_options={"synchronize_session": False}
+            )
+        db.commit()
+        return live
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "received": self.received,
+                "pending": len(self._pending),
+                "fastPath": self.fast_path,
+                "slowPath": self.slow_path,
+            }
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                updates = await self.flush()
+                for venue, data in (updates or {}).items():
+                    await manager.broadcast({"type": "update", "venueId": venue, "data": data})
+            except Exception as e:
+                logger.error(f"Liveness flush failed: {e}")
+
+
+# Global instance
+liveness = LivenessTracker()
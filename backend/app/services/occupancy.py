@@ -0,0 +1,244 @@
+"""
+Occupancy timeline: how many stations were busy in each time bucket.
+
+Sessions are clipped to the range and swept with sorted arrays: the number
+of sessions overlapping a bucket and the busy seconds up to any instant are
+both answered with searchsorted over prefix sums, so a range costs
+O((sessions + buckets) log sessions) in NumPy.
+
+Results are computed per venue and UTC day. A day that is over and has no
+session still open in it only changes if a session reaches back into it
+later. Such days are cached and dropped when that happens:
+
+- a start delivered late by a client that was offline creates a session:
+  each request first looks for sessions created since the cache was filled
+  (ids above a watermark) and drops the days from the earliest start on
+- a late start backdates the session its heartbeats opened, keeping its id:
+  ingest drops the days from the new start on, and every worker does the
+  same when the snapshot broadcast shows an open session starting in a
+  cached day
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import Session
+from ..venues import DEFAULT_VENUE
+from .broadcast_bus import RESET_MESSAGE_TYPE
+
+SECONDS_PER_DAY = 24 * 3600
+MAX_CACHED_DAYS = 2000
+
+# (concurrent sessions per bucket, busy seconds per bucket, busy seconds per PC)
+DayResult = Tuple[np.ndarray, np.ndarray, Dict[str, float]]
+
+
+def _parse_utc(value: str) -> datetime:
+    """Serialized ISO timestamp -> naive UTC datetime"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _epoch_seconds(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def sweep(starts: np.ndarray, ends: np.ndarray, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sessions overlapping each bucket and busy seconds per bucket.
+
+    starts/ends are session bounds already clipped to [edges[0], edges[-1]],
+    all in seconds relative to edges[0].
+    """
+    sorted_starts = np.sort(starts)
+    sorted_ends = np.sort(ends)
+
+    overlapping = (
+        np.searchsorted(sorted_starts, edges[1:], side="left")
+        - np.searchsorted(sorted_ends, edges[:-1], side="right")
+    )
+
+    # busy(t) = sum(min(t, end) - min(t, start)) over sessions
+    start_sums = np.concatenate(([0.0], np.cumsum(sorted_starts)))
+    end_sums = np.concatenate(([0.0], np.cumsum(sorted_ends)))
+    started = np.searchsorted(sorted_starts, edges, side="left")
+    ended = np.searchsorted(sorted_ends, edges, side="left")
+    busy = (started * edges - start_sums[started]) - (ended * edges - end_sums[ended])
+
+    return overlapping, np.diff(busy)
+
+
+class OccupancyCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days: "OrderedDict[Tuple[str, date, int], DayResult]" = OrderedDict()
+        # Highest session id already reflected in each venue's cached days
+        self._watermarks: Dict[str, int] = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._days.clear()
+            self._watermarks.clear()
+
+    def _drop_late_sessions(self, db: DBSession, venue: str):
+        """Forget cached days of the venue that sessions created since caching reach into"""
+        with self._lock:
+            watermark = self._watermarks.get(venue)
+        if watermark is None:
+            return
+
+        earliest, newest = db.query(func.min(Session.startAt), func.max(Session.id)).filter(
+            Session.venueId == venue,
+            Session.id > watermark
+        ).one()
+        if newest is None:
+            return
+
+        with self._lock:
+            if self._watermarks.get(venue) == watermark:
+                self._watermarks[venue] = newest
+        self.drop_days(venue, earliest)
+
+    def drop_days(self, venue: str, since: datetime):
+        """Forget cached days of the venue from the day of since (naive UTC) on"""
+        with self._lock:
+            stale = [key for key in self._days if key[0] == venue and key[1] >= since.date()]
+            for key in stale:
+                del self._days[key]
+
+    def on_broadcast(self, message: dict):
+        if message.get("type") == RESET_MESSAGE_TYPE:
+            self.invalidate()
+            return
+        if message.get("type") != "update":
+            return
+
+        # Cached days had no open session, so one starting in them was backdated into them
+        venue = message.get("venueId", DEFAULT_VENUE)
+        with self._lock:
+            if not any(key[0] == venue for key in self._days):
+                return
+        starts = [_parse_utc(pc["activeSession"]["startAt"]) for pc in message["data"] if pc.get("activeSession")]
+        if starts:
+            self.drop_days(venue, min(starts))
+
+    def compute(
+        self,
+        db: DBSession,
+        date_from: date,
+        date_to: date,
+        bucket_minutes: int,
+        venue: str = DEFAULT_VENUE
+    ) -> dict:
+        days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+        self._drop_late_sessions(db, venue)
+
+        results = {}
+        with self._lock:
+            for day in days:
+                results[day] = self._days.get((venue, day, bucket_minutes))
+                if results[day] is not None:
+                    self._days.move_to_end((venue, day, bucket_minutes))
+        missing = [day for day, result in results.items() if result is None]
+
+        if missing:
+            results.update(self._compute_days(db, missing, bucket_minutes, venue))
+
+        overlapping = np.concatenate([results[day][0] for day in days])
+        busy = np.concatenate([results[day][1] for day in days])
+        pc_busy: Dict[str, float] = {}
+        for day in days:
+            for pc_id, seconds in results[day][2].items():
+                pc_busy[pc_id] = pc_busy.get(pc_id, 0.0) + seconds
+
+        bucket_seconds = bucket_minutes * 60
+        range_seconds = len(days) * SECONDS_PER_DAY
+        range_start = datetime.combine(date_from, datetime.min.time())
+
+        return {
+            "bucketMinutes": bucket_minutes,
+            "buckets": [
+                (range_start + timedelta(seconds=i * bucket_seconds)).isoformat() + "Z"
+                for i in range(len(busy))
+            ],
+            "sessions": overlapping.tolist(),
+            "averageBusy": np.round(busy / bucket_seconds, 3).tolist(),
+            "pcs": [
+                {"pcId": pc_id, "busySeconds": int(seconds), "utilization": round(seconds / range_seconds, 4)}
+                for pc_id, seconds in sorted(pc_busy.items())
+            ],
+        }
+
+    def _compute_days(self, db: DBSession, days: List[date], bucket_minutes: int, venue: str) -> Dict[date, DayResult]:
+        first = datetime.combine(min(days), datetime.min.time())
+        last = datetime.combine(max(days), datetime.min.time()) + timedelta(days=1)
+        now = datetime.utcnow()
+        # Read first: a session created while the days are computed stays above it
+        watermark = db.query(func.max(Session.id)).scalar() or 0
+
+        rows = db.query(Session.pcId, Session.startAt, Session.endAt).filter(
+            Session.venueId == venue,
+            Session.startAt < last,
+            or_(Session.endAt.is_(None), Session.endAt > first)
+        ).all()
+
+        pc_ids = np.array([r[0] for r in rows], dtype=object)
+        starts = _epoch_seconds([r[1] for r in rows])
+        ends = _epoch_seconds([r[2] or now for r in rows])
+        is_open = np.array([r[2] is None for r in rows], dtype=bool)
+        unique_pcs, pc_index = np.unique(pc_ids, return_inverse=True) if len(rows) else (pc_ids, np.zeros(0, dtype=int))
+        pc_index = pc_index.reshape(-1)
+
+        # Sort by start so each day only looks at sessions that can reach it
+        order = np.argsort(starts, kind="stable")
+        starts, ends, is_open, pc_index = starts[order], ends[order], is_open[order], pc_index[order]
+        longest = float((ends - starts).max()) if len(rows) else 0.0
+
+        bucket_seconds = bucket_minutes * 60
+        edges = np.arange(0, SECONDS_PER_DAY + 1, bucket_seconds, dtype=np.float64)
+        results = {}
+
+        for day in days:
+            day_start = datetime.combine(day, datetime.min.time())
+            origin = _epoch_seconds([day_start])[0]
+            lo = np.searchsorted(starts, origin - longest, side="left")
+            hi = np.searchsorted(starts, origin + SECONDS_PER_DAY, side="left")
+
+            clipped_starts = np.clip(starts[lo:hi] - origin, 0, SECONDS_PER_DAY)
+            clipped_ends = np.clip(ends[lo:hi] - origin, 0, SECONDS_PER_DAY)
+            inside = clipped_ends > clipped_starts
+
+            overlapping, busy = sweep(clipped_starts[inside], clipped_ends[inside], edges)
+            per_pc = np.bincount(
+                pc_index[lo:hi][inside], weights=(clipped_ends - clipped_starts)[inside], minlength=len(unique_pcs)
+            )
+            result = (
+                overlapping,
+                busy,
+                {str(unique_pcs[i]): float(per_pc[i]) for i in np.nonzero(per_pc)[0]},
+            )
+            results[day] = result
+
+            # Open sessions may still be closed retroactively by the offline sweep
+            day_over = day_start + timedelta(days=1) <= now
+            if day_over and not is_open[lo:hi][inside].any():
+                with self._lock:
+                    # Keep the lowest, sessions above it may be missing from this result
+                    self._watermarks[venue] = min(self._watermarks.get(venue, watermark), watermark)
+                    self._days[(venue, day, bucket_minutes)] = result
+                    while len(self._days) > MAX_CACHED_DAYS:
+                        self._days.popitem(last=False)
+
+        return results
+
+
+# Global instance
+occupancy = OccupancyCache()
@@ -0,0 +1,158 @@
+"""
+In-memory index of open sessions, keyed by pcId.
+
+Loaded at startup with one query and updated by the write paths after they
+commit, so the event state machine needs no SELECT to find the open
+session. Each PC is either known (an entry, or None for "no open session")
+or unknown, which costs one lookup on next use.
+
+The database stays the arbiter: sessions are closed with a conditional
+UPDATE (endAt IS NULL), so a stale entry can't close a session twice.
+Snapshots broadcast by any worker are compared with the index, and PCs
+that disagree are marked unknown rather than overwritten, because a
+broadcast may be older than what this worker has already seen.
+"""
+
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import PC, Session
+from .broadcast_bus import RESET_MESSAGE_TYPE
+
+ENTRY_FIELDS = ("id", "startAt", "userName", "paidStatus", "amountDue", "amountPaid", "venueId")
+
+
+def to_entry(session) -> dict:
+    """Index entry from a Session (ORM object or row)"""
+    return {field: getattr(session, field) for field in ENTRY_FIELDS}
+
+
+def _matches(entry: Optional[dict], active: Optional[dict]) -> bool:
+    """Whether an index entry agrees with a serialized activeSession"""
+    if entry is None or active is None:
+        return entry is None and active is None
+    paid_status = getattr(entry["paidStatus"], "value", entry["paidStatus"])
+    return (
+        entry["id"] == active["id"]
+        and entry["userName"] == active.get("userName")
+        and paid_status == active.get("paidStatus")
+        and entry["amountDue"] == active.get("amountDue")
+        and entry["amountPaid"] == active.get("amountPaid")
+    )
+
+
+class OpenSessionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Optional[dict]] = {}
+        # When loaded, PCs missing from _sessions have no open session
+        self._complete = False
+        self._unknown = set()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, db: DBSession):
+        """Load every PC with its open session, if any"""
+        rows = db.query(PC.pcId, *[getattr(Session, f) for f in ENTRY_FIELDS]).outerjoin(
+            Session, and_(Session.pcId == PC.pcId, Session.endAt.is_(None))
+        ).all()
+
+        sessions = {}
+        for row in rows:
+            if row.id is None:
+                sessions.setdefault(row.pcId, None)
+            else:
+                sessions[row.pcId] = to_entry(row)
+
+        with self._lock:
+            self._sessions = sessions
+            self._unknown = set()
+            self._complete = True
+
+    def get(self, db: DBSession, pc_id: str) -> Optional[dict]:
+        """Open session of a PC, looked up once if this worker doesn't know it"""
+        with self._lock:
+            if pc_id in self._sessions and pc_id not in self._unknown:
+                self.hits += 1
+                return self._sessions[pc_id]
+            if self._complete and pc_id not in self._unknown:
+                self.hits += 1
+                return None
+            self.misses += 1
+
+        session = db.query(Session).filter(
+            Session.pcId == pc_id,
+            Session.endAt.is_(None)
+        ).first()
+        entry = to_entry(session) if session else None
+        self.set(pc_id, entry)
+        return entry
+
+    def find(self, session_id: int) -> Optional[str]:
+        """pcId whose known open session has this id"""
+        with self._lock:
+            for pc_id, entry in self._sessions.items():
+                if entry is not None and entry["id"] == session_id and pc_id not in self._unknown:
+                    return pc_id
+        return None
+
+    def set(self, pc_id: str, entry: Optional[dict]):
+        """Record the committed open session of a PC (None once it's closed)"""
+        with self._lock:
+            self._sessions[pc_id] = entry
+            self._unknown.discard(pc_id)
+
+    def discard(self, pc_id: str, session_id: int):
+        """Record that a session was closed, unless the PC has moved on to a newer one"""
+        with self._lock:
+            entry = self._sessions.get(pc_id)
+            if entry is not None and entry["id"] == session_id:
+                self._sessions[pc_id] = None
+
+    def forget(self, pc_id: str):
+        with self._lock:
+            self._unknown.add(pc_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._sessions = {}
+            self._unknown = set()
+            self._complete = False
+
+    def on_broadcast(self, message: dict):
+        if message.get("type") == RESET_MESSAGE_TYPE:
+            self.invalidate()
+            return
+        if message.get("type") != "update":
+            return
+
+        with self._lock:
+            for pc in message["data"]:
+                pc_id = pc["pcId"]
+                if pc_id in self._unknown:
+                    continue
+                if pc_id in self._sessions:
+                    entry = self._sessions[pc_id]
+                elif self._complete:
+                    entry = None
+                else:
+                    continue
+                if not _matches(entry, pc.get("activeSession")):
+                    self._unknown.add(pc_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self._complete,
+                "tracked": len(self._sessions),
+                "unknown": len(self._unknown),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Global instance
+open_sessions = OpenSessionIndex()
@@ -0,0 +1,194 @@
+"""
+On-demand profiling for live diagnosis.
+
+- sample_stacks(): samples every thread's stack for N seconds and returns
+  collapsed stacks ("frame;frame;frame count"), the input format of
+  flamegraph.pl and speedscope.
+- Request tracing: when enabled, each HTTP request collects named spans
+  (span() blocks around DB work, snapshot build, serialization, fan-out)
+  and per-statement SQL timings; requests slower than the threshold are
+  logged with both. When disabled, span() is one ContextVar lookup and no
+  SQL listener is installed.
+"""
+
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "").lower() in ("1", "true", "yes")
+TRACE_SLOW_MS = int(os.getenv("TRACE_SLOW_MS", "500"))
+
+MAX_PROFILE_SECONDS = 60
+SLOWEST_STATEMENTS = 5
+
+
+# Sampling profiler
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+_sampling = threading.Lock()
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Optional[str]:
+    """
+    Sample all threads for `seconds`, returns collapsed stacks.
+
+    Returns None if another capture is already running.
+    """
+    if not _sampling.acquire(blocking=False):
+        return None
+    try:
+        me = threading.get_ident()
+        names = {}
+        counts: Counter = Counter()
+        deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+
+        while time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                counts[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+    finally:
+        _sampling.release()
+
+
+# Request tracing
+
+
+class RequestTrace:
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.statements: List[Tuple[float, str]] = []
+
+
+_current: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block as part of the current request's trace, if any"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, time.perf_counter() - started))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    started = conn.info.get("trace_started")
+    if trace is not None and started:
+        trace.statements.append((time.perf_counter() - started.pop(), statement))
+
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACE_REQUESTS, slow_ms: int = TRACE_SLOW_MS):
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.slow_requests = 0
+        self.configure(enabled)
+
+    def configure(self, enabled: bool, slow_ms: Optional[int] = None):
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if enabled == self.enabled:
+            return
+        # SQL listeners exist only while tracing, so disabled tracing costs nothing per query
+        for name, listener in (
+            ("before_cursor_execute", _before_cursor_execute),
+            ("after_cursor_execute", _after_cursor_execute),
+        ):
+            if enabled:
+                event.listen(Engine, name, listener)
+            else:
+                event.remove(Engine, name, listener)
+        self.enabled = enabled
+        logger.info(f"Request tracing {'enabled' if enabled else 'disabled'} (slow threshold {self.slow_ms} ms)")
+
+    def settings(self) -> dict:
+        return {"enabled": self.enabled, "slowMs": self.slow_ms, "slowRequests": self.slow_requests}
+
+    def report(self, trace: RequestTrace):
+        elapsed_ms = (time.perf_counter() - trace.started) * 1000
+        if elapsed_ms < self.slow_ms:
+            return
+        self.slow_requests += 1
+
+        totals = defaultdict(lambda: [0, 0.0])
+        for name, seconds in trace.spans:
+            totals[name][0] += 1
+            totals[name][1] += seconds
+        spans = ", ".join(
+            f"{name} {seconds * 1000:.1f} ms" + (f" x{count}" if count > 1 else "")
+            for name, (count, seconds) in totals.items()
+        )
+
+        sql_ms = sum(seconds for seconds, _ in trace.statements) * 1000
+        slowest = "".join(
+            f"\n    {seconds * 1000:.1f} ms  {' '.join(statement.split())[:160]}"
+            for seconds, statement in sorted(trace.statements, reverse=True)[:SLOWEST_STATEMENTS]
+        )
+        logger.warning(
+            f"Slow request {trace.label}: {elapsed_ms:.1f} ms; spans: {spans or '-'}; "
+            f"SQL: {len(trace.statements)} statements, {sql_ms:.1f} ms{slowest}"
+        )
+
+
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces HTTP requests while tracing is enabled"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not tracer.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(f"{scope['method']} {scope['path']}")
+        token = _current.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            tracer.report(trace)
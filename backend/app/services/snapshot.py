@@ -0,0 +1,239 @@
+"""
+Fleet snapshot: every PC of a venue with its active session, as sent to
+dashboards.
+
+Building the snapshot runs the offline sweep and reads every PC and open
+session of the venue, so the serialized result is cached, one entry per
+venue. Write paths call refresh() and broadcast the new snapshot; other
+workers adopt the broadcast copy. A cached snapshot expires when the next
+ONLINE PC could go stale, so the offline sweep still runs on time, and
+live costs are re-priced on every read.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session as DBSession
+
+from ..models import PC, Session, PCStatus
+from ..schemas import PCWithSession, SessionBase
+from ..venues import DEFAULT_VENUE
+from . import billing
+from .broadcast_bus import RESET_MESSAGE_TYPE
+from .open_sessions import open_sessions
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+OFFLINE_THRESHOLD_MINUTES = 0.75  # 45 seconds - faster offline detection
+
+
+def get_pcs_with_sessions(db: DBSession, venue: str = DEFAULT_VENUE):
+    """Run the venue's offline sweep and build its snapshot from the database"""
+    # Update offline status for PCs that haven't sent heartbeat
+    threshold = datetime.utcnow() - timedelta(minutes=OFFLINE_THRESHOLD_MINUTES)
+
+    stale_pcs = db.query(PC).filter(
+        PC.venueId == venue,
+        PC.status == PCStatus.ONLINE,
+        PC.lastSeenAt < threshold
+    ).all()
+
+    # Open sessions of the stale PCs, in one query
+    stale_sessions = {}
+    if stale_pcs:
+        for session in db.query(Session).filter(
+            Session.pcId.in_([pc.pcId for pc in stale_pcs]),
+            Session.endAt.is_(None)
+        ):
+            stale_sessions.setdefault(session.pcId, session)
+
+    closed = []
+    for pc in stale_pcs:
+        pc.status = PCStatus.OFFLINE
+        # Close any open sessions
+        open_session = stale_sessions.get(pc.pcId)
+        if open_session:
+            open_session.endAt = pc.lastSeenAt
+            open_session.durationSeconds = int(
+                (pc.lastSeenAt - open_session.startAt).total_seconds()
+            )
+            billing.bill_closed_session(open_session)
+            closed.append((pc.pcId, open_session.id))
+
+    db.commit()
+    for pc_id, session_id in closed:
+        open_sessions.discard(pc_id, session_id)
+
+    # Get all PCs, and their active sessions in one query joined in memory
+    pcs = db.query(PC).filter(PC.venueId == venue).order_by(PC.pcId).all()
+    active_sessions = {}
+    for session in db.query(Session).filter(
+        Session.pcId.in_(select(PC.pcId).where(PC.venueId == venue)),
+        Session.endAt.is_(None)
+    ):
+        active_sessions.setdefault(session.pcId, session)
+    result = []
+
+    for pc in pcs:
+        active_session = active_sessions.get(pc.pcId)
+
+        pc_data = PCWithSession(
+            id=pc.id,
+            pcId=pc.pcId,
+            clientUuid=pc.clientUuid,
+            lastSeenAt=pc.lastSeenAt,
+            status=pc.status.value,
+            venueId=pc.venueId,
+            activeSession=SessionBase.model_validate(active_session) if active_session else None
+        )
+        result.append(pc_data)
+
+    # Price all running sessions in one batch
+    if billing.tariff is not None:
+        active = [pc for pc in result if pc.activeSession]
+        now = datetime.utcnow()
+        costs = billing.tariff.price(
+            [pc.pcId for pc in active],
+            [pc.activeSession.startAt for pc in active],
+            [now] * len(active)
+        )
+        for pc, cost in zip(active, costs):
+            pc.liveCost = float(cost)
+
+    return result
+
+
+# Upper bound on how long a snapshot is served without a rebuild
+MAX_AGE_SECONDS = 30
+
+
+def _parse_utc(value: str) -> datetime:
+    """Serialized ISO timestamp -> naive UTC datetime"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class _VenueSnapshot:
+    __slots__ = ("data", "expires_at", "active", "built_at")
+
+    def __init__(
+        self,
+        data: List[dict],
+        expires_at: datetime,
+        active: List[Tuple[int, str, datetime]],
+        built_at: float
+    ):
+        self.data = data
+        self.expires_at = expires_at
+        self.active = active  # (index, pcId, startAt) of running sessions, for live pricing
+        self.built_at = built_at  # time.monotonic() when the build started, 0 if adopted from a broadcast
+
+
+class FleetSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._venues: Dict[str, _VenueSnapshot] = {}
+        self._builds: Dict[str, threading.Lock] = {}
+        self.builds = 0
+        self.coalesced = 0
+
+    def get(self, db: DBSession, venue: str = DEFAULT_VENUE) -> List[dict]:
+        """Return the venue's cached snapshot, rebuilding it when expired"""
+        with self._lock:
+            cached = self._venues.get(venue)
+
+        if cached is None or datetime.utcnow() >= cached.expires_at:
+            return self.refresh(db, venue)
+
+        data, active = cached.data, cached.active
+        if billing.tariff is not None and active:
+            now = datetime.utcnow()
+            costs = billing.tariff.price([a[1] for a in active], [a[2] for a in active], [now] * len(active))
+            # The cached entries are shared with broadcasts, re-price copies
+            data = list(data)
+            for (index, _, _), cost in zip(active, costs):
+                data[index] = {**data[index], "liveCost": float(cost)}
+        return data
+
+    def refresh(self, db: DBSession, venue: str = DEFAULT_VENUE) -> List[dict]:
+        """
+        Rebuild the venue's snapshot from the database.
+
+        Rebuilds of a venue run one at a time. Callers that waited for one
+        which started after they asked get its result instead of building
+        again: it already saw everything they committed before calling.
+        """
+        requested = time.monotonic()
+        with self._lock:
+            build_lock = self._builds.setdefault(venue, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                cached = self._venues.get(venue)
+            if cached is not None and cached.built_at >= requested:
+                self.coalesced += 1
+                return cached.data
+
+            started = time.monotonic()
+            with span("snapshot.build"):
+                pcs = get_pcs_with_sessions(db, venue)
+            with span("snapshot.serialize"):
+                data = [pc.model_dump() for pc in pcs]
+            self._store(venue, data, started)
+            self.builds += 1
+            return data
+
+    def venues(self) -> List[str]:
+        """Venues with a cached snapshot"""
+        with self._lock:
+            return list(self._venues)
+
+    def invalidate(self, venue: Optional[str] = None):
+        """Drop one venue's snapshot, or all of them"""
+        with self._lock:
+            if venue is None:
+                self._venues = {}
+            else:
+                self._venues.pop(venue, None)
+
+    def on_broadcast(self, message: dict):
+        """Adopt fleet updates published by any worker"""
+        if message.get("type") == RESET_MESSAGE_TYPE:
+            self.invalidate()
+            return
+        if message.get("type") != "update":
+            return
+        venue = message.get("venueId", DEFAULT_VENUE)
+        with self._lock:
+            cached = self._venues.get(venue)
+        if cached is None or message.get("data") is not cached.data:
+            self._store(venue, message["data"])
+
+    def stats(self) -> dict:
+        return {"venues": len(self._venues), "builds": self.builds, "coalesced": self.coalesced}
+
+    def _store(self, venue: str, data: List[dict], built_at: float = 0.0):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=MAX_AGE_SECONDS)
+        offline_after = timedelta(minutes=OFFLINE_THRESHOLD_MINUTES)
+        active = []
+
+        for index, pc in enumerate(data):
+            if pc["status"] == PCStatus.ONLINE.value:
+                expires_at = min(expires_at, _parse_utc(pc["lastSeenAt"]) + offline_after)
+            if pc.get("activeSession"):
+                active.append((index, pc["pcId"], _parse_utc(pc["activeSession"]["startAt"])))
+
+        with self._lock:
+            self._venues[venue] = _VenueSnapshot(data, expires_at, active, built_at)
+
+
+# Global instance
+snapshot = FleetSnapshot()
@@ -0,0 +1,308 @@
+"""
+Station telemetry storage.
+
+Clients sample CPU, memory, idle time and the foreground process locally
+and send one summary per heartbeat. Summaries are kept at three
+resolutions:
+
+- telemetry_raw: as received, for TELEMETRY_RAW_RETENTION_HOURS (24)
+- telemetry_minute: 1-minute rollups, for TELEMETRY_MINUTE_RETENTION_DAYS (30)
+- telemetry_hour: hourly rollups, for TELEMETRY_HOUR_RETENTION_DAYS (0 = forever)
+
+Raw rows are written in bulk by a BufferedInserter. Every
+TELEMETRY_ROLLUP_SECONDS a background task rolls finished minutes into
+telemetry_minute and finished hours into telemetry_hour, then deletes rows
+past their retention. Each rollup resumes after the newest bucket already
+written, so a restart or a failed run only delays it. With several workers
+on PostgreSQL an advisory lock lets one of them do a run at a time.
+
+Within a bucket averages are weighted by sample count, maxima are maxima,
+idle time is the longest reported and the foreground process is the one
+seen in most samples.
+"""
+
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func, insert, text
+from sqlalchemy.orm import Session as DBSession
+
+from ..database import SessionLocal
+from ..models import TelemetryHour, TelemetryMinute, TelemetrySample
+from .event_journal import BufferedInserter
+
+logger = logging.getLogger(__name__)
+
+RAW_RETENTION = timedelta(hours=int(os.getenv("TELEMETRY_RAW_RETENTION_HOURS", "24")))
+MINUTE_RETENTION = timedelta(days=int(os.getenv("TELEMETRY_MINUTE_RETENTION_DAYS", "30")))
+HOUR_RETENTION_DAYS = int(os.getenv("TELEMETRY_HOUR_RETENTION_DAYS", "0"))
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("TELEMETRY_ROLLUP_SECONDS", "60"))
+
+# A minute is rolled up this long after it ends, once buffered raw rows have been written
+ROLLUP_LAG = timedelta(seconds=30)
+
+# Buckets aggregated per query, bounds memory when catching up on a backlog
+MAX_BUCKETS_PER_QUERY = 360
+
+# Serializes rollup runs between workers (Postgres)
+ADVISORY_LOCK_ID = 7204020
+
+VALUE_FIELDS = ("samples", "cpuAvg", "cpuMax", "memAvg", "memMax", "idleSeconds", "foreground")
+
+# name -> (model, time column, bucket seconds); raw rows are one per heartbeat
+RESOLUTIONS = {
+    "raw": (TelemetrySample, TelemetrySample.at, None),
+    "minute": (TelemetryMinute, TelemetryMinute.bucket, 60),
+    "hour": (TelemetryHour, TelemetryHour.bucket, 3600),
+}
+
+# Spacing assumed for raw rows when estimating a series' size (default client heartbeat interval)
+RAW_SPACING_SECONDS = 30
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _floor(dt: datetime, seconds: int) -> datetime:
+    return EPOCH + timedelta(seconds=int((dt - EPOCH).total_seconds()) // seconds * seconds)
+
+
+def _column(rows, index: int) -> np.ndarray:
+    return np.array([np.nan if row[index] is None else row[index] for row in rows], dtype=np.float64)
+
+
+def _value(value: float, digits: int = 1) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def rollup(rows, seconds: int) -> List[dict]:
+    """
+    Aggregate telemetry rows into buckets of the given size, per PC.
+
+    rows are (pcId, time, samples, cpuAvg, cpuMax, memAvg, memMax,
+    idleSeconds, foreground) with naive UTC times.
+    """
+    if not rows:
+        return []
+
+    times = np.array([row[1] for row in rows], dtype="datetime64[s]").astype(np.int64)
+    buckets = times // seconds
+    first = buckets.min()
+    span = int(buckets.max() - first) + 1
+    unique_pcs, pc_index = np.unique(np.array([row[0] for row in rows], dtype=object), return_inverse=True)
+    groups, inverse = np.unique(pc_index * span + (buckets - first), return_inverse=True)
+    count = len(groups)
+
+    samples = np.array([row[2] for row in rows], dtype=np.float64)
+    total_samples = np.bincount(inverse, weights=samples, minlength=count)
+
+    def weighted_mean(values):
+        known = ~np.isnan(values)
+        weight = np.bincount(inverse, weights=np.where(known, samples, 0.0), minlength=count)
+        total = np.bincount(inverse, weights=np.where(known, values * samples, 0.0), minlength=count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return total / weight  # NaN where no row had a value
+
+    def maximum(values):
+        result = np.full(count, np.nan)
+        np.fmax.at(result, inverse, values)
+        return result
+
+    cpu_avg, mem_avg = weighted_mean(_column(rows, 3)), weighted_mean(_column(rows, 5))
+    cpu_max, mem_max = maximum(_column(rows, 4)), maximum(_column(rows, 6))
+    idle = maximum(_column(rows, 7))
+
+    votes = [Counter() for _ in range(count)]
+    for group, row, weight in zip(inverse, rows, samples):
+        if row[8]:
+            votes[group][row[8]] += weight
+
+    return [
+        {
+            "pcId": str(unique_pcs[group // span]),
+            "bucket": EPOCH + timedelta(seconds=int(first + group % span) * seconds),
+            "samples": int(total_samples[i]),
+            "cpuAvg": _value(cpu_avg[i]),
+            "cpuMax": _value(cpu_max[i]),
+            "memAvg": _value(mem_avg[i]),
+            "memMax": _value(mem_max[i]),
+            "idleSeconds": None if np.isnan(idle[i]) else int(idle[i]),
+            "foreground": votes[i].most_common(1)[0][0] if votes[i] else None,
+        }
+        for i, group in enumerate(groups)
+    ]
+
+
+def naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _iso(dt: datetime) -> str:
+    return dt.replace(tzinfo=timezone.utc).isoformat()
+
+
+class TelemetryStore:
+    def __init__(self):
+        self.raw = BufferedInserter(TelemetrySample.__table__)
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.runs = 0
+        self.minutes_written = 0
+        self.hours_written = 0
+        self.pruned = 0
+        self.last_run_ms: Optional[float] = None
+
+    def record(self, pc_id: str, summary: dict, received_at: Optional[datetime] = None):
+        """Queue one heartbeat's telemetry summary; safe to call from any thread"""
+        row = {field: summary.get(field) for field in VALUE_FIELDS}
+        row["samples"] = row["samples"] or 1
+        # UDP datagrams carry up to 255 bytes, the column holds what the HTTP schema keeps
+        row["foreground"] = row["foreground"][:100] if row["foreground"] else None
+        row["pcId"] = pc_id
+        row["at"] = received_at or datetime.utcnow()
+        self.raw.add(row)
+        self.recorded += 1
+
+    # Rollups and retention
+
+    def _roll(self, db: DBSession, source, time_column, target, seconds: int, cutoff: datetime) -> int:
+        """Roll source rows before cutoff (bucket aligned) into target, returns buckets written"""
+        written = 0
+        step = timedelta(seconds=seconds)
+        while True:
+            newest = db.query(func.max(target.bucket)).scalar()
+            query = db.query(func.min(time_column)).filter(time_column < cutoff)
+            if newest is not None:
+                query = query.filter(time_column >= newest + step)
+            first = query.scalar()
+            if first is None:
+                return written
+
+            start = _floor(first, seconds)
+            end = min(cutoff, start + step * MAX_BUCKETS_PER_QUERY)
+            rows = db.query(
+                source.pcId, time_column, *(getattr(source, field) for field in VALUE_FIELDS)
+            ).filter(time_column >= start, time_column < end).all()
+
+            buckets = rollup(rows, seconds)
+            db.execute(insert(target), buckets)
+            written += len(buckets)
+
+    def run_once(self, db: DBSession, now: Optional[datetime] = None) -> bool:
+        """One rollup and pruning pass, returns False if another worker holds the lock"""
+        now = now or datetime.utcnow()
+        if db.get_bind().dialect.name == "postgresql":
+            if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID}).scalar():
+                db.rollback()
+                return False
+
+        minute_cutoff = _floor(now - ROLLUP_LAG, 60)
+        minutes = self._roll(db, TelemetrySample, TelemetrySample.at, TelemetryMinute, 60, minute_cutoff)
+        # Minutes before minute_cutoff are all written now, so whole hours before it are final
+        hours = self._roll(db, TelemetryMinute, TelemetryMinute.bucket, TelemetryHour, 3600, _floor(minute_cutoff, 3600))
+
+        pruned = db.query(TelemetrySample).filter(TelemetrySample.at < now - RAW_RETENTION).delete()
+        pruned += db.query(TelemetryMinute).filter(TelemetryMinute.bucket < now - MINUTE_RETENTION).delete()
+        if HOUR_RETENTION_DAYS:
+            pruned += db.query(TelemetryHour).filter(
+                TelemetryHour.bucket < now - timedelta(days=HOUR_RETENTION_DAYS)
+            ).delete()
+        db.commit()
+
+        self.runs += 1
+        self.minutes_written += minutes
+        self.hours_written += hours
+        self.pruned += pruned
+        return True
+
+    def _run_in_thread(self):
+        db = SessionLocal()
+        try:
+            self.run_once(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Telemetry rollup failed: {e}")
+        finally:
+            db.close()
+
+    async def start(self):
+        await self.raw.start()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.raw.stop()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(ROLLUP_INTERVAL_SECONDS)
+            started = loop.time()
+            await asyncio.to_thread(self._run_in_thread)
+            self.last_run_ms = round((loop.time() - started) * 1000, 1)
+
+    # Queries
+
+    def pick_resolution(self, start: datetime, end: datetime, max_points: int,
+                        now: Optional[datetime] = None) -> str:
+        """Finest resolution that still covers start and fits in max_points"""
+        now = now or datetime.utcnow()
+        seconds = (end - start).total_seconds()
+        if start >= now - RAW_RETENTION and seconds / RAW_SPACING_SECONDS <= max_points:
+            return "raw"
+        if start >= now - MINUTE_RETENTION and seconds / 60 <= max_points:
+            return "minute"
+        return "hour"
+
+    @staticmethod
+    def estimated_points(start: datetime, end: datetime, resolution: str) -> int:
+        seconds = RESOLUTIONS[resolution][2] or RAW_SPACING_SECONDS
+        return int((end - start).total_seconds() // seconds) + 1
+
+    def series(self, db: DBSession, pc_id: str, start: datetime, end: datetime, resolution: str) -> dict:
+        """One PC's telemetry in [start, end) as columns, oldest first"""
+        start, end = naive_utc(start), naive_utc(end)
+        model, time_column, seconds = RESOLUTIONS[resolution]
+        rows = db.query(
+            time_column, *(getattr(model, field) for field in VALUE_FIELDS)
+        ).filter(
+            model.pcId == pc_id, time_column >= start, time_column < end
+        ).order_by(time_column).all()
+
+        columns = list(zip(*rows)) if rows else [()] * (len(VALUE_FIELDS) + 1)
+        return {
+            "pcId": pc_id,
+            "resolution": resolution,
+            "bucketSeconds": seconds,
+            "from": _iso(start),
+            "to": _iso(end),
+            "count": len(rows),
+            "timestamps": [_iso(dt) for dt in columns[0]],
+            **{field: list(values) for field, values in zip(VALUE_FIELDS, columns[1:])},
+        }
+
+    def stats(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "rollupRuns": self.runs,
+            "minutesWritten": self.minutes_written,
+            "hoursWritten": self.hours_written,
+            "pruned": self.pruned,
+            "lastRunMs": self.last_run_ms,
+        }
+
+
+# Global instance
+telemetry = TelemetryStore()
@@ -0,0 +1,216 @@
+"""
+Optional UDP heartbeat listener.
+
+Clients may send heartbeats as one signed datagram instead of an HTTP
+request; start and stop always stay on HTTP. Enabled by setting
+UDP_HEARTBEAT_PORT and UDP_HEARTBEAT_SECRET. Datagram layout (big endian):
+
+    magic "LH" | version u8 | timestamp ms u64 | pcId len u8 | pcId
+    | clientUuid len u8 | clientUuid | [telemetry] | HMAC-SHA256(secret, everything before)[:16]
+
+Version 2 datagrams carry the client's telemetry summary (see
+services/telemetry.py) after clientUuid:
+
+    samples u16 | cpuAvg u16 | cpuMax u16 | memAvg u16 | memMax u16
+    | idleSeconds u32 | foreground len u8 | foreground
+
+Percentages are in tenths; all-ones means the value is unknown. Version 1
+datagrams (no telemetry) are still accepted.
+
+Datagrams with a bad tag, a timestamp more than UDP_HEARTBEAT_MAX_SKEW
+seconds off, or a timestamp not newer than the last accepted one for the
+PC are dropped silently, so a captured datagram cannot be replayed.
+
+The last accepted timestamps are kept per process. With several workers
+sharing the port (SO_REUSEPORT) a captured datagram can still be accepted
+once by each other worker while it is within the skew window, which can
+reopen a session for a PC that stopped in the meantime. Keep
+UDP_HEARTBEAT_MAX_SKEW as tight as the clients' clock sync allows, or run
+the listener in a single worker.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import socket
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .event_journal import journal
+from .liveness import liveness
+from .telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+UDP_HEARTBEAT_HOST = os.getenv("UDP_HEARTBEAT_HOST", "0.0.0.0")
+UDP_HEARTBEAT_PORT = int(os.getenv("UDP_HEARTBEAT_PORT", "0") or 0)
+UDP_HEARTBEAT_SECRET = os.getenv("UDP_HEARTBEAT_SECRET", "")
+MAX_SKEW_SECONDS = int(os.getenv("UDP_HEARTBEAT_MAX_SKEW", "60"))
+
+MAGIC = b"LH"
+VERSION = 1
+TELEMETRY_VERSION = 2
+TAG_SIZE = 16
+_HEADER = struct.Struct(">2sBQ")
+_TELEMETRY = struct.Struct(">HHHHHI")
+_PERCENT_FIELDS = ("cpuAvg", "cpuMax", "memAvg", "memMax")
+_UNKNOWN_U16 = 0xFFFF
+_UNKNOWN_U32 = 0xFFFFFFFF
+
+
+def encode_telemetry(summary: dict) -> bytes:
+    """Compact binary form of a telemetry summary"""
+    percents = [
+        _UNKNOWN_U16 if summary.get(field) is None else min(max(int(round(summary[field] * 10)), 0), 1000)
+        for field in _PERCENT_FIELDS
+    ]
+    idle = summary.get("idleSeconds")
+    foreground = (summary.get("foreground") or "").encode()[:255]
+    return (
+        _TELEMETRY.pack(
+            min(summary.get("samples") or 1, _UNKNOWN_U16), *percents,
+            _UNKNOWN_U32 if idle is None else min(max(int(idle), 0), _UNKNOWN_U32 - 1)
+        )
+        + bytes([len(foreground)]) + foreground
+    )
+
+
+def decode_telemetry(data: bytes) -> dict:
+    """Inverse of encode_telemetry; raises ValueError if data is not exactly one summary"""
+    samples, *percents, idle = _TELEMETRY.unpack_from(data)
+    fg_len = data[_TELEMETRY.size]
+    if len(data) != _TELEMETRY.size + 1 + fg_len:
+        raise ValueError("Bad telemetry length")
+    summary = {"samples": samples}
+    for field, value in zip(_PERCENT_FIELDS, percents):
+        summary[field] = None if value == _UNKNOWN_U16 else min(value, 1000) / 10
+    summary["idleSeconds"] = None if idle == _UNKNOWN_U32 else idle
+    summary["foreground"] = data[_TELEMETRY.size + 1:].decode(errors="replace") or None
+    return summary
+
+
+def encode_heartbeat(secret: bytes, pc_id: str, client_uuid: str, timestamp_ms: int,
+                     summary: Optional[dict] = None) -> bytes:
+    """Build a signed heartbeat datagram (the client has its own copy of this)"""
+    pc = pc_id.encode()
+    uuid = client_uuid.encode()
+    version = VERSION if summary is None else TELEMETRY_VERSION
+    body = _HEADER.pack(MAGIC, version, timestamp_ms) + bytes([len(pc)]) + pc + bytes([len(uuid)]) + uuid
+    if summary is not None:
+        body += encode_telemetry(summary)
+    return body + hmac.new(secret, body, hashlib.sha256).digest()[:TAG_SIZE]
+
+
+def decode_heartbeat(secret: bytes, data: bytes) -> Optional[Tuple[str, str, int, Optional[dict]]]:
+    """Return (pcId, clientUuid, timestamp ms, telemetry or None), or None if the datagram is malformed or forged"""
+    if len(data) < _HEADER.size + 2 + TAG_SIZE:
+        return None
+    body, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+    if not hmac.compare_digest(tag, hmac.new(secret, body, hashlib.sha256).digest()[:TAG_SIZE]):
+        return None
+
+    magic, version, timestamp_ms = _HEADER.unpack_from(body)
+    if magic != MAGIC or version not in (VERSION, TELEMETRY_VERSION):
+        return None
+    try:
+        offset = _HEADER.size
+        pc_len = body[offset]
+        pc_id = body[offset + 1:offset + 1 + pc_len].decode()
+        offset += 1 + pc_len
+        uuid_len = body[offset]
+        client_uuid = body[offset + 1:offset + 1 + uuid_len].decode()
+        offset += 1 + uuid_len
+        summary = decode_telemetry(body[offset:]) if version == TELEMETRY_VERSION else None
+    except (IndexError, UnicodeDecodeError, ValueError, struct.error):
+        return None
+    if (summary is None and offset != len(body)) or not pc_id:
+        return None
+    return pc_id, client_uuid, timestamp_ms, summary
+
+
+class HeartbeatProtocol(asyncio.DatagramProtocol):
+    def __init__(self, secret: bytes, max_skew: int = MAX_SKEW_SECONDS):
+        self.secret = secret
+        self.max_skew_ms = max_skew * 1000
+        self._last_seen: Dict[str, int] = {}
+        self.accepted = 0
+        self.rejected = 0
+
+    def datagram_received(self, data: bytes, addr):
+        decoded = decode_heartbeat(self.secret, data)
+        if decoded is None:
+            self.rejected += 1
+            return
+        pc_id, client_uuid, timestamp_ms, summary = decoded
+
+        now_ms = int(time.time() * 1000)
+        if abs(now_ms - timestamp_ms) > self.max_skew_ms or timestamp_ms <= self._last_seen.get(pc_id, 0):
+            self.rejected += 1
+            return
+        self._last_seen[pc_id] = timestamp_ms
+        self.accepted += 1
+
+        timestamp = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+        journal.add({
+            "pcId": pc_id,
+            "clientUuid": client_uuid,
+            "type": "heartbeat",
+            "timestamp": timestamp,
+            "receivedAt": datetime.utcnow(),
+        })
+        liveness.touch(pc_id, client_uuid, timestamp)
+        if summary is not None:
+            telemetry.record(pc_id, summary)
+
+
+class UdpHeartbeatListener:
+    def __init__(self):
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._protocol: Optional[HeartbeatProtocol] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(UDP_HEARTBEAT_PORT)
+
+    async def start(self):
+        if not self.enabled:
+            return
+        if not UDP_HEARTBEAT_SECRET:
+            logger.error("UDP_HEARTBEAT_PORT is set but UDP_HEARTBEAT_SECRET is not, UDP heartbeats disabled")
+            return
+
+        loop = asyncio.get_running_loop()
+        # With several workers the kernel spreads datagrams across them
+        reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self._transport, self._protocol = await loop.create_datagram_endpoint(
+            lambda: HeartbeatProtocol(UDP_HEARTBEAT_SECRET.encode()),
+            local_addr=(UDP_HEARTBEAT_HOST, UDP_HEARTBEAT_PORT),
+            reuse_port=reuse_port or None,
+        )
+        await liveness.start()
+        logger.info(f"Listening for UDP heartbeats on {UDP_HEARTBEAT_HOST}:{UDP_HEARTBEAT_PORT}")
+
+    async def stop(self):
+        if self._transport is None:
+            return
+        self._transport.close()
+        self._transport = None
+        await liveness.stop()
+
+    def stats(self) -> dict:
+        if self._protocol is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "accepted": self._protocol.accepted,
+            "rejected": self._protocol.rejected,
+            **liveness.stats(),
+        }
+
+
+# Global instance
+udp_heartbeats = UdpHeartbeatListener()
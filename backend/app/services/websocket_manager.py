@@ -1,37 +1,94 @@
 from fastapi import WebSocket
-from typing import Set
+from typing import Callable, Dict, List, Union
 import logging
 
+from .broadcast_bus import create_bus
+from .profiling import span
+from .ws_encoding import DEFAULT_FORMAT, WireFormat, encode
+from ..venues import DEFAULT_VENUE
+
 logger = logging.getLogger(__name__)
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    def __init__(self, bus=None):
+        self.active_connections: Dict[WebSocket, WireFormat] = {}
+        # Broadcast groups: the clients watching each venue
+        self.groups: Dict[str, Dict[WebSocket, WireFormat]] = {}
+        self.bus = bus or create_bus()
+        self.listeners: List[Callable[[dict], None]] = []
+
+    async def start(self):
+        """Subscribe to the broadcast bus so messages from any worker reach our sockets"""
+        await self.bus.start(self._on_message)
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call listener with every broadcast this worker receives (e.g. to sync caches)"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    async def _on_message(self, message: dict):
+        for listener in self.listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"Broadcast listener failed: {e}")
+        await self.send_local(message)
 
-    async def connect(self, websocket: WebSocket):
+    async def stop(self):
+        await self.bus.stop()
+
+    async def connect(self, websocket: WebSocket, wire_format: WireFormat = DEFAULT_FORMAT, venue: str = DEFAULT_VENUE):
         await websocket.accept()
-        self.active_connections.add(websocket)
+        self.active_connections[websocket] = wire_format
+        self.groups.setdefault(venue, {})[websocket] = wire_format
         logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
+        self.active_connections.pop(websocket, None)
+        for venue, group in list(self.groups.items()):
+            if group.pop(websocket, None) is not None and not group:
+                del self.groups[venue]
         logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
 
     async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
+        """Broadcast message to all connected clients of every worker"""
+        with span("broadcast"):
+            await self.bus.publish(message)
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Send message to one client in its wire format"""
+        await self._send_encoded(websocket, encode(message, self.active_connections.get(websocket, DEFAULT_FORMAT)))
+
+    async def send_local(self, message: dict):
+        """Send message to the clients connected to this worker that watch its venue (all if it has none)"""
+        venue = message.get("venueId")
+        targets = self.active_connections if venue is None else self.groups.get(venue, {})
         disconnected = set()
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending to client: {e}")
-                disconnected.add(connection)
+        encoded: Dict[WireFormat, Union[str, bytes]] = {}
+        with span("fanout"):
+            for connection, wire_format in list(targets.items()):
+                try:
+                    # Encode once per wire format, not once per client
+                    if wire_format not in encoded:
+                        with span("serialize"):
+                            encoded[wire_format] = encode(message, wire_format)
+                    await self._send_encoded(connection, encoded[wire_format])
+                except Exception as e:
+                    logger.error(f"Error sending to client: {e}")
+                    disconnected.add(connection)
 
         # Clean up disconnected clients
         for conn in disconnected:
             self.disconnect(conn)
 
+    @staticmethod
+    async def _send_encoded(websocket: WebSocket, payload: Union[str, bytes]):
+        if isinstance(payload, bytes):
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+
 
 # Global instance
 manager = ConnectionManager()
@@ -0,0 +1,121 @@
+"""
+Wire formats for /ws.
+
+Clients pick one when connecting: /ws?encoding=json|msgpack&layout=rows|columnar
+
+- json (default): text frames, the messages as they are.
+- msgpack: binary frames, timestamps as epoch milliseconds. Needs the
+  msgpack package; without it clients get JSON.
+- columnar: fleet snapshots ("initial_state"/"update") are sent as
+  {"type", "columns": {field: [values...]}} instead of a list of objects,
+  so keys are sent once per message instead of once per PC. activeSession
+  fields become "activeSession.<field>" columns, null where a PC has none
+  (activeSession.id is never null for a real session).
+
+Encoding is done once per format per broadcast, not once per socket.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("json", "msgpack")
+LAYOUTS = ("rows", "columnar")
+
+SNAPSHOT_TYPES = ("initial_state", "update")
+TIMESTAMP_FIELDS = frozenset(("lastSeenAt", "startAt", "endAt", "createdAt", "updatedAt"))
+SESSION_PREFIX = "activeSession."
+
+
+class WireFormat(NamedTuple):
+    encoding: str = "json"
+    layout: str = "rows"
+
+
+DEFAULT_FORMAT = WireFormat()
+
+
+def parse_format(encoding: Optional[str], layout: Optional[str]) -> WireFormat:
+    """Wire format for the requested query parameters, falling back to the defaults"""
+    encoding = (encoding or "json").lower()
+    layout = (layout or "rows").lower()
+    if encoding not in ENCODINGS:
+        logger.warning(f"Unknown WebSocket encoding '{encoding}', using json")
+        encoding = "json"
+    if encoding == "msgpack" and msgpack is None:
+        logger.warning("msgpack is not installed, using json")
+        encoding = "json"
+    if layout not in LAYOUTS:
+        logger.warning(f"Unknown WebSocket layout '{layout}', using rows")
+        layout = "rows"
+    return WireFormat(encoding, layout)
+
+
+def _epoch_ms(value: str) -> int:
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _is_timestamp(key: str) -> bool:
+    return key.rsplit(".", 1)[-1] in TIMESTAMP_FIELDS
+
+
+def _epoch_timestamps(value):
+    """Copy of a message with ISO timestamp fields replaced by epoch milliseconds"""
+    if isinstance(value, list):
+        return [_epoch_timestamps(item) for item in value]
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if isinstance(item, str) and _is_timestamp(key):
+                result[key] = _epoch_ms(item)
+            elif isinstance(item, list) and _is_timestamp(key):
+                result[key] = [_epoch_ms(v) if isinstance(v, str) else v for v in item]
+            else:
+                result[key] = _epoch_timestamps(item)
+        return result
+    return value
+
+
+def _columnar(message: dict) -> dict:
+    pcs = message["data"]
+    columns = {}
+    if pcs:
+        pc_fields = [field for field in pcs[0] if field != "activeSession"]
+        for field in pc_fields:
+            columns[field] = [pc.get(field) for pc in pcs]
+
+        session_fields = []
+        for pc in pcs:
+            if pc.get("activeSession"):
+                session_fields = list(pc["activeSession"])
+                break
+        for field in session_fields:
+            columns[SESSION_PREFIX + field] = [
+                pc["activeSession"].get(field) if pc.get("activeSession") else None for pc in pcs
+            ]
+
+    result = {key: value for key, value in message.items() if key != "data"}
+    result["columns"] = columns
+    result["count"] = len(pcs)
+    return result
+
+
+def encode(message: dict, wire_format: WireFormat) -> Union[str, bytes]:
+    """Encode a message for one wire format: str for text frames, bytes for binary"""
+    if wire_format.layout == "columnar" and message.get("type") in SNAPSHOT_TYPES:
+        message = _columnar(message)
+
+    if wire_format.encoding == "msgpack":
+        return msgpack.packb(_epoch_timestamps(message))
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,26 @@
+"""
+Venue (tenant) scoping.
+
+Every PC, session and beverage belongs to a venue. Requests pick theirs
+with ?venue=<id>; single-venue deployments never need to, everything lives
+in DEFAULT_VENUE. pcId stays unique across venues, and a PC keeps the venue
+it first reported from.
+"""
+
+import re
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+DEFAULT_VENUE = "default"
+VENUE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,50}$")
+
+
+def is_valid_venue(venue: Optional[str]) -> bool:
+    return bool(venue) and VENUE_PATTERN.match(venue) is not None
+
+
+def get_venue(venue: str = Query(DEFAULT_VENUE, description="Venue ID")) -> str:
+    if not is_valid_venue(venue):
+        raise HTTPException(status_code=400, detail="Invalid venue")
+    return venue
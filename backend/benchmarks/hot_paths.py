@@ -0,0 +1,410 @@
+"""
+Hot-path benchmarks at realistic fleet and history sizes.
+
+Seeds a SQLite database per scenario (PCs x sessions) and times the
+requests that run all day: building the fleet snapshot, /api/events per
+event type, /api/sessions with every filter combination, the beverage list
+and a WebSocket broadcast to N in-process sockets. Every benchmark also
+reports the SQL statements it runs and its peak Python memory (tracemalloc,
+measured in a separate run so it doesn't distort the timings).
+
+Each scenario runs in a fresh interpreter. Seeded databases are kept in
+--data-dir and copied before each run, so only the first run pays for
+seeding (the 1M-session history takes a while).
+
+Requires requirements-dev.txt (httpx, used by FastAPI's TestClient).
+
+Usage:
+    python -m benchmarks.hot_paths                          # from backend/
+    python -m benchmarks.hot_paths --pcs 500 --sessions 10000
+    python -m benchmarks.hot_paths --only events --json results.json
+    python -m benchmarks.hot_paths --compare results.json   # flag regressions
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "l2pcontrol-bench")
+
+BEVERAGE_COUNT = 50
+USER_COUNT = 200
+SOCKET_COUNTS = (10, 100, 1000)
+SESSION_FILTERS = ("status", "pcId", "user", "dateFrom", "dateTo")
+
+# Stop repeating a benchmark once it has used this much time
+TIME_BUDGET_SECONDS = 5.0
+
+# Timing slowdown that --compare reports as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+# Seeding
+
+
+def seed(path, pc_count, session_count):
+    """Create a fleet with session history; half the PCs are online with an open session"""
+    import random
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import create_engine, insert
+
+    from app.models import Beverage, PC, PCStatus, PaidStatus, Session
+    from app.schema import ensure_schema
+
+    engine = create_engine(f"sqlite:///{path}")
+    ensure_schema(engine)
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    online = pc_count // 2
+
+    # Online PCs are "seen" in the future so the offline sweep never runs mid-benchmark
+    pcs = [
+        {
+            "pcId": f"PC-{i:04d}",
+            "clientUuid": f"bench-{i}",
+            "lastSeenAt": now + timedelta(days=1) if i < online else now - timedelta(days=1),
+            "status": PCStatus.ONLINE if i < online else PCStatus.OFFLINE,
+        }
+        for i in range(pc_count)
+    ]
+
+    def closed_sessions():
+        for k in range(session_count - online):
+            start = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            duration = rng.randrange(1800, 4 * 3600)
+            paid = rng.random() < 0.7
+            yield {
+                "pcId": f"PC-{k % pc_count:04d}",
+                "userName": f"user-{rng.randrange(USER_COUNT)}" if rng.random() < 0.3 else None,
+                "startAt": start,
+                "endAt": start + timedelta(seconds=duration),
+                "durationSeconds": duration,
+                "paidStatus": PaidStatus.PAID if paid else PaidStatus.UNPAID,
+                "amountDue": None,
+                "amountPaid": None,
+                "notes": None,
+            }
+
+    open_sessions = [
+        {
+            "pcId": f"PC-{i:04d}",
+            "userName": None,
+            "startAt": now - timedelta(minutes=rng.randrange(1, 240)),
+            "endAt": None,
+            "durationSeconds": None,
+            "paidStatus": PaidStatus.UNPAID,
+            "amountDue": None,
+            "amountPaid": None,
+            "notes": None,
+        }
+        for i in range(online)
+    ]
+
+    beverages = [
+        {
+            "name": f"Beverage {i}",
+            "quantity": 100,
+            "expectedStock": 100,
+            "pricePerUnit": 1.5,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        for i in range(BEVERAGE_COUNT)
+    ]
+
+    with engine.begin() as conn:
+        conn.execute(insert(PC), pcs)
+        conn.execute(insert(Beverage), beverages)
+        conn.execute(insert(Session), open_sessions)
+        batch = []
+        for row in closed_sessions():
+            batch.append(row)
+            if len(batch) == 50000:
+                conn.execute(insert(Session), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Session), batch)
+    engine.dispose()
+
+
+# Measuring
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+class FakeWebSocket:
+    """Stands in for a connected dashboard: encodes like Starlette, discards the bytes"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, data):
+        self.sent += len(data)
+
+    async def send_bytes(self, data):
+        self.sent += len(data)
+
+
+def measure(fn, repeat, counter):
+    """Time fn, then run it once more under tracemalloc for the memory peak"""
+    timings = []
+    counter.count = 0
+    spent = 0.0
+    while len(timings) < repeat and spent < TIME_BUDGET_SECONDS:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+    statements = counter.count / len(timings)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "statements": statements,
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_scenario(pc_count, repeat, only):
+    """Run every benchmark against the database in DATABASE_URL"""
+    import asyncio
+    import logging
+    from datetime import datetime, timedelta, timezone
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app.database import SessionLocal
+    from app.main import app
+    from app.services.beverage_catalog import catalog
+    from app.services.snapshot import get_pcs_with_sessions, snapshot
+    from app.services.websocket_manager import manager
+    from app.services.ws_encoding import DEFAULT_FORMAT
+    from app.venues import DEFAULT_VENUE
+
+    logging.disable(logging.INFO)
+    counter = StatementCounter()
+    event.listen(Engine, "before_cursor_execute", counter)
+    results = {}
+
+    def bench(name, fn):
+        if only and only not in name:
+            return
+        results[name] = measure(fn, repeat, counter)
+        print(f"  {name:<48}{results[name]['median_ms']:>10.2f} ms", file=sys.stderr)
+
+    with TestClient(app) as client:
+        db = SessionLocal()
+
+        def build_snapshot():
+            get_pcs_with_sessions(db)
+            db.rollback()
+
+        bench("snapshot build (get_pcs_with_sessions)", build_snapshot)
+        bench("GET /api/pcs (cached)", lambda: client.get("/api/pcs").raise_for_status())
+
+        today = datetime.utcnow().date()
+        filter_values = {
+            "status": "UNPAID",
+            "pcId": "PC-001",
+            "user": "user-1",
+            "dateFrom": (today - timedelta(days=30)).isoformat(),
+            "dateTo": today.isoformat(),
+        }
+        for size in range(len(SESSION_FILTERS) + 1):
+            for combo in itertools.combinations(SESSION_FILTERS, size):
+                params = {name: filter_values[name] for name in combo}
+                label = "+".join(combo) or "no filters"
+                bench(
+                    f"GET /api/sessions [{label}]",
+                    lambda params=params: client.get("/api/sessions", params=params).raise_for_status()
+                )
+
+        def cold_beverages():
+            catalog.invalidate()
+            client.get("/api/beverages").raise_for_status()
+
+        bench("GET /api/beverages (cached)", lambda: client.get("/api/beverages").raise_for_status())
+        bench("GET /api/beverages (rebuild)", cold_beverages)
+
+        message = {"type": "update", "venueId": DEFAULT_VENUE, "data": snapshot.get(db)}
+        loop = asyncio.new_event_loop()
+        for sockets in SOCKET_COUNTS:
+            def broadcast(sockets=sockets):
+                connections = {FakeWebSocket(): DEFAULT_FORMAT for _ in range(sockets)}
+                manager.active_connections = connections
+                manager.groups = {DEFAULT_VENUE: dict(connections)}
+                loop.run_until_complete(manager.send_local(message))
+            bench(f"broadcast snapshot to {sockets} sockets", broadcast)
+        manager.active_connections = {}
+        manager.groups = {}
+        loop.close()
+        db.close()
+
+        # Events last: they move PCs' lastSeenAt to now, which later sweeps would see.
+        # Heartbeat and start use the first half of the online PCs, stop the second.
+        online = pc_count // 2
+        halves = {
+            "heartbeat": itertools.cycle(range(online // 2 or 1)),
+            "start": itertools.cycle(range(online // 2 or 1)),
+            "stop": itertools.cycle(range(online // 2, online) or [0]),
+        }
+        for event_type in ("heartbeat", "start", "stop"):
+            def post_event(event_type=event_type):
+                i = next(halves[event_type])
+                client.post("/api/events", json={
+                    "pcId": f"PC-{i:04d}",
+                    "clientUuid": f"bench-{i}",
+                    "type": event_type,
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                }).raise_for_status()
+            bench(f"POST /api/events [{event_type}]", post_event)
+
+    return results
+
+
+# Driver
+
+
+def run_child(data_dir, pc_count, session_count, repeat, only):
+    """Seed if needed and run one scenario; called in a fresh interpreter"""
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "bench.db")
+
+    # Must be set before anything imports app.database
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+    os.environ.pop("UDP_HEARTBEAT_PORT", None)
+    os.environ["BROADCAST_BACKEND"] = "memory"
+
+    seeded = os.path.join(data_dir, f"fleet-{pc_count}-{session_count}.db")
+    if not os.path.exists(seeded):
+        print(f"Seeding {pc_count} PCs / {session_count} sessions...", file=sys.stderr)
+        started = time.perf_counter()
+        seed(seeded + ".tmp", pc_count, session_count)
+        os.replace(seeded + ".tmp", seeded)
+        print(f"  seeded in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    try:
+        shutil.copyfile(seeded, db_path)
+        return run_scenario(pc_count, repeat, only)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_results(scenario, results, baseline):
+    print()
+    print(f"== {scenario}")
+    header = f"{'benchmark':<50}{'median ms':>11}{'min ms':>10}{'SQL':>8}{'peak KB':>10}{'runs':>6}"
+    if baseline is not None:
+        header += f"{'vs base':>10}"
+    print(header)
+
+    regressions = []
+    for name, r in results.items():
+        line = (
+            f"{name:<50}{r['median_ms']:>11.2f}{r['min_ms']:>10.2f}"
+            f"{r['statements']:>8.1f}{r['peak_kb']:>10.0f}{r['runs']:>6}"
+        )
+        base = (baseline or {}).get(name)
+        if base:
+            change = r["median_ms"] / base["median_ms"] - 1
+            line += f"{change:>+10.0%}"
+            if change > REGRESSION_THRESHOLD or r["statements"] > base["statements"]:
+                line += "  <-- regression"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend hot paths")
+    parser.add_argument("--pcs", default="50,500,5000", help="comma separated fleet sizes")
+    parser.add_argument("--sessions", default="10000,1000000", help="comma separated history sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="max timed runs per benchmark")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where seeded databases are kept")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file from an earlier --json run")
+    parser.add_argument("--child", nargs=2, type=int, metavar=("PCS", "SESSIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    if args.child:
+        results = run_child(args.data_dir, *args.child, args.repeat, args.only)
+        print(json.dumps(results))
+        return 0
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    all_results = {}
+    regressions = []
+    for pc_count in [int(v) for v in args.pcs.split(",")]:
+        for session_count in [int(v) for v in args.sessions.split(",")]:
+            scenario = f"{pc_count} PCs / {session_count} sessions"
+            print(f"Running {scenario}", file=sys.stderr)
+            command = [
+                sys.executable, "-m", "benchmarks.hot_paths",
+                "--child", str(pc_count), str(session_count),
+                "--repeat", str(args.repeat), "--data-dir", args.data_dir,
+            ]
+            if args.only:
+                command += ["--only", args.only]
+            result = subprocess.run(
+                command, cwd=BACKEND_DIR, env=dict(os.environ, PYTHONPATH=BACKEND_DIR),
+                stdout=subprocess.PIPE, text=True, check=True
+            )
+            all_results[scenario] = json.loads(result.stdout.strip().splitlines()[-1])
+            regressions += [
+                f"{scenario}: {name}"
+                for name in print_results(
+                    scenario, all_results[scenario],
+                    None if baseline is None else baseline.get(scenario, {})
+                )
+            ]
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
+
+    if regressions:
+        print()
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
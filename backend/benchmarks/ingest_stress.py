@@ -0,0 +1,148 @@
+"""
+Concurrency stress test for event ingestion.
+
+Fires bursts of start/heartbeat/stop events at /api/events from many
+threads at once, with several events of the same PC in flight together
+(retried starts, heartbeats racing a start), then checks the invariants:
+
+- no PC has more than one open session
+- no request failed with a server error
+- the in-memory open-session index agrees with the database
+
+By default the unique index on open sessions is dropped first, so a
+duplicate can only be prevented by the per-PC lanes; pass --keep-index to
+test with the database backstop in place. SQLite lets one writer in at a
+time, so run it against a scratch PostgreSQL database to exercise writes
+for different PCs truly in parallel.
+
+Requires requirements-dev.txt (httpx, used by FastAPI's TestClient).
+
+Usage:
+    python -m benchmarks.ingest_stress                  # from backend/
+    python -m benchmarks.ingest_stress --pcs 500 --events 40 --threads 128
+    python -m benchmarks.ingest_stress --database-url postgresql://...   # scratch database
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+EVENT_WEIGHTS = (("heartbeat", 6), ("start", 2), ("stop", 1))
+
+
+def make_events(pc_count, per_pc, rng):
+    """Per PC: a start, a random mix, then a retried start; shuffled across PCs"""
+    kinds = [kind for kind, weight in EVENT_WEIGHTS for _ in range(weight)]
+    events = []
+    for i in range(pc_count):
+        pc_events = ["start"] + [rng.choice(kinds) for _ in range(max(per_pc - 3, 0))] + ["start", "start"]
+        events += [(f"STRESS-{i:04d}", kind) for kind in pc_events]
+    rng.shuffle(events)
+    return events
+
+
+def run(args):
+    from datetime import datetime, timezone
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, text
+
+    from app.database import SessionLocal, get_engine
+    from app.main import app
+    from app.models import Session
+    from app.services.lanes import lanes
+    from app.services.open_sessions import open_sessions
+    from app.services.snapshot import snapshot
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    events = make_events(args.pcs, args.events, rng)
+    statuses = Counter()
+
+    with TestClient(app) as client:
+        if not args.keep_index:
+            with get_engine().begin() as conn:
+                conn.execute(text("DROP INDEX IF EXISTS ux_sessions_open_pc"))
+
+        def post(event):
+            pc_id, kind = event
+            response = client.post("/api/events", json={
+                "pcId": pc_id,
+                "clientUuid": f"uuid-{pc_id}",
+                "type": kind,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            })
+            return response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            statuses.update(pool.map(post, events))
+        elapsed = time.perf_counter() - started
+
+        db = SessionLocal()
+        try:
+            duplicates = db.query(Session.pcId, func.count()).filter(
+                Session.endAt.is_(None)
+            ).group_by(Session.pcId).having(func.count() > 1).all()
+            open_in_db = dict(db.query(Session.pcId, Session.id).filter(Session.endAt.is_(None)).all())
+            mismatched = [
+                pc_id for pc_id in {pc_id for pc_id, _ in events}
+                if (open_sessions.get(db, pc_id) or {}).get("id") != open_in_db.get(pc_id)
+            ]
+        finally:
+            db.close()
+
+    print(f"{len(events)} events for {args.pcs} PCs from {args.threads} threads in {elapsed:.2f}s "
+          f"({len(events) / elapsed:.0f} events/s)")
+    print(f"HTTP status codes: {dict(sorted(statuses.items()))}")
+    print(f"Lanes: {lanes.stats()}")
+    print(f"Snapshot rebuilds: {snapshot.stats()}")
+    print(f"Unique index on open sessions: {'kept' if args.keep_index else 'dropped'}")
+    print(f"PCs with more than one open session: {len(duplicates)}")
+    print(f"PCs whose index entry disagrees with the database: {len(mismatched)}")
+
+    failed = sum(count for status, count in statuses.items() if status >= 500 and status != 503)
+    if duplicates or mismatched or failed:
+        print("FAILED")
+        return 1
+    print("OK")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent event ingestion")
+    parser.add_argument("--pcs", type=int, default=100, help="number of PCs")
+    parser.add_argument("--events", type=int, default=20, help="events per PC")
+    parser.add_argument("--threads", type=int, default=64, help="concurrent requests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-index", action="store_true", help="keep the unique index on open sessions")
+    parser.add_argument("--database-url", help="scratch database (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    # Must be set before anything imports app.database
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'stress.db')}"
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+    os.environ.pop("UDP_HEARTBEAT_PORT", None)
+    os.environ["BROADCAST_BACKEND"] = "memory"
+    # Measure ordering, not admission control
+    os.environ["INGEST_MAX_QUEUE"] = str(args.threads * 2)
+    os.environ["INGEST_MAX_WAIT_MS"] = "60000"
+    os.environ["INGEST_MAX_LANE_DEPTH"] = str(args.threads)
+
+    try:
+        return run(args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
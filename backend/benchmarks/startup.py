@@ -0,0 +1,69 @@
+"""
+Startup-time benchmark: import-to-first-request latency.
+
+Each run starts a fresh interpreter, imports the app, runs the lifespan
+(schema check, warm-up) and serves GET /api/pcs, timing each phase. The
+first run against a new SQLite file includes schema creation; later runs
+show the no-DDL path.
+
+Requires requirements-dev.txt (httpx, used by FastAPI's TestClient).
+
+Usage:
+    python -m benchmarks.startup            # from backend/
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+from app.main import app
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    t2 = time.perf_counter()
+    client.get("/api/pcs").raise_for_status()
+    t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1, "first_request": t3 - t2, "total": t3 - t0}))
+"""
+
+PHASES = ("import", "startup", "first_request", "total")
+
+
+def run_once(workdir):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    env.pop("DATABASE_URL", None)  # Always benchmark against a local SQLite file
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import-to-first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cold = run_once(workdir)
+        warm = [run_once(workdir) for _ in range(args.runs)]
+
+    print(f"{'phase':<15}{'new db':>10}{'median':>10}{'min':>10}   (ms, {args.runs} runs on existing db)")
+    for phase in PHASES:
+        values = [r[phase] * 1000 for r in warm]
+        print(f"{phase:<15}{cold[phase] * 1000:>10.1f}{statistics.median(values):>10.1f}{min(values):>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,8 +14,8 @@ import sys
 # Add app directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app.database import engine, Base
-from app.models import PC, Session
+from app.database import get_engine
+from app.schema import ensure_schema, SCHEMA_VERSION
 
 def init_database():
     """Create all database tables"""
@@ -37,12 +37,10 @@ def init_database():
     print("Creating tables...")
 
     try:
-        Base.metadata.create_all(bind=engine)
-        print("✓ Tables created successfully!")
-        print()
-        print("Tables created:")
-        print("  - pcs")
-        print("  - sessions")
+        if ensure_schema(get_engine()):
+            print(f"✓ Schema upgraded to version {SCHEMA_VERSION}!")
+        else:
+            print(f"✓ Schema already at version {SCHEMA_VERSION}, nothing to do")
         print()
         print("=" * 50)
         print("Database initialization complete!")
@@ -0,0 +1,170 @@
+"""
+Rebuild sessions from the raw event journal.
+
+Replays every journaled event in arrival order through the same state
+machine as /api/events (start closes the previous session and opens a new
+one, or moves back the start of a session its heartbeats opened first,
+heartbeat auto-creates a session, stop closes it unless it is older than
+the session, a silence longer than the offline threshold closes it at the
+last server receive time, including sessions of PCs that are silent now).
+
+Manual fields (userName, payment, notes) are carried over from existing
+sessions with the same pcId and startAt.
+
+Usage:
+    python replay_events.py                 # show what would be rebuilt
+    python replay_events.py --apply         # replace sessions
+    python replay_events.py --pc PC-01 --apply
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add app directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models import PC, Session, Event, PCStatus, PaidStatus
+from app.services.snapshot import OFFLINE_THRESHOLD_MINUTES
+from app.venues import DEFAULT_VENUE
+
+BATCH_SIZE = 5000
+MANUAL_FIELDS = ("userName", "paidStatus", "amountDue", "amountPaid", "notes")
+
+
+def close(session, end_at):
+    session["endAt"] = end_at
+    session["durationSeconds"] = int((end_at - session["startAt"]).total_seconds())
+
+
+def rebuild_sessions(events, now=None):
+    """Run journaled events through the session state machine; now is naive UTC"""
+    offline_after = timedelta(minutes=OFFLINE_THRESHOLD_MINUTES)
+    sessions = []
+    open_sessions = {}
+    last_received = {}
+    pcs = {}
+
+    for pc_id, client_uuid, event_type, timestamp, received_at in events:
+        pcs.setdefault(pc_id, client_uuid)
+
+        # The offline sweep closes sessions at the PC's last server-side contact
+        previous = last_received.get(pc_id)
+        if previous and pc_id in open_sessions and received_at - previous > offline_after:
+            close(open_sessions.pop(pc_id), previous)
+        last_received[pc_id] = received_at
+
+        if event_type == "start":
+            if pc_id in open_sessions and timestamp <= open_sessions[pc_id]["startAt"]:
+                # Delivered late, after heartbeats of the same run opened the session
+                open_sessions[pc_id]["startAt"] = timestamp
+                continue
+            if pc_id in open_sessions:
+                close(open_sessions.pop(pc_id), timestamp)
+            open_sessions[pc_id] = {"pcId": pc_id, "startAt": timestamp}
+            sessions.append(open_sessions[pc_id])
+        elif event_type == "heartbeat":
+            if pc_id not in open_sessions:
+                open_sessions[pc_id] = {"pcId": pc_id, "startAt": timestamp}
+                sessions.append(open_sessions[pc_id])
+        elif event_type == "stop":
+            # A stop older than the open session belongs to an earlier run
+            if pc_id in open_sessions and timestamp >= open_sessions[pc_id]["startAt"]:
+                close(open_sessions.pop(pc_id), timestamp)
+
+    # PCs silent past the threshold now would be closed by the next offline sweep
+    now = now or datetime.utcnow()
+    for pc_id in list(open_sessions):
+        if now - last_received[pc_id] > offline_after:
+            close(open_sessions.pop(pc_id), last_received[pc_id])
+
+    return sessions, pcs, last_received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild sessions from the event journal")
+    parser.add_argument("--pc", help="Only rebuild sessions for this pcId")
+    parser.add_argument("--apply", action="store_true", help="Replace sessions in the database")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("L2pControl - Event Journal Replay")
+    print("=" * 50)
+    print()
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Event.pcId, Event.clientUuid, Event.type, Event.timestamp, Event.receivedAt
+        ).order_by(Event.id)
+        if args.pc:
+            query = query.filter(Event.pcId == args.pc)
+
+        sessions, pcs, last_received = rebuild_sessions(query.yield_per(BATCH_SIZE))
+        elapsed = time.perf_counter() - started
+        print(f"Replayed journal for {len(pcs)} PCs in {elapsed:.2f}s")
+        print(f"Rebuilt sessions: {len(sessions)}")
+
+        if not args.apply:
+            print()
+            print("Dry run - pass --apply to replace sessions")
+            return 0
+
+        # Keep manual fields entered by staff on matching sessions
+        existing = db.query(Session)
+        if args.pc:
+            existing = existing.filter(Session.pcId == args.pc)
+        manual = {
+            (s.pcId, s.startAt): {field: getattr(s, field) for field in MANUAL_FIELDS}
+            for s in existing.yield_per(BATCH_SIZE)
+        }
+        defaults = {field: None for field in MANUAL_FIELDS}
+        defaults["paidStatus"] = PaidStatus.UNPAID
+        for session in sessions:
+            session.update(manual.get((session["pcId"], session["startAt"]), defaults))
+            session.setdefault("endAt", None)
+            session.setdefault("durationSeconds", None)
+
+        # Sessions reference pcs.pcId, so make sure every journaled PC exists
+        known = dict(db.query(PC.pcId, PC.venueId).all())
+        missing = [
+            {"pcId": pc_id, "clientUuid": client_uuid, "lastSeenAt": last_received[pc_id], "status": PCStatus.OFFLINE}
+            for pc_id, client_uuid in pcs.items() if pc_id not in known
+        ]
+        if missing:
+            db.execute(insert(PC), missing)
+
+        # Sessions belong to their PC's venue
+        for session in sessions:
+            session["venueId"] = known.get(session["pcId"], DEFAULT_VENUE)
+
+        delete = db.query(Session)
+        if args.pc:
+            delete = delete.filter(Session.pcId == args.pc)
+        deleted = delete.delete(synchronize_session=False)
+
+        for i in range(0, len(sessions), BATCH_SIZE):
+            db.execute(insert(Session), sessions[i:i + BATCH_SIZE])
+        db.commit()
+
+        elapsed = time.perf_counter() - started
+        print(f"Replaced {deleted} sessions with {len(sessions)} in {elapsed:.2f}s")
+        print("Restart every backend worker: their fleet snapshot and open-session")
+        print("caches still hold the old sessions and are not reloaded otherwise")
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Replay failed: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Shared fixtures.
+
+The app reads its configuration when it is imported, so the environment is
+set here first: a scratch SQLite database, the in-process broadcast bus, no
+UDP listener and no tariff (tests that need billing build their own Tariff).
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORK_DIR = tempfile.mkdtemp(prefix="l2pcontrol-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'test.db')}"
+os.environ["BROADCAST_BACKEND"] = "memory"
+os.environ["TARIFF_CONFIG"] = os.path.join(WORK_DIR, "no-tariffs.json")
+os.environ.pop("DATABASE_REPLICA_URL", None)
+os.environ.pop("UDP_HEARTBEAT_PORT", None)
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    """A database session on empty pcs/sessions tables, with every cache dropped"""
+    from app.database import SessionLocal
+    from app.models import EventReceipt, PC, Session
+    from app.services.dedup import dedup
+    from app.services.occupancy import occupancy
+    from app.services.open_sessions import open_sessions
+    from app.services.snapshot import snapshot
+
+    session = SessionLocal()
+    for model in (EventReceipt, Session, PC):
+        session.query(model).delete()
+    session.commit()
+    dedup.clear()
+    open_sessions.invalidate()
+    snapshot.invalidate()
+    occupancy.invalidate()
+    try:
+        yield session
+    finally:
+        session.close()
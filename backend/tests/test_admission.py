@@ -0,0 +1,69 @@
+"""Admission control for event ingestion (app/services/admission.py)"""
+
+import asyncio
+
+from app.services.admission import AdmissionController, Overloaded
+
+
+def run(controller, requests, hold=0.01):
+    """Admit (name, priority) requests concurrently, in order; returns the order they ran and rejections"""
+    ran = []
+    rejected = []
+
+    async def request(name, priority):
+        try:
+            async with controller.admit(priority=priority):
+                ran.append(name)
+                await asyncio.sleep(hold)
+        except Overloaded as e:
+            rejected.append((name, e.retry_after))
+
+    async def main():
+        tasks = []
+        for name, priority in requests:
+            tasks.append(asyncio.create_task(request(name, priority)))
+            await asyncio.sleep(0)  # Arrive in order
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return ran, rejected
+
+
+def test_requests_within_concurrency_run_immediately():
+    controller = AdmissionController(max_concurrent=2, max_queued=0, max_priority_queued=0)
+    ran, rejected = run(controller, [("a", False), ("b", True)])
+    assert ran == ["a", "b"]
+    assert rejected == []
+    assert controller.stats()["active"] == 0
+
+
+def test_start_stop_are_served_before_heartbeats():
+    controller = AdmissionController(max_concurrent=1, max_queued=10, max_priority_queued=10)
+    ran, _ = run(controller, [("first", False), ("hb-1", False), ("hb-2", False), ("start", True)])
+    assert ran == ["first", "start", "hb-1", "hb-2"]
+
+
+def test_each_queue_has_its_own_limit():
+    controller = AdmissionController(max_concurrent=1, max_queued=1, max_priority_queued=2, retry_after=7)
+    ran, rejected = run(controller, [
+        ("first", False),
+        ("hb-1", False),
+        ("hb-2", False),  # Heartbeat queue full
+        ("start-1", True),
+        ("start-2", True),  # Still fits: heartbeats don't use up the priority queue
+        ("start-3", True),
+    ])
+    assert rejected == [("hb-2", 7), ("start-3", 7)]
+    assert ran == ["first", "start-1", "start-2", "hb-1"]
+    assert controller.stats()["rejected"] == 2
+
+
+def test_waiting_too_long_is_rejected():
+    controller = AdmissionController(max_concurrent=1, max_queued=5, max_wait=0.01, retry_after=3)
+    ran, rejected = run(controller, [("slow", False), ("waiting", False)], hold=0.1)
+    assert ran == ["slow"]
+    assert rejected == [("waiting", 3)]
+    stats = controller.stats()
+    assert stats["timedOut"] == 1
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
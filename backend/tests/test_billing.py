@@ -0,0 +1,51 @@
+"""Tariff pricing across local bands and DST changes (app/services/billing.py)"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from app.services.billing import Tariff
+
+TARIFF_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tariffs.example.json")
+
+
+@pytest.fixture(scope="module")
+def tariff():
+    with open(TARIFF_FILE) as f:
+        return Tariff(json.load(f))
+
+
+def price(tariff, pc_id, start, end):
+    return float(tariff.price([pc_id], [start], [end])[0])
+
+
+@pytest.mark.parametrize("start, end, amount", [
+    # 17:00-18:00 Madrid in winter (UTC+1): base rate, 60 x 0.025
+    (datetime(2026, 1, 15, 16, 0), datetime(2026, 1, 15, 17, 0), 1.5),
+    # Same UTC hour in summer (UTC+2) is 18:00-19:00 local: evening band, 2.1 -> 2.0
+    (datetime(2026, 7, 15, 16, 0), datetime(2026, 7, 15, 17, 0), 2.0),
+    # 18:00-19:00 local in either season
+    (datetime(2026, 1, 15, 17, 0), datetime(2026, 1, 15, 18, 0), 2.0),
+    (datetime(2026, 7, 15, 16, 30), datetime(2026, 7, 15, 17, 30), 2.0),
+])
+def test_bands_follow_local_time(tariff, start, end, amount):
+    assert price(tariff, "PC-1", start, end) == amount
+
+
+def test_fall_back_bills_real_minutes(tariff):
+    # 02:00-04:00 local on 25 Oct 2026 repeats an hour: 180 minutes were played
+    assert price(tariff, "PC-1", datetime(2026, 10, 25, 0, 0), datetime(2026, 10, 25, 3, 0)) == 4.5
+
+
+def test_spring_forward_bills_real_minutes(tariff):
+    # 01:30-03:30 local on 29 Mar 2026 is one real hour
+    assert price(tariff, "PC-1", datetime(2026, 3, 29, 0, 30), datetime(2026, 3, 29, 1, 30)) == 1.5
+
+
+def test_minimum_and_class(tariff):
+    # 10 minutes are billed as the 30 minute minimum, 0.75 -> 1.0
+    assert price(tariff, "PC-1", datetime(2026, 10, 19, 8, 0), datetime(2026, 10, 19, 8, 10)) == 1.0
+    # VIP band crossing local midnight: 180 x 0.05 + 60 x 0.04 = 11.4 -> 11.5
+    assert price(tariff, "VIP-3", datetime(2026, 10, 19, 21, 0), datetime(2026, 10, 20, 1, 0)) == 11.5
@@ -0,0 +1,89 @@
+"""Idempotent event ingestion (app/services/dedup.py)"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.models import EventReceipt, Session
+from app.services import dedup as dedup_module
+from app.services.dedup import EventDedup, dedup, event_key, event_result
+
+
+def test_event_key_prefers_idempotency_key():
+    timestamp = datetime(2026, 10, 19, 12, 0)
+    assert event_key("u1", "abc", "start", timestamp) == "u1:abc"
+    assert event_key("u1", None, "start", timestamp) == "u1:start:2026-10-19T12:00:00"
+    assert event_key("u2", None, "start", timestamp) != event_key("u1", None, "start", timestamp)
+
+
+def test_recent_returns_remembered_result():
+    cache = EventDedup(max_size=10, ttl=60)
+    result = event_result("PC-1", "start")
+    assert cache.recent("k") is None
+    cache.remember("k", result, applied=True)
+    assert cache.recent("k") == result
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["applied"] == 1
+
+
+def test_recent_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup_module.time, "monotonic", lambda: now[0])
+    cache = EventDedup(max_size=10, ttl=60)
+    cache.remember("k", event_result("PC-1", "start"))
+    now[0] += 61
+    assert cache.recent("k") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_key_is_evicted():
+    cache = EventDedup(max_size=2, ttl=60)
+    cache.remember("a", event_result("PC-1", "start"))
+    cache.remember("b", event_result("PC-2", "start"))
+    cache.recent("a")
+    cache.remember("c", event_result("PC-3", "start"))
+    assert cache.recent("b") is None
+    assert cache.recent("a") is not None
+    assert cache.recent("c") is not None
+
+
+def post_event(client, event_type, timestamp, **extra):
+    return client.post("/api/events", json={
+        "pcId": "PC-1",
+        "clientUuid": "u1",
+        "type": event_type,
+        "timestamp": timestamp.isoformat(),
+        **extra,
+    })
+
+
+def test_duplicate_start_is_applied_once(client, db):
+    timestamp = datetime.now(timezone.utc) - timedelta(minutes=5)
+    first = post_event(client, "start", timestamp)
+    second = post_event(client, "start", timestamp)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert db.query(Session).count() == 1
+    assert db.query(EventReceipt).count() == 1
+
+
+def test_duplicate_start_is_recognized_from_receipt(client, db):
+    # Another worker, or this one after a restart, has an empty LRU
+    timestamp = datetime.now(timezone.utc) - timedelta(minutes=5)
+    post_event(client, "start", timestamp)
+    post_event(client, "heartbeat", timestamp + timedelta(minutes=1))
+    dedup.clear()
+    persisted_hits = dedup.stats()["persistedHits"]
+
+    assert post_event(client, "start", timestamp).status_code == 200
+    assert dedup.stats()["persistedHits"] == persisted_hits + 1
+    db.expire_all()
+    assert db.query(Session).count() == 1
+    assert db.query(Session).one().endAt is None
+
+
+def test_duplicate_heartbeat_with_key_is_applied_once(client, db):
+    timestamp = datetime.now(timezone.utc)
+    post_event(client, "heartbeat", timestamp, idempotencyKey="hb-1")
+    applied = dedup.stats()["applied"]
+    post_event(client, "heartbeat", timestamp, idempotencyKey="hb-1")
+    assert dedup.stats()["applied"] == applied
+    assert db.query(Session).count() == 1
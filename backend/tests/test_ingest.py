@@ -0,0 +1,151 @@
+"""Open-session state machine (app/services/ingest.py)"""
+
+from datetime import datetime, timedelta
+
+from app.models import PC, PCStatus, Session
+from app.services.ingest import apply_event
+from app.services.open_sessions import open_sessions
+
+T0 = datetime(2026, 10, 19, 12, 0)
+
+
+def sessions(db):
+    """(startAt, endAt) of every session, oldest first"""
+    db.expire_all()
+    return [(s.startAt, s.endAt) for s in db.query(Session).order_by(Session.id)]
+
+
+def open_ids(db):
+    db.expire_all()
+    return [s.id for s in db.query(Session).filter(Session.endAt.is_(None))]
+
+
+def indexed_id(db, pc_id):
+    entry = open_sessions.get(db, pc_id)
+    return entry["id"] if entry else None
+
+
+def other_worker_restarts(db, pc_id, at):
+    """Close the open session and open a newer one behind this worker's index"""
+    db.query(Session).filter(Session.pcId == pc_id, Session.endAt.is_(None)).update(
+        {Session.endAt: at, Session.durationSeconds: 0}
+    )
+    db.commit()
+    db.add(Session(pcId=pc_id, startAt=at, venueId="default"))
+    db.commit()
+
+
+def test_start_opens_and_stop_closes(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    assert sessions(db) == [(T0, None)]
+    assert db.query(PC).one().status == PCStatus.ONLINE
+
+    apply_event(db, "PC-1", "u1", "heartbeat", T0 + timedelta(minutes=1))
+    assert sessions(db) == [(T0, None)]
+
+    apply_event(db, "PC-1", "u1", "stop", T0 + timedelta(minutes=30))
+    assert sessions(db) == [(T0, T0 + timedelta(minutes=30))]
+    assert db.query(Session).one().durationSeconds == 1800
+    assert db.query(PC).one().status == PCStatus.OFFLINE
+    assert indexed_id(db, "PC-1") is None
+
+
+def test_heartbeat_without_session_opens_one(db):
+    apply_event(db, "PC-1", "u1", "heartbeat", T0)
+    apply_event(db, "PC-1", "u1", "heartbeat", T0 + timedelta(seconds=30))
+    assert sessions(db) == [(T0, None)]
+    assert indexed_id(db, "PC-1") == open_ids(db)[0]
+
+
+def test_start_replaces_open_session(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    apply_event(db, "PC-1", "u1", "start", T0 + timedelta(hours=1))
+    assert sessions(db) == [(T0, T0 + timedelta(hours=1)), (T0 + timedelta(hours=1), None)]
+    assert indexed_id(db, "PC-1") == open_ids(db)[0]
+
+
+def test_stop_without_session_only_marks_offline(db):
+    apply_event(db, "PC-1", "u1", "stop", T0)
+    assert sessions(db) == []
+    assert db.query(PC).one().status == PCStatus.OFFLINE
+
+
+def test_late_start_backdates_heartbeat_session(db):
+    apply_event(db, "PC-1", "u1", "heartbeat", T0 + timedelta(minutes=2))
+    apply_event(db, "PC-1", "u1", "start", T0)
+    assert sessions(db) == [(T0, None)]
+    assert open_sessions.get(db, "PC-1")["startAt"] == T0
+
+
+def test_stop_with_stale_index_closes_current_session(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    other_worker_restarts(db, "PC-1", T0 + timedelta(minutes=1))
+
+    apply_event(db, "PC-1", "u1", "stop", T0 + timedelta(minutes=30))
+    assert open_ids(db) == []
+    assert sessions(db)[-1] == (T0 + timedelta(minutes=1), T0 + timedelta(minutes=30))
+    assert indexed_id(db, "PC-1") is None
+
+
+def test_start_with_stale_index_leaves_one_open_session(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    other_worker_restarts(db, "PC-1", T0 + timedelta(minutes=1))
+
+    apply_event(db, "PC-1", "u1", "start", T0 + timedelta(minutes=30))
+    assert sessions(db)[1:] == [
+        (T0 + timedelta(minutes=1), T0 + timedelta(minutes=30)),
+        (T0 + timedelta(minutes=30), None),
+    ]
+    assert indexed_id(db, "PC-1") == open_ids(db)[0]
+
+
+def test_heartbeat_with_stale_index_opens_session_after_forget(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    db.query(Session).update({Session.endAt: T0 + timedelta(minutes=1)})
+    db.commit()
+    open_sessions.forget("PC-1")
+
+    apply_event(db, "PC-1", "u1", "heartbeat", T0 + timedelta(minutes=2))
+    assert len(open_ids(db)) == 1
+    assert indexed_id(db, "PC-1") == open_ids(db)[0]
+
+
+def test_stop_older_than_open_session_is_ignored(db):
+    # The previous boot's stop arrives after this boot's heartbeats opened a session
+    apply_event(db, "PC-1", "u1", "heartbeat", T0 + timedelta(minutes=10))
+    apply_event(db, "PC-1", "u1", "stop", T0)
+    assert sessions(db) == [(T0 + timedelta(minutes=10), None)]
+    assert db.query(PC).one().status == PCStatus.ONLINE
+    assert indexed_id(db, "PC-1") == open_ids(db)[0]
+
+
+def test_stop_with_stale_index_does_not_close_newer_session_early(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    other_worker_restarts(db, "PC-1", T0 + timedelta(minutes=20))
+
+    apply_event(db, "PC-1", "u1", "stop", T0 + timedelta(minutes=10))
+    assert sessions(db)[-1] == (T0 + timedelta(minutes=20), None)
+    assert all(end is None or end >= start for start, end in sessions(db))
+
+
+def test_start_with_stale_index_older_than_newer_session_backdates_it(db):
+    apply_event(db, "PC-1", "u1", "start", T0)
+    other_worker_restarts(db, "PC-1", T0 + timedelta(minutes=20))
+
+    apply_event(db, "PC-1", "u1", "start", T0 + timedelta(minutes=10))
+    assert sessions(db)[-1] == (T0 + timedelta(minutes=10), None)
+    assert len(open_ids(db)) == 1
+
+
+def test_replay_ignores_stop_older_than_open_session():
+    from replay_events import rebuild_sessions
+
+    events = [
+        ("PC-1", "u1", "heartbeat", T0 + timedelta(minutes=10), T0 + timedelta(minutes=10)),
+        ("PC-1", "u1", "stop", T0, T0 + timedelta(minutes=10, seconds=1)),
+        ("PC-1", "u1", "stop", T0 + timedelta(minutes=10, seconds=20), T0 + timedelta(minutes=10, seconds=20)),
+    ]
+    sessions, _, _ = rebuild_sessions(events, now=T0 + timedelta(minutes=11))
+    assert [(s["startAt"], s.get("endAt")) for s in sessions] == [
+        (T0 + timedelta(minutes=10), T0 + timedelta(minutes=10, seconds=20)),
+    ]
@@ -0,0 +1,134 @@
+"""Per-PC ordered lanes (app/services/lanes.py)"""
+
+import asyncio
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, text
+
+from app.database import get_engine
+from app.models import Session
+from app.services.admission import Overloaded, admission
+from app.services.lanes import PcLanes, lanes
+from app.services.open_sessions import open_sessions
+from benchmarks.ingest_stress import make_events
+
+
+def run_events(lanes, events):
+    """Run (pc_id, seconds) events concurrently, in order; returns (start, finish) log"""
+    log = []
+
+    async def event(index, pc_id, seconds):
+        async with lanes.hold(pc_id):
+            log.append(("start", index))
+            await asyncio.sleep(seconds)
+            log.append(("finish", index))
+
+    async def main():
+        tasks = []
+        for index, (pc_id, seconds) in enumerate(events):
+            tasks.append(asyncio.create_task(event(index, pc_id, seconds)))
+            await asyncio.sleep(0)  # Arrive in order
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return log
+
+
+def test_events_of_one_pc_run_in_arrival_order():
+    lanes = PcLanes(max_depth=10)
+    # The slow first event must not be overtaken by the quick ones behind it
+    log = run_events(lanes, [("PC-1", 0.05), ("PC-1", 0), ("PC-1", 0.01), ("PC-1", 0)])
+    assert log == [
+        ("start", 0), ("finish", 0),
+        ("start", 1), ("finish", 1),
+        ("start", 2), ("finish", 2),
+        ("start", 3), ("finish", 3),
+    ]
+    assert lanes.stats()["active"] == 0
+
+
+def test_events_of_different_pcs_run_in_parallel():
+    lanes = PcLanes(max_depth=10)
+    log = run_events(lanes, [("PC-1", 0.05), ("PC-2", 0)])
+    assert log.index(("finish", 1)) < log.index(("finish", 0))
+
+
+def test_full_lane_raises_overloaded():
+    lanes = PcLanes(max_depth=2, retry_after=3)
+    outcome = []
+
+    async def event(index, gate):
+        try:
+            async with lanes.hold("PC-1"):
+                await gate.wait()
+                outcome.append(index)
+        except Overloaded as e:
+            outcome.append(("rejected", index, e.retry_after))
+
+    async def main():
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(event(index, gate)) for index in range(4)]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert outcome == [("rejected", 2, 3), ("rejected", 3, 3), 0, 1]
+    assert lanes.stats()["rejected"] == 2
+    assert lanes.stats()["active"] == 0
+
+
+def test_depth_counts_only_events_in_flight():
+    lanes = PcLanes(max_depth=1)
+    run_events(lanes, [("PC-1", 0)])
+    with pytest.raises(Overloaded):
+        run_events(lanes, [("PC-1", 0.01), ("PC-1", 0)])
+    assert lanes.stats()["active"] == 0
+
+
+@pytest.fixture(params=["with unique index", "lanes only"])
+def backstop(request, db):
+    """Run with and without the database's one-open-session-per-PC index"""
+    if request.param == "lanes only":
+        with get_engine().begin() as conn:
+            conn.execute(text("DROP INDEX ux_sessions_open_pc"))
+    yield request.param
+    if request.param == "lanes only":
+        with get_engine().begin() as conn:
+            conn.execute(text(
+                'CREATE UNIQUE INDEX ux_sessions_open_pc ON sessions ("pcId") WHERE "endAt" IS NULL'
+            ))
+
+
+def test_concurrent_events_leave_one_open_session_per_pc(client, db, backstop, monkeypatch):
+    # Measure ordering, not admission control
+    monkeypatch.setattr(lanes, "depth_limit", 64)
+    monkeypatch.setattr(admission, "max_queued", 128)
+    monkeypatch.setattr(admission, "max_wait", 60)
+    events = make_events(10, 12, random.Random(1))
+    sent_at = datetime.now(timezone.utc) - timedelta(minutes=len(events))
+
+    def post(numbered):
+        number, (pc_id, kind) = numbered
+        return client.post("/api/events", json={
+            "pcId": pc_id,
+            "clientUuid": f"uuid-{pc_id}",
+            "type": kind,
+            "timestamp": (sent_at + timedelta(seconds=number)).isoformat(),
+        }).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = Counter(pool.map(post, enumerate(events)))
+    assert statuses == {200: len(events)}
+
+    db.expire_all()
+    open_counts = db.query(Session.pcId, func.count()).filter(Session.endAt.is_(None)).group_by(Session.pcId).all()
+    assert open_counts
+    assert [pc_id for pc_id, count in open_counts if count > 1] == []
+    open_in_db = dict(db.query(Session.pcId, Session.id).filter(Session.endAt.is_(None)))
+    for pc_id in {pc_id for pc_id, _ in events}:
+        assert (open_sessions.get(db, pc_id) or {}).get("id") == open_in_db.get(pc_id)
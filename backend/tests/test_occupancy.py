@@ -0,0 +1,106 @@
+"""Occupancy timeline and its per-day cache (app/services/occupancy.py)"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models import Session
+from app.services.occupancy import occupancy, sweep
+
+DAY = date(2026, 10, 1)
+T0 = datetime(2026, 10, 1)
+
+
+def add_session(db, pc_id, start, end, venue="default"):
+    db.add(Session(pcId=pc_id, startAt=start, endAt=end, venueId=venue))
+    db.commit()
+
+
+def busy_seconds(result, pc_id):
+    return {pc["pcId"]: pc["busySeconds"] for pc in result["pcs"]}.get(pc_id, 0)
+
+
+def test_sweep_matches_brute_force():
+    rng = np.random.default_rng(7)
+    starts = rng.uniform(0, 3600, 200)
+    ends = np.minimum(starts + rng.uniform(0, 1200, 200), 3600)
+    edges = np.arange(0, 3601, 300, dtype=np.float64)
+
+    overlapping, busy = sweep(starts, ends, edges)
+    for i in range(len(edges) - 1):
+        lo, hi = edges[i], edges[i + 1]
+        assert overlapping[i] == np.sum((starts < hi) & (ends > lo))
+        assert busy[i] == pytest.approx(np.sum(np.clip(np.minimum(ends, hi) - np.maximum(starts, lo), 0, None)))
+
+
+def test_sessions_are_clipped_to_the_day(db):
+    add_session(db, "PC-1", T0 - timedelta(hours=1), T0 + timedelta(hours=1))
+    add_session(db, "PC-2", T0 + timedelta(hours=23), T0 + timedelta(hours=25))
+    result = occupancy.compute(db, DAY, DAY, 60, "default")
+    assert len(result["buckets"]) == 24
+    assert result["sessions"][0] == 1
+    assert result["sessions"][23] == 1
+    assert busy_seconds(result, "PC-1") == 3600
+    assert busy_seconds(result, "PC-2") == 3600
+
+
+def test_finished_day_is_served_from_cache(db):
+    add_session(db, "PC-1", T0 + timedelta(hours=1), T0 + timedelta(hours=2))
+    first = occupancy.compute(db, DAY, DAY, 60, "default")
+    # An in-place edit shows whether the day was recomputed
+    db.query(Session).update({Session.endAt: T0 + timedelta(hours=3)})
+    db.commit()
+    assert occupancy.compute(db, DAY, DAY, 60, "default") == first
+
+
+def test_late_session_drops_cached_days(db):
+    occupancy.compute(db, DAY, DAY + timedelta(days=1), 60, "default")
+    # A start delivered late by a client that was offline
+    add_session(db, "PC-1", T0 + timedelta(hours=1), T0 + timedelta(hours=3))
+    result = occupancy.compute(db, DAY, DAY + timedelta(days=1), 60, "default")
+    assert busy_seconds(result, "PC-1") == 7200
+
+
+def test_day_with_open_session_is_not_cached(db):
+    add_session(db, "PC-1", T0 + timedelta(hours=1), None)
+    open_result = occupancy.compute(db, DAY, DAY, 60, "default")
+    assert busy_seconds(open_result, "PC-1") == 23 * 3600
+    # The offline sweep closes it later at the last heartbeat
+    db.query(Session).update({Session.endAt: T0 + timedelta(hours=2)})
+    db.commit()
+    assert busy_seconds(occupancy.compute(db, DAY, DAY, 60, "default"), "PC-1") == 3600
+
+
+def test_cache_is_per_venue(db):
+    add_session(db, "PC-1", T0 + timedelta(hours=1), T0 + timedelta(hours=2), venue="north")
+    assert occupancy.compute(db, DAY, DAY, 60, "default")["pcs"] == []
+    assert busy_seconds(occupancy.compute(db, DAY, DAY, 60, "north"), "PC-1") == 3600
+
+
+def test_backdated_session_drops_cached_days(db):
+    from app.services.ingest import apply_event
+
+    # The heartbeat session opens after the day was cached; the held-back start moves it into that day
+    apply_event(db, "PC-1", "u1", "heartbeat", datetime.utcnow() - timedelta(minutes=5))
+    cached = occupancy.compute(db, DAY, DAY, 60, "default")
+    assert busy_seconds(cached, "PC-1") == 0
+
+    apply_event(db, "PC-1", "u1", "start", T0 + timedelta(hours=22))
+    apply_event(db, "PC-1", "u1", "stop", T0 + timedelta(hours=24))
+    assert busy_seconds(occupancy.compute(db, DAY, DAY, 60, "default"), "PC-1") == 7200
+
+
+def test_backdated_session_broadcast_drops_cached_days(db):
+    # Another worker backdated the session; this one only sees the snapshot broadcast
+    occupancy.compute(db, DAY, DAY, 60, "default")
+    db.add(Session(pcId="PC-1", startAt=datetime.utcnow(), venueId="default"))
+    db.commit()
+    occupancy.compute(db, DAY, DAY, 60, "default")  # Moves the watermark past the session
+    db.query(Session).update({Session.startAt: T0 + timedelta(hours=22), Session.endAt: T0 + timedelta(hours=23)})
+    db.commit()
+
+    occupancy.on_broadcast({"type": "update", "venueId": "default", "data": [
+        {"pcId": "PC-1", "activeSession": {"startAt": (T0 + timedelta(hours=22)).isoformat()}},
+    ]})
+    assert busy_seconds(occupancy.compute(db, DAY, DAY, 60, "default"), "PC-1") == 3600
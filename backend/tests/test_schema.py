@@ -0,0 +1,73 @@
+"""Startup schema upgrades (app/schema.py)"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.schema import SCHEMA_VERSION, current_version, ensure_schema
+from app.venues import DEFAULT_VENUE
+
+# Tables as created before schema versioning
+VERSION_1 = [
+    'CREATE TABLE pcs (id INTEGER PRIMARY KEY, "pcId" VARCHAR(100) NOT NULL UNIQUE, '
+    '"clientUuid" VARCHAR(100) NOT NULL UNIQUE, "lastSeenAt" DATETIME, status VARCHAR(7))',
+    'CREATE TABLE sessions (id INTEGER PRIMARY KEY, "pcId" VARCHAR(100) NOT NULL REFERENCES pcs ("pcId"), '
+    '"startAt" DATETIME NOT NULL, "endAt" DATETIME, "durationSeconds" INTEGER, '
+    '"amountDue" FLOAT, "paidStatus" VARCHAR(6), notes TEXT)',
+    'CREATE TABLE beverages (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE, '
+    'quantity INTEGER NOT NULL, expectedstock INTEGER, "pricePerUnit" FLOAT, '
+    '"createdAt" DATETIME, "updatedAt" DATETIME)',
+]
+
+
+def version_1_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'v1.db'}")
+    with engine.begin() as conn:
+        for statement in VERSION_1:
+            conn.execute(text(statement))
+        conn.execute(text(
+            """INSERT INTO pcs ("pcId", "clientUuid", status) VALUES ('PC-1', 'u1', 'ONLINE')"""
+        ))
+        # Duplicate open sessions, as older releases could leave behind
+        for start in (datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 12)):
+            conn.execute(text(
+                """INSERT INTO sessions ("pcId", "startAt", "paidStatus") VALUES ('PC-1', :start, 'UNPAID')"""
+            ), {"start": start})
+    return engine
+
+
+def test_upgrade_from_version_1(tmp_path):
+    engine = version_1_engine(tmp_path)
+    assert current_version(engine) is None
+
+    assert ensure_schema(engine) is True
+    assert current_version(engine) == SCHEMA_VERSION
+
+    tables = set(inspect(engine).get_table_names())
+    assert {"admin_jobs", "event_receipts", "telemetry_raw", "telemetry_minute", "telemetry_hour"} <= tables
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT DISTINCT "venueId" FROM pcs')).scalars().all() == [DEFAULT_VENUE]
+        assert conn.execute(text('SELECT DISTINCT "venueId" FROM sessions')).scalars().all() == [DEFAULT_VENUE]
+        # Only the newest open session is kept open
+        rows = conn.execute(text('SELECT id, "endAt" FROM sessions ORDER BY id')).all()
+    assert [end_at is None for _, end_at in rows] == [False, True]
+
+
+def test_one_open_session_per_pc_is_enforced(tmp_path):
+    engine = version_1_engine(tmp_path)
+    ensure_schema(engine)
+    with engine.connect() as conn:
+        with pytest.raises(IntegrityError):
+            conn.execute(text(
+                """INSERT INTO sessions ("pcId", "startAt", "paidStatus", "venueId")
+                   VALUES ('PC-1', '2026-01-01 13:00:00', 'UNPAID', 'default')"""
+            ))
+
+
+def test_current_schema_runs_no_ddl(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert ensure_schema(engine) is True
+    assert current_version(engine) == SCHEMA_VERSION
+    assert ensure_schema(engine) is False
@@ -0,0 +1,57 @@
+"""Telemetry ingestion and buffered inserts (app/services/telemetry.py, event_journal.py)"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models import TelemetrySample
+from app.services import event_journal
+from app.services.event_journal import BufferedInserter
+from app.services.telemetry import TelemetryStore
+from app.services.udp_heartbeat import decode_telemetry, encode_telemetry
+
+AT = datetime(2026, 10, 19, 12, 0)
+
+
+@pytest.fixture
+def raw_rows(db):
+    db.query(TelemetrySample).delete()
+    db.commit()
+    yield lambda: db.query(TelemetrySample.pcId, TelemetrySample.foreground).order_by(TelemetrySample.id).all()
+    db.query(TelemetrySample).delete()
+    db.commit()
+
+
+def test_udp_foreground_is_truncated_to_the_column(raw_rows):
+    summary = decode_telemetry(encode_telemetry({"samples": 1, "foreground": "x" * 300}))
+    assert len(summary["foreground"]) == 255
+
+    store = TelemetryStore()
+    store.record("PC-1", summary, AT)
+    assert store.raw.flush() == 1
+    assert raw_rows() == [("PC-1", "x" * 100)]
+
+
+def test_rejected_rows_are_dropped_and_the_rest_written(raw_rows):
+    inserter = BufferedInserter(TelemetrySample.__table__)
+    for pc_id in ("PC-1", None, "PC-2"):  # pcId is NOT NULL
+        inserter.add({"pcId": pc_id, "at": AT, "samples": 1, "foreground": None})
+
+    assert inserter.flush() == 2
+    assert [pc_id for pc_id, _ in raw_rows()] == ["PC-1", "PC-2"]
+    assert inserter.flush() == 0  # Nothing left to retry
+
+
+def test_rows_are_kept_while_the_database_is_unreachable(raw_rows, monkeypatch):
+    inserter = BufferedInserter(TelemetrySample.__table__)
+    inserter.add({"pcId": "PC-1", "at": AT, "samples": 1, "foreground": None})
+
+    def unreachable():
+        raise OperationalError("connect", {}, Exception("connection refused"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(event_journal, "get_engine", unreachable)
+        assert inserter.flush() == 0
+    assert inserter.flush() == 1
+    assert raw_rows() == [("PC-1", None)]
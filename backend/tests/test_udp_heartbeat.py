@@ -0,0 +1,86 @@
+"""Signed UDP heartbeat datagrams (app/services/udp_heartbeat.py)"""
+
+import importlib.util
+import os
+import time
+
+import pytest
+
+from app.services import udp_heartbeat
+from app.services.udp_heartbeat import HeartbeatProtocol, TAG_SIZE, decode_heartbeat, encode_heartbeat
+
+SECRET = b"test-secret"
+SUMMARY = {"samples": 6, "cpuAvg": 12.5, "cpuMax": 80.0, "memAvg": None, "memMax": 55.1,
+           "idleSeconds": 30, "foreground": "game.exe"}
+
+CLIENT_MODULE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "client", "udp_heartbeat.py")
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def test_round_trip_without_telemetry():
+    datagram = encode_heartbeat(SECRET, "PC-1", "u1", 1234)
+    assert decode_heartbeat(SECRET, datagram) == ("PC-1", "u1", 1234, None)
+
+
+def test_round_trip_with_telemetry():
+    pc_id, client_uuid, timestamp_ms, summary = decode_heartbeat(
+        SECRET, encode_heartbeat(SECRET, "PC-1", "u1", 1234, SUMMARY)
+    )
+    assert (pc_id, client_uuid, timestamp_ms) == ("PC-1", "u1", 1234)
+    assert summary == SUMMARY
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda d: d[:-1] + bytes([d[-1] ^ 1]),  # Tag
+    lambda d: d[:12] + b"X" + d[13:],  # Signed body
+    lambda d: d[:-TAG_SIZE - 1] + d[-TAG_SIZE:],  # Truncated
+    lambda d: d[:5],
+])
+def test_tampered_datagram_is_rejected(tamper):
+    datagram = encode_heartbeat(SECRET, "PC-1", "u1", 1234, SUMMARY)
+    assert decode_heartbeat(SECRET, tamper(datagram)) is None
+
+
+def test_wrong_secret_is_rejected():
+    assert decode_heartbeat(b"other", encode_heartbeat(SECRET, "PC-1", "u1", 1234)) is None
+
+
+def test_client_datagrams_decode():
+    spec = importlib.util.spec_from_file_location("client_udp_heartbeat", CLIENT_MODULE)
+    client = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(client)
+
+    identity = client.encode_identity("PC-1", "u1")
+    assert decode_heartbeat(SECRET, client.encode_heartbeat(SECRET, identity, 1234)) == ("PC-1", "u1", 1234, None)
+    assert decode_heartbeat(SECRET, client.encode_heartbeat(SECRET, identity, 1234, SUMMARY))[3] == SUMMARY
+    with pytest.raises(ValueError):
+        client.encode_identity("P" * 256, "u1")
+
+
+@pytest.fixture
+def touched(monkeypatch):
+    """Heartbeats the protocol accepted, without journaling them"""
+    calls = []
+    monkeypatch.setattr(udp_heartbeat.journal, "add", lambda event: None)
+    monkeypatch.setattr(udp_heartbeat.telemetry, "record", lambda pc_id, summary: None)
+    monkeypatch.setattr(udp_heartbeat.liveness, "touch", lambda *args: calls.append(args))
+    return calls
+
+
+def test_replayed_and_skewed_datagrams_are_dropped(touched):
+    protocol = HeartbeatProtocol(SECRET, max_skew=60)
+    sent_at = now_ms()
+    datagram = encode_heartbeat(SECRET, "PC-1", "u1", sent_at)
+
+    protocol.datagram_received(datagram, None)
+    protocol.datagram_received(datagram, None)  # Replay
+    protocol.datagram_received(encode_heartbeat(SECRET, "PC-1", "u1", sent_at - 1), None)  # Older
+    protocol.datagram_received(encode_heartbeat(SECRET, "PC-1", "u1", sent_at + 120_000), None)  # Skewed
+    protocol.datagram_received(encode_heartbeat(SECRET, "PC-2", "u2", sent_at - 1), None)  # Other PC
+
+    assert [call[0] for call in touched] == ["PC-1", "PC-2"]
+    assert (protocol.accepted, protocol.rejected) == (2, 3)
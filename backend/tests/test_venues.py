@@ -0,0 +1,85 @@
+"""Per-venue isolation of PCs, sessions and broadcasts (app/venues.py)"""
+
+from datetime import datetime, timedelta, timezone
+
+
+def start(client, pc_id, venue=None, minutes_ago=10):
+    event = {
+        "pcId": pc_id,
+        "clientUuid": f"uuid-{pc_id}",
+        "type": "start",
+        "timestamp": (datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)).isoformat(),
+    }
+    if venue:
+        event["venueId"] = venue
+    response = client.post("/api/events", json=event)
+    assert response.status_code == 200
+    return response.json()
+
+
+def pc_ids(client, venue=None):
+    params = {"venue": venue} if venue else {}
+    return sorted(pc["pcId"] for pc in client.get("/api/pcs", params=params).json())
+
+
+def test_pcs_and_sessions_are_listed_per_venue(client, db):
+    start(client, "PC-1")
+    start(client, "N-1", venue="north")
+    start(client, "N-2", venue="north")
+
+    assert pc_ids(client) == ["PC-1"]
+    assert pc_ids(client, "north") == ["N-1", "N-2"]
+    assert pc_ids(client, "south") == []
+    north_sessions = client.get("/api/sessions", params={"venue": "north"}).json()
+    assert sorted(s["pcId"] for s in north_sessions) == ["N-1", "N-2"]
+    assert all(s["venueId"] == "north" for s in north_sessions)
+
+
+def test_pc_keeps_its_first_venue(client, db):
+    start(client, "N-1", venue="north", minutes_ago=20)
+    start(client, "N-1", venue="south")
+    assert pc_ids(client, "north") == ["N-1"]
+    assert pc_ids(client, "south") == []
+
+
+def test_sessions_of_another_venue_cannot_be_changed(client, db):
+    start(client, "N-1", venue="north")
+    session_id = client.get("/api/sessions", params={"venue": "north"}).json()[0]["id"]
+
+    assert client.patch(f"/api/sessions/{session_id}", json={"notes": "x"}).status_code == 404
+    assert client.post(f"/api/sessions/{session_id}/close").status_code == 404
+    closed = client.post(f"/api/sessions/{session_id}/close", params={"venue": "north"})
+    assert closed.status_code == 200
+    assert closed.json()["endAt"] is not None
+
+
+def test_invalid_venue_is_rejected(client, db):
+    assert client.get("/api/pcs", params={"venue": "../etc"}).status_code == 400
+
+
+def test_broadcasts_reach_only_the_venue(client, db):
+    with client.websocket_connect("/ws?venue=north") as north, client.websocket_connect("/ws") as default:
+        assert north.receive_json()["type"] == "initial_state"
+        assert default.receive_json()["type"] == "initial_state"
+
+        start(client, "PC-1")
+        start(client, "N-1", venue="north")
+
+        update = north.receive_json()
+        assert update["venueId"] == "north"
+        assert [pc["pcId"] for pc in update["data"]] == ["N-1"]
+        update = default.receive_json()
+        assert update["venueId"] == "default"
+        assert [pc["pcId"] for pc in update["data"]] == ["PC-1"]
+
+
+def test_session_changes_are_broadcast_to_the_venue(client, db):
+    start(client, "N-1", venue="north")
+    session_id = client.get("/api/sessions", params={"venue": "north"}).json()[0]["id"]
+
+    with client.websocket_connect("/ws?venue=north") as north:
+        north.receive_json()
+        client.patch(f"/api/sessions/{session_id}", params={"venue": "north"}, json={"userName": "ana"})
+        assert north.receive_json()["data"][0]["activeSession"]["userName"] == "ana"
+        client.post(f"/api/sessions/{session_id}/close", params={"venue": "north"})
+        assert north.receive_json()["data"][0]["activeSession"] is None
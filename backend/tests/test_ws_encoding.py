@@ -0,0 +1,76 @@
+"""WebSocket wire formats (app/services/ws_encoding.py)"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.ws_encoding import DEFAULT_FORMAT, WireFormat, encode, parse_format
+
+SESSION = {"id": 7, "pcId": "PC-1", "startAt": "2026-10-19T10:00:00", "endAt": None}
+MESSAGE = {
+    "type": "update",
+    "venueId": "default",
+    "data": [
+        {"pcId": "PC-1", "status": "ONLINE", "lastSeenAt": "2026-10-19T10:05:00", "activeSession": SESSION},
+        {"pcId": "PC-2", "status": "OFFLINE", "lastSeenAt": None, "activeSession": None},
+    ],
+}
+
+
+def epoch_ms(value):
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+@pytest.mark.parametrize("encoding, layout, expected", [
+    (None, None, DEFAULT_FORMAT),
+    ("JSON", "Columnar", WireFormat("json", "columnar")),
+    ("xml", "rows", WireFormat("json", "rows")),
+    ("json", "diagonal", WireFormat("json", "rows")),
+])
+def test_parse_format(encoding, layout, expected):
+    assert parse_format(encoding, layout) == expected
+
+
+def test_rows_json_is_the_message():
+    assert json.loads(encode(MESSAGE, DEFAULT_FORMAT)) == MESSAGE
+
+
+def test_columnar_has_one_column_per_field():
+    encoded = json.loads(encode(MESSAGE, WireFormat("json", "columnar")))
+    assert encoded["type"] == "update"
+    assert encoded["venueId"] == "default"
+    assert encoded["count"] == 2
+    columns = encoded["columns"]
+    assert columns["pcId"] == ["PC-1", "PC-2"]
+    assert columns["activeSession.id"] == [7, None]
+    assert columns["activeSession.startAt"] == ["2026-10-19T10:00:00", None]
+    assert "activeSession" not in columns
+
+
+def test_columnar_leaves_other_messages_alone():
+    message = {"type": "catalog", "data": [{"id": 1}]}
+    assert json.loads(encode(message, WireFormat("json", "columnar"))) == message
+
+
+def test_msgpack_sends_epoch_milliseconds():
+    msgpack = pytest.importorskip("msgpack")
+    rows = msgpack.unpackb(encode(MESSAGE, WireFormat("msgpack", "rows")))
+    assert rows["data"][0]["lastSeenAt"] == epoch_ms("2026-10-19T10:05:00")
+    assert rows["data"][0]["activeSession"]["startAt"] == epoch_ms("2026-10-19T10:00:00")
+    assert rows["data"][0]["activeSession"]["endAt"] is None
+    assert rows["data"][1]["lastSeenAt"] is None
+
+    columns = msgpack.unpackb(encode(MESSAGE, WireFormat("msgpack", "columnar")))["columns"]
+    assert columns["lastSeenAt"] == [epoch_ms("2026-10-19T10:05:00"), None]
+    assert columns["activeSession.startAt"] == [epoch_ms("2026-10-19T10:00:00"), None]
+
+
+def test_socket_receives_its_format(client, db):
+    msgpack = pytest.importorskip("msgpack")
+    with client.websocket_connect("/ws?encoding=msgpack&layout=columnar") as websocket:
+        message = msgpack.unpackb(websocket.receive_bytes())
+    assert message["type"] == "initial_state"
+    assert message["count"] == 0
+    with client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_json()["type"] == "initial_state"
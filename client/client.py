@@ -9,7 +9,16 @@ import sys
 from datetime import datetime, timezone
 import requests
 
-from config import API_URL, HEARTBEAT_INTERVAL, get_pc_id, get_or_create_uuid
+from config import (
+    API_URL, HEARTBEAT_INTERVAL, UDP_HEARTBEAT, VENUE_ID, TELEMETRY, TELEMETRY_SAMPLE_SECONDS,
+    get_pc_id, get_or_create_uuid
+)
+from delivery import CONNECT_TIMEOUT, READ_TIMEOUT, EventQueue, EventSender
+from telemetry import TelemetrySampler
+from udp_heartbeat import UdpHeartbeatSender
+
+# How long stopping waits for the stop event to be delivered
+STOP_FLUSH_SECONDS = 3
 
 
 class L2pClient:
@@ -17,45 +26,88 @@ class L2pClient:
         self.pc_id = get_pc_id()
         self.client_uuid = get_or_create_uuid()
         self.running = True
+        self.udp = None
+        if UDP_HEARTBEAT:
+            try:
+                self.udp = UdpHeartbeatSender(UDP_HEARTBEAT, API_URL, self.pc_id, self.client_uuid)
+            except ValueError as e:
+                print(f"  UDP heartbeats disabled, using HTTP: {e}")
+        self.telemetry = TelemetrySampler(TELEMETRY_SAMPLE_SECONDS) if TELEMETRY else None
+        self.sender = EventSender(API_URL, EventQueue(), log=self.log)
 
         print(f"L2pControl Client initialized")
         print(f"  PC ID: {self.pc_id}")
         print(f"  Client UUID: {self.client_uuid}")
         print(f"  API URL: {API_URL}")
+        if self.udp:
+            print(f"  UDP heartbeats: {self.udp.host}:{self.udp.port}")
+        if self.telemetry and not self.telemetry.available:
+            print("  Telemetry: disabled (psutil is not installed)")
 
-    def send_event(self, event_type):
-        """Send event to backend API"""
+    def new_event(self, event_type):
+        """Event payload; resend the same payload on retry so the server can spot duplicates"""
         payload = {
             "pcId": self.pc_id,
             "clientUuid": self.client_uuid,
             "type": event_type,
             "timestamp": datetime.now(timezone.utc).isoformat(),
         }
+        if VENUE_ID:
+            payload["venueId"] = VENUE_ID
+        return payload
+
+    def log(self, message):
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+
+    def send_event(self, event_type, payload=None):
+        """Send event to backend API right away (heartbeats; start/stop are queued)"""
+        if payload is None:
+            payload = self.new_event(event_type)
 
         try:
-            response = requests.post(API_URL, json=payload, timeout=10)
+            with self.sender.http() as session:
+                response = session.post(API_URL, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
             response.raise_for_status()
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Sent {event_type} event - OK")
+            self.log(f"Sent {event_type} event - OK")
             return True
         except requests.exceptions.RequestException as e:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Failed to send {event_type}: {e}")
+            self.log(f"Failed to send {event_type}: {e}")
             return False
 
     def start(self):
-        """Send start event"""
-        return self.send_event("start")
+        """Queue the start event; it is delivered in the background as soon as the API answers"""
+        self.sender.send(self.new_event("start"))
+        self.sender.start()
 
     def heartbeat(self):
-        """Send heartbeat event"""
-        return self.send_event("heartbeat")
+        """Send heartbeat event with the telemetry summary, over UDP if configured"""
+        summary = self.telemetry.summary() if self.telemetry else None
+        if self.udp:
+            try:
+                self.udp.send(summary)
+                return True
+            except OSError as e:
+                self.log(f"UDP heartbeat failed, using HTTP: {e}")
+
+        payload = self.new_event("heartbeat")
+        if summary:
+            payload["telemetry"] = summary
+        return self.send_event("heartbeat", payload)
 
     def stop(self):
-        """Send stop event"""
-        return self.send_event("stop")
+        """Queue the stop event and give it a few seconds to get through"""
+        self.sender.send(self.new_event("stop"))
+        delivered = self.sender.flush(STOP_FLUSH_SECONDS)
+        if not delivered:
+            self.log("Stop event not delivered yet, it will be sent at the next start")
+        self.sender.stop()
+        return delivered
 
     def run(self):
         """Main loop - send start, then heartbeats"""
         self.start()
+        if self.telemetry:
+            self.telemetry.start()
 
         while self.running:
             time.sleep(HEARTBEAT_INTERVAL)
@@ -66,6 +118,8 @@ class L2pClient:
         """Graceful shutdown"""
         print("\nShutting down...")
         self.running = False
+        if self.telemetry:
+            self.telemetry.stop()
         self.stop()
 
 
@@ -8,6 +8,7 @@ CONFIG_FILE = os.path.join(os.path.dirname(__file__), "client_config.json")
 # Default values (development)
 DEFAULT_API_URL = "http://localhost:8000/api/events"
 DEFAULT_HEARTBEAT_INTERVAL = 30
+DEFAULT_TELEMETRY_SAMPLE_SECONDS = 5
 
 
 def load_config():
@@ -25,6 +26,13 @@ def load_config():
 _config = load_config()
 API_URL = _config.get("apiUrl", DEFAULT_API_URL)
 HEARTBEAT_INTERVAL = _config.get("heartbeatInterval", DEFAULT_HEARTBEAT_INTERVAL)
+# Optional {"port": ..., "secret": ..., "host": ...}; heartbeats go over UDP when set
+UDP_HEARTBEAT = _config.get("udpHeartbeat")
+# Venue this PC belongs to (multi-venue backends); only used when the PC is first registered
+VENUE_ID = _config.get("venueId")
+# Send CPU/memory/idle/foreground summaries with heartbeats (needs psutil)
+TELEMETRY = _config.get("telemetry", True)
+TELEMETRY_SAMPLE_SECONDS = _config.get("telemetrySampleSeconds", DEFAULT_TELEMETRY_SAMPLE_SECONDS)
 
 
 def get_pc_id():
@@ -0,0 +1,266 @@
+"""
+Delivery of start/stop events.
+
+Events are written to a local queue file (pending_events.queue, JSON)
+before any network I/O and removed once the backend acknowledges them, so
+the caller never blocks on the network and an event survives a crash or
+power cut. A background thread drains the queue in order. Retries resend
+the original payload, so the backend's idempotency check drops copies that
+already got through (including the extra concurrent attempts below).
+Heartbeats are not queued; the backend moves a session opened by them back
+to the start event's time when the start arrives late.
+
+While events are pending the sender:
+
+- probes the configured API host itself (GET /health) every PROBE_INTERVAL
+  until it answers; the probe's connection stays in its requests.Session,
+  which the POST that follows takes from the pool (a Session is only ever
+  used by one thread at a time)
+- posts with short timeouts, starting another attempt every
+  ATTEMPT_STAGGER seconds while earlier ones are unanswered, so a SYN lost
+  while the link comes up costs half a second instead of the 3 s TCP
+  retransmission timeout
+- backs off when the backend answers with an error (honouring Retry-After)
+"""
+
+import ctypes
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+QUEUE_FILE = os.path.join(os.path.dirname(__file__), "pending_events.queue")
+MAX_PENDING = 100  # Oldest events are dropped beyond this
+
+CONNECT_TIMEOUT = 1.5
+READ_TIMEOUT = 5
+PROBE_TIMEOUT = 1
+PROBE_INTERVAL = 0.25
+ATTEMPT_STAGGER = 0.5
+MAX_IN_FLIGHT = 3
+MAX_BACKOFF = 30
+
+# The backend will never accept these payloads; any other error is retried
+REJECTED_STATUSES = (400, 413, 422)
+
+
+def system_uptime():
+    """Seconds since Windows started, None on other systems"""
+    if sys.platform != "win32":
+        return None
+    tick_count = ctypes.windll.kernel32.GetTickCount64
+    tick_count.restype = ctypes.c_uint64
+    return tick_count() / 1000
+
+
+class EventQueue:
+    """Events not yet acknowledged by the backend, persisted to a JSON file"""
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._events = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                events = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return events if isinstance(events, list) else []
+
+    def _save(self):
+        """Write the queue atomically; returns False if it could not be written"""
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self._events, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            return True
+        except OSError:
+            return False
+
+    def push(self, payload):
+        """Append an event; returns False if it is only kept in memory"""
+        with self._lock:
+            self._events.append(payload)
+            del self._events[:-MAX_PENDING]
+            return self._save()
+
+    def peek(self):
+        """Oldest pending event, or None"""
+        with self._lock:
+            return self._events[0] if self._events else None
+
+    def ack(self, payload):
+        """Remove an event once the backend has answered for it"""
+        with self._lock:
+            if payload in self._events:
+                self._events.remove(payload)
+                self._save()
+            self._changed.notify_all()
+
+    def wait_empty(self, timeout):
+        """Wait until every event is acknowledged, returns False on timeout"""
+        with self._changed:
+            return self._changed.wait_for(lambda: not self._events, timeout)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+
+class EventSender:
+    def __init__(self, api_url, queue, log=print):
+        self.api_url = api_url
+        parts = urlsplit(api_url)
+        self.probe_url = f"{parts.scheme}://{parts.netloc}/health"
+        self.queue = queue
+        self.log = log
+        # Called with (payload, seconds since queued, attempts) after each delivery
+        self.on_delivered = None
+
+        # Idle requests.Sessions, most recently used last; heartbeats use them too
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+        self._attempts = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT, thread_name_prefix="event-post")
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._queued_at = {}
+        self.reachable = False
+        self.started_at = time.monotonic()
+        self.network_up_after = None  # Seconds from start() until the API host first answered
+
+    def send(self, payload):
+        """Queue an event for delivery; returns immediately"""
+        self._queued_at[(payload["type"], payload["timestamp"])] = time.monotonic()
+        if not self.queue.push(payload):
+            self.log(f"Could not write {self.queue.path}, {payload['type']} event kept in memory only")
+        self._wakeup.set()
+
+    @property
+    def pending(self):
+        return len(self.queue)
+
+    @contextmanager
+    def http(self):
+        """A requests.Session for this thread alone, the one with the warmest connection if idle"""
+        with self._sessions_lock:
+            session = self._sessions.pop() if self._sessions else None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        try:
+            yield session
+        finally:
+            with self._sessions_lock:
+                self._sessions.append(session)
+
+    def flush(self, timeout):
+        """Wait up to timeout seconds for pending events to be delivered"""
+        return self.queue.wait_empty(timeout)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="event-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        self._attempts.shutdown(wait=False, cancel_futures=True)
+
+    def _probe(self):
+        """True once the API host answers at all; the connection stays in the pool"""
+        if self.reachable:
+            return True
+        try:
+            with self.http() as session:
+                session.get(self.probe_url, timeout=PROBE_TIMEOUT)
+        except requests.exceptions.RequestException:
+            return False
+        self.reachable = True
+        if self.network_up_after is None:
+            self.network_up_after = time.monotonic() - self.started_at
+        return True
+
+    def _post(self, payload):
+        try:
+            with self.http() as session:
+                return session.post(self.api_url, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except requests.exceptions.RequestException:
+            return None
+
+    def _post_staggered(self, payload):
+        """Up to MAX_IN_FLIGHT overlapping attempts; returns (first response or None, attempts)"""
+        in_flight = set()
+        attempts = 0
+        while True:
+            if attempts < MAX_IN_FLIGHT:
+                try:
+                    in_flight.add(self._attempts.submit(self._post, payload))
+                except RuntimeError:
+                    return None, attempts  # Stopping
+                attempts += 1
+            done, in_flight = wait(in_flight, timeout=ATTEMPT_STAGGER, return_when=FIRST_COMPLETED)
+            for future in done:
+                response = None if future.cancelled() else future.result()
+                if response is not None:
+                    return response, attempts
+            if not in_flight and (attempts >= MAX_IN_FLIGHT or done):
+                return None, attempts
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            payload = self.queue.peek()
+            if payload is None:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            if not self._probe():
+                self._stop.wait(PROBE_INTERVAL)
+                continue
+
+            response, attempts = self._post_staggered(payload)
+            if response is None:
+                # Network went away again, go back to probing
+                self.reachable = False
+                continue
+
+            status = response.status_code
+            if response.ok or status in REJECTED_STATUSES:
+                self.queue.ack(payload)
+                failures = 0
+                queued_at = self._queued_at.pop((payload["type"], payload["timestamp"]), self.started_at)
+                elapsed = time.monotonic() - queued_at
+                if not response.ok:
+                    self.log(f"Dropped {payload['type']} event rejected with HTTP {status}: {response.text[:200]}")
+                    continue
+                self.log(f"Sent {payload['type']} event after {elapsed:.2f}s ({attempts} attempt(s))")
+                if self.on_delivered:
+                    self.on_delivered(payload, elapsed, attempts)
+                continue
+
+            failures += 1
+            try:
+                delay = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                delay = min(2 ** (failures - 1), MAX_BACKOFF)
+            self.log(f"Failed to send {payload['type']} (HTTP {status}), retrying in {delay:.0f}s")
+            self._stop.wait(delay)
@@ -9,7 +9,6 @@ Remove:    python service.py remove
 Or use Windows Services (services.msc) to manage after installation.
 """
 
-import time
 import sys
 import os
 from datetime import datetime, timezone
@@ -22,7 +21,17 @@ import requests
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
-from config import API_URL, HEARTBEAT_INTERVAL, get_pc_id, get_or_create_uuid
+from config import (
+    API_URL, HEARTBEAT_INTERVAL, UDP_HEARTBEAT, VENUE_ID, TELEMETRY, TELEMETRY_SAMPLE_SECONDS,
+    get_pc_id, get_or_create_uuid
+)
+from delivery import CONNECT_TIMEOUT, READ_TIMEOUT, EventQueue, EventSender, system_uptime
+from telemetry import TelemetrySampler
+from udp_heartbeat import UdpHeartbeatSender
+
+# How long stopping the service waits for the stop event to be delivered;
+# if it isn't, it is sent at the next boot
+STOP_FLUSH_SECONDS = 3
 
 
 class L2pControlService(win32serviceutil.ServiceFramework):
@@ -40,22 +49,36 @@ class L2pControlService(win32serviceutil.ServiceFramework):
 
     def __init__(self, args):
         win32serviceutil.ServiceFramework.__init__(self, args)
+        self.uptime_at_start = system_uptime()
         self.stop_event = win32event.CreateEvent(None, 0, 0, None)
         self.running = True
         self.pc_id = get_pc_id()
         self.client_uuid = get_or_create_uuid()
+        self.udp = None
+        if UDP_HEARTBEAT:
+            try:
+                self.udp = UdpHeartbeatSender(UDP_HEARTBEAT, API_URL, self.pc_id, self.client_uuid)
+            except ValueError as e:
+                servicemanager.LogWarningMsg(f"UDP heartbeats disabled, using HTTP: {str(e)}")
+        self.telemetry = TelemetrySampler(TELEMETRY_SAMPLE_SECONDS) if TELEMETRY else None
+        self.sender = EventSender(API_URL, EventQueue(), log=servicemanager.LogInfoMsg)
+        self.sender.on_delivered = self.log_boot_timing
+        self.start_event = None
 
     def SvcStop(self):
         """Called when service is stopped"""
         self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
         self.running = False
-        self.send_event("stop")
+        if self.telemetry:
+            self.telemetry.stop()
+        self.sender.send(self.new_event("stop"))
+        if not self.sender.flush(STOP_FLUSH_SECONDS):
+            servicemanager.LogWarningMsg("Stop event not delivered yet, it will be sent at the next start")
+        self.sender.stop()
         win32event.SetEvent(self.stop_event)
 
     def SvcShutdown(self):
         """Called when system is shutting down"""
-        self.running = False
-        self.send_event("stop")
         self.SvcStop()
 
     def SvcDoRun(self):
@@ -67,17 +90,26 @@ class L2pControlService(win32serviceutil.ServiceFramework):
         )
         self.main()
 
-    def send_event(self, event_type):
-        """Send event to backend API"""
+    def new_event(self, event_type):
+        """Event payload; resend the same payload on retry so the server can spot duplicates"""
         payload = {
             "pcId": self.pc_id,
             "clientUuid": self.client_uuid,
             "type": event_type,
             "timestamp": datetime.now(timezone.utc).isoformat(),
         }
+        if VENUE_ID:
+            payload["venueId"] = VENUE_ID
+        return payload
+
+    def send_event(self, event_type, payload=None):
+        """Send event to backend API right away (heartbeats; start/stop go through self.sender)"""
+        if payload is None:
+            payload = self.new_event(event_type)
 
         try:
-            response = requests.post(API_URL, json=payload, timeout=10)
+            with self.sender.http() as session:
+                response = session.post(API_URL, json=payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
             response.raise_for_status()
             servicemanager.LogInfoMsg(f"Sent {event_type} event successfully")
             return True
@@ -85,46 +117,30 @@ class L2pControlService(win32serviceutil.ServiceFramework):
             servicemanager.LogErrorMsg(f"Failed to send {event_type}: {str(e)}")
             return False
 
-    def check_network_connectivity(self):
-        """Check if network is available"""
-        try:
-            # Quick DNS check to Google's DNS
-            import socket
-            socket.create_connection(("8.8.8.8", 53), timeout=3)
-            return True
-        except OSError:
-            return False
+    def log_boot_timing(self, payload, elapsed, attempts):
+        """Log how long this run's start event took to get through, for tuning"""
+        if payload != self.start_event:
+            return
+        network_up = self.sender.network_up_after
+        servicemanager.LogInfoMsg(
+            f"Boot timing: service started {self.uptime_at_start or 0:.1f}s after Windows, "
+            f"API reachable after {network_up:.2f}s, start delivered after {elapsed:.2f}s "
+            f"({elapsed - network_up:.2f}s after the API answered, {attempts} attempt(s))"
+        )
 
     def main(self):
         """Main service loop"""
-        # Try to send start event immediately - don't wait for network check first
-        # If network is ready, this succeeds instantly
-        # If not, fall back to retry logic with network checks
-        max_retries = 15
-
-        for attempt in range(max_retries):
-            if self.send_event("start"):
-                break  # Success!
+        # Queue the start event and return at once; the sender delivers it (and any
+        # start/stop left over from the last run) as soon as the API host answers
+        self.start_event = self.new_event("start")
+        self.sender.send(self.start_event)
+        self.sender.start()
+
+        if self.telemetry:
+            if self.telemetry.available:
+                self.telemetry.start()
             else:
-                # Failed - now check if it's a network issue
-                if not self.check_network_connectivity():
-                    servicemanager.LogWarningMsg(
-                        f"Network not ready (attempt {attempt + 1}/{max_retries}), waiting..."
-                    )
-                    time.sleep(2)
-                else:
-                    # Network is up but API failed - use exponential backoff
-                    if attempt < max_retries - 1:
-                        retry_delay = min(attempt + 1, 5)
-                        servicemanager.LogWarningMsg(
-                            f"Failed to send start event (attempt {attempt + 1}/{max_retries}), "
-                            f"retrying in {retry_delay} seconds..."
-                        )
-                        time.sleep(retry_delay)
-                    else:
-                        servicemanager.LogErrorMsg(
-                            f"Failed to send start event after {max_retries} attempts"
-                        )
+                servicemanager.LogWarningMsg("psutil is not installed, telemetry disabled")
 
         # Main loop - send heartbeats
         while self.running:
@@ -140,7 +156,22 @@ class L2pControlService(win32serviceutil.ServiceFramework):
 
             # Timeout - send heartbeat
             if self.running:
-                self.send_event("heartbeat")
+                self.send_heartbeat()
+
+    def send_heartbeat(self):
+        """Heartbeat with the telemetry summary, over UDP if configured, HTTP otherwise or if UDP fails"""
+        summary = self.telemetry.summary() if self.telemetry else None
+        if self.udp:
+            try:
+                self.udp.send(summary)
+                return True
+            except OSError as e:
+                servicemanager.LogWarningMsg(f"UDP heartbeat failed, using HTTP: {str(e)}")
+
+        payload = self.new_event("heartbeat")
+        if summary:
+            payload["telemetry"] = summary
+        return self.send_event("heartbeat", payload)
 
 
 def main():
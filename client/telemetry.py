@@ -0,0 +1,180 @@
+"""
+Station telemetry (optional, see "telemetry" in client_config.json).
+
+A background thread samples CPU, memory, idle time and the foreground
+process every few seconds; summary() aggregates the samples taken since the
+previous call into the compact dict sent with each heartbeat. Needs psutil;
+idle time and the foreground process are Windows only. Whatever cannot be
+measured is sent as null.
+
+The Windows service runs in session 0, which has no desktop: it reads the
+idle time of the active console session through WTS, and cannot see the
+foreground window (only the standalone client.py reports it).
+"""
+
+import ctypes
+import sys
+import threading
+from collections import Counter
+
+try:
+    import psutil
+except ImportError:  # optional dependency
+    psutil = None
+
+WINDOWS = sys.platform == "win32"
+
+WTS_SESSION_INFO = 24  # WTS_INFO_CLASS.WTSSessionInfo
+NO_SESSION = 0xFFFFFFFF
+
+
+class _LastInputInfo(ctypes.Structure):
+    _fields_ = [("cbSize", ctypes.c_uint32), ("dwTime", ctypes.c_uint32)]
+
+
+class _WtsInfo(ctypes.Structure):
+    _fields_ = [
+        ("State", ctypes.c_int),
+        ("SessionId", ctypes.c_uint32),
+        ("IncomingBytes", ctypes.c_uint32),
+        ("OutgoingBytes", ctypes.c_uint32),
+        ("IncomingFrames", ctypes.c_uint32),
+        ("OutgoingFrames", ctypes.c_uint32),
+        ("IncomingCompressedBytes", ctypes.c_uint32),
+        ("OutgoingCompressedBytes", ctypes.c_uint32),
+        ("WinStationName", ctypes.c_wchar * 32),
+        ("Domain", ctypes.c_wchar * 17),
+        ("UserName", ctypes.c_wchar * 21),
+        ("ConnectTime", ctypes.c_int64),
+        ("DisconnectTime", ctypes.c_int64),
+        ("LastInputTime", ctypes.c_int64),
+        ("LogonTime", ctypes.c_int64),
+        ("CurrentTime", ctypes.c_int64),
+    ]
+
+
+def _session_id():
+    """Windows session of this process (0 for services)"""
+    session = ctypes.c_uint32()
+    kernel32 = ctypes.windll.kernel32
+    if not kernel32.ProcessIdToSessionId(kernel32.GetCurrentProcessId(), ctypes.byref(session)):
+        return None
+    return session.value
+
+
+def _input_idle_seconds():
+    """Seconds since the last keyboard/mouse input in this session"""
+    info = _LastInputInfo()
+    info.cbSize = ctypes.sizeof(info)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) // 1000
+
+
+def _console_idle_seconds():
+    """Seconds since the last input in the active console session, seen from session 0"""
+    session = ctypes.windll.kernel32.WTSGetActiveConsoleSessionId()
+    if session == NO_SESSION:
+        return None
+    wtsapi = ctypes.windll.wtsapi32
+    buffer = ctypes.c_void_p()
+    size = ctypes.c_uint32()
+    if not wtsapi.WTSQuerySessionInformationW(None, session, WTS_SESSION_INFO, ctypes.byref(buffer), ctypes.byref(size)):
+        return None
+    try:
+        info = ctypes.cast(buffer, ctypes.POINTER(_WtsInfo)).contents
+        if not info.UserName or not info.LastInputTime:
+            return None  # Nobody logged in, or not reported for this session
+        # FILETIME values, 100 ns units
+        return max(info.CurrentTime - info.LastInputTime, 0) // 10_000_000
+    finally:
+        wtsapi.WTSFreeMemory(buffer)
+
+
+def _foreground_process():
+    """Executable name of the process owning the foreground window"""
+    user32 = ctypes.windll.user32
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd:
+        return None
+    pid = ctypes.c_uint32()
+    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    try:
+        return psutil.Process(pid.value).name()
+    except psutil.Error:
+        return None
+
+
+class TelemetrySampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._interactive = WINDOWS and _session_id() not in (None, 0)
+        self._reset()
+
+    @property
+    def available(self):
+        return psutil is not None
+
+    def _reset(self):
+        self._cpu = []
+        self._mem = []
+        self._idle = None
+        self._foreground = Counter()
+
+    def start(self):
+        if not self.available or self._thread:
+            return
+        psutil.cpu_percent(interval=None)  # The first call only sets the baseline
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except (OSError, psutil.Error):
+                pass  # Skip this sample, the next one may work
+
+    def _idle_seconds(self):
+        if not WINDOWS:
+            return None
+        return _input_idle_seconds() if self._interactive else _console_idle_seconds()
+
+    def sample(self):
+        """Take one sample"""
+        cpu = psutil.cpu_percent(interval=None)
+        mem = psutil.virtual_memory().percent
+        idle = self._idle_seconds()
+        foreground = _foreground_process() if self._interactive else None
+
+        with self._lock:
+            self._cpu.append(cpu)
+            self._mem.append(mem)
+            if idle is not None:
+                self._idle = max(self._idle or 0, idle)
+            if foreground:
+                self._foreground[foreground] += 1
+
+    def summary(self):
+        """Aggregate of the samples since the last call, or None if there are none"""
+        with self._lock:
+            cpu, mem, idle, foreground = self._cpu, self._mem, self._idle, self._foreground
+            self._reset()
+
+        if not cpu:
+            return None
+        return {
+            "samples": len(cpu),
+            "cpuAvg": round(sum(cpu) / len(cpu), 1),
+            "cpuMax": round(max(cpu), 1),
+            "memAvg": round(sum(mem) / len(mem), 1),
+            "memMax": round(max(mem), 1),
+            "idleSeconds": idle,
+            "foreground": foreground.most_common(1)[0][0] if foreground else None,
+        }
@@ -0,0 +1,79 @@
+"""
+Signed UDP heartbeats (optional, see "udpHeartbeat" in client_config.json).
+
+Must match the datagram layout in backend/app/services/udp_heartbeat.py.
+"""
+
+import hashlib
+import hmac
+import socket
+import struct
+import time
+from urllib.parse import urlparse
+
+MAGIC = b"LH"
+VERSION = 1
+TELEMETRY_VERSION = 2
+TAG_SIZE = 16
+_HEADER = struct.Struct(">2sBQ")
+_TELEMETRY = struct.Struct(">HHHHHI")
+_PERCENT_FIELDS = ("cpuAvg", "cpuMax", "memAvg", "memMax")
+_UNKNOWN_U16 = 0xFFFF
+_UNKNOWN_U32 = 0xFFFFFFFF
+MAX_ID_BYTES = 255  # pcId and clientUuid have one-byte length prefixes
+
+
+def encode_telemetry(summary):
+    """Compact binary form of a telemetry summary"""
+    percents = [
+        _UNKNOWN_U16 if summary.get(field) is None else min(max(int(round(summary[field] * 10)), 0), 1000)
+        for field in _PERCENT_FIELDS
+    ]
+    idle = summary.get("idleSeconds")
+    foreground = (summary.get("foreground") or "").encode()[:255]
+    return (
+        _TELEMETRY.pack(
+            min(summary.get("samples") or 1, _UNKNOWN_U16), *percents,
+            _UNKNOWN_U32 if idle is None else min(max(int(idle), 0), _UNKNOWN_U32 - 1)
+        )
+        + bytes([len(foreground)]) + foreground
+    )
+
+
+def encode_identity(pc_id, client_uuid):
+    """Length-prefixed pcId and clientUuid; raises ValueError if either is too long"""
+    fields = []
+    for name, value in (("PC ID", pc_id), ("client UUID", client_uuid)):
+        encoded = value.encode()
+        if len(encoded) > MAX_ID_BYTES:
+            raise ValueError(f"{name} is {len(encoded)} bytes, UDP heartbeats allow {MAX_ID_BYTES}")
+        fields.append(bytes([len(encoded)]) + encoded)
+    return b"".join(fields)
+
+
+def encode_heartbeat(secret, identity, timestamp_ms, summary=None):
+    """Build a signed heartbeat datagram, version 2 if it carries a telemetry summary"""
+    version = VERSION if summary is None else TELEMETRY_VERSION
+    body = _HEADER.pack(MAGIC, version, timestamp_ms) + identity
+    if summary is not None:
+        body += encode_telemetry(summary)
+    return body + hmac.new(secret, body, hashlib.sha256).digest()[:TAG_SIZE]
+
+
+class UdpHeartbeatSender:
+    """Raises ValueError if the PC ID or client UUID cannot be sent over UDP"""
+
+    def __init__(self, settings, api_url, pc_id, client_uuid):
+        self.identity = encode_identity(pc_id, client_uuid)
+        self.host = settings.get("host") or urlparse(api_url).hostname
+        self.port = int(settings["port"])
+        self.secret = settings["secret"].encode()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, summary=None):
+        """Send one heartbeat; raises OSError if it could not be handed to the network"""
+        datagram = encode_heartbeat(self.secret, self.identity, int(time.time() * 1000), summary)
+        self.sock.sendto(datagram, (self.host, self.port))
+
+    def close(self):
+        self.sock.close()
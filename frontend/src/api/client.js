@@ -3,8 +3,12 @@ import axios from 'axios'
 // Use environment variable for API URL, fallback to proxy in development
 const API_BASE_URL = import.meta.env.VITE_API_URL || ''
 
+// Multi-venue deployments: which venue this dashboard manages
+const VENUE = import.meta.env.VITE_VENUE
+
 const api = axios.create({
   baseURL: API_BASE_URL ? `${API_BASE_URL}/api` : '/api',
+  params: VENUE ? { venue: VENUE } : undefined,
 })
 
 export const getPCs = async () => {
@@ -13,6 +13,7 @@ function BeverageModal({ isOpen, onClose }) {
     queryKey: ['beverages'],
     queryFn: getBeverages,
     enabled: isOpen,
+    refetchInterval: false,  // Updates are pushed over WebSocket
   });
 
   const createMutation = useMutation({
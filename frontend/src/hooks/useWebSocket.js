@@ -1,9 +1,17 @@
 import { useEffect, useRef, useState } from 'react';
 import { useQueryClient } from '@tanstack/react-query';
+import { decodeMessage } from '../api/wsCodec';
+
+// Optional compact wire format: VITE_WS_ENCODING=msgpack, VITE_WS_LAYOUT=columnar
+const WS_PARAMS = new URLSearchParams();
+if (import.meta.env.VITE_VENUE) WS_PARAMS.set('venue', import.meta.env.VITE_VENUE);
+if (import.meta.env.VITE_WS_ENCODING) WS_PARAMS.set('encoding', import.meta.env.VITE_WS_ENCODING);
+if (import.meta.env.VITE_WS_LAYOUT) WS_PARAMS.set('layout', import.meta.env.VITE_WS_LAYOUT);
+const WS_QUERY = WS_PARAMS.toString() ? `?${WS_PARAMS}` : '';
 
 const WS_URL = import.meta.env.VITE_API_URL
-  ? `${import.meta.env.VITE_API_URL.replace('http', 'ws')}/ws`
-  : `ws://${window.location.host}/ws`;
+  ? `${import.meta.env.VITE_API_URL.replace('http', 'ws')}/ws${WS_QUERY}`
+  : `ws://${window.location.host}/ws${WS_QUERY}`;
 
 export function useWebSocket() {
   const [isConnected, setIsConnected] = useState(false);
@@ -14,6 +22,7 @@ export function useWebSocket() {
   useEffect(() => {
     function connect() {
       const ws = new WebSocket(WS_URL);
+      ws.binaryType = 'arraybuffer';
       wsRef.current = ws;
 
       ws.onopen = () => {
@@ -31,11 +40,14 @@ export function useWebSocket() {
       };
 
       ws.onmessage = (event) => {
-        const message = JSON.parse(event.data);
+        const message = decodeMessage(event.data);
 
         if (message.type === 'initial_state' || message.type === 'update') {
           // Update TanStack Query cache with new data
           queryClient.setQueryData(['pcs'], message.data);
+        } else if (message.type === 'beverages') {
+          // Catalog changes are pushed, so beverage screens don't poll
+          queryClient.setQueryData(['beverages'], message.data);
         }
       };
 
@@ -35,6 +35,7 @@ function Dashboard() {
   const { data: beverages } = useQuery({
     queryKey: ["beverages"],
     queryFn: getBeverages,
+    refetchInterval: false,  // Updates are pushed over WebSocket
   });
 
   const updateMutation = useMutation({